@@ -0,0 +1,89 @@
+'''
+Compares BookService.create_book (one INSERT + COMMIT + refresh per book)
+with BookService.bulk_create_books (chunked multi-row INSERT ... RETURNING).
+
+    python -m benchmarks.bulk_insert --rows 5000 --url postgresql+asyncpg://...
+
+The database is migrated to the latest alembic revision first and every
+row written by the run is removed afterwards, but point it at a scratch database anyway.
+'''
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from benchmarks.seed import migrate
+from src.books.schemas import BookCreateModel
+from src.books.service import BookService
+from src.db.models import Book,User
+
+book_service=BookService()
+
+
+def make_records(count:int)->list[dict]:
+    return [
+        {
+            "title":f"Benchmark title {i}",
+            "author":f"Author {i%97}",
+            "year":1950+i%70,
+            "isbn":f"978{i:010d}",
+            "pages":100+i%600,
+            "price":round(5+(i%4000)/100,2),
+            "available":i%5!=0,
+            "summary":"Generated by benchmarks.bulk_insert",
+        }
+        for i in range(count)
+    ]
+
+
+async def run(url:str,rows:int,chunk_size:int)->None:
+    await migrate(url)
+    engine=create_async_engine(url)
+
+    async with AsyncSession(engine,expire_on_commit=False) as session:
+        user=User(username=f"bench-{uuid.uuid4().hex[:8]}",email=f"{uuid.uuid4().hex}@bench.local",password_hash="x")
+        session.add(user)
+        await session.commit()
+        user_uid=user.uid
+        records=make_records(rows)
+
+        try:
+            started=time.perf_counter()
+            for record in records:
+                await book_service.create_book(BookCreateModel(**record),user_uid,session)
+            single=time.perf_counter()-started
+
+            started=time.perf_counter()
+            results=await book_service.bulk_create_books(records,user_uid,session,chunk_size=chunk_size)
+            bulk=time.perf_counter()-started
+            assert all(result["status"]=="created" for result in results)
+        finally:
+            await session.rollback()
+            await session.exec(delete(Book).where(Book.user_uid==user_uid))
+            await session.exec(delete(User).where(User.uid==user_uid))
+            await session.commit()
+
+    await engine.dispose()
+    print(f"rows={rows} chunk_size={chunk_size}")
+    print(f"single-row create_book : {single:8.3f}s  {rows/single:10.0f} rows/s")
+    print(f"bulk_create_books      : {bulk:8.3f}s  {rows/bulk:10.0f} rows/s  ({single/bulk:.1f}x)")
+
+
+def main()->None:
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url",help="database URL, defaults to DATABASE_URL from the settings")
+    parser.add_argument("--rows",type=int,default=2000)
+    parser.add_argument("--chunk-size",type=int,default=500)
+    args=parser.parse_args()
+    if args.url is None:
+        from src.config import Config
+        args.url=Config.DATABASE_URL
+    asyncio.run(run(args.url,args.rows,args.chunk_size))
+
+
+if __name__=="__main__":
+    main()
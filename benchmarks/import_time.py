@@ -0,0 +1,101 @@
+'''
+Measures how long `import src` takes in a fresh interpreter, with
+python -X importtime, and fails when it goes over a budget or when a
+module that should only load on first use was imported with the app.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --runs 9 --budget-ms 1200 --top 25
+
+Every run is a new process, the first one is not counted (it may be
+compiling bytecode). The median of the runs is checked against the
+budget. Exits 1 if it is over the budget or a deferred module was
+imported.
+
+Settings that are not in the environment get placeholder values, nothing
+is connected to while importing.
+'''
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# the median `import src` may take, about 1.4s on a slow CI runner
+IMPORT_BUDGET_MS=2000
+# loaded on first use: the Celery worker, the mail stack and the email token serializer
+DEFERRED=("celery","kombu","redmail","jinja2","itsdangerous","src.celerly","src.mail")
+PLACEHOLDER_SETTINGS={
+    "DATABASE_URL":"postgresql+asyncpg://bookly@localhost/bookly",
+    "SECRET_KEY":"import-time",
+    "JWT_ALGORITHM":"HS256",
+    "ACCESS_TOKEN_EXPIRE":"60",
+    "REFRESH_TOKEN_EXPIRE":"7",
+    "REDIS_PORT":"6379",
+    "REDIS_URL":"redis://localhost:6379/0",
+    "GMAIL":"bookly@example.com",
+    "GMAIL_PASSWORD":"import-time",
+    "DOMAIN":"localhost:8000",
+}
+
+
+def import_times(module:str)->list[tuple[str,int,int]]:
+    '''
+    (module, self us, cumulative us) of every import `import module` made,
+    itself last. What the interpreter imported at startup is left out.
+    '''
+    env={**PLACEHOLDER_SETTINGS,**os.environ}
+    result=subprocess.run(
+        [sys.executable,"-X","importtime","-c",f"import {module}"],
+        env=env,capture_output=True,text=True,check=True,
+    )
+    rows=[]
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us,cumulative_us,name=line[len("import time:"):].split("|")
+        # children are listed before their parent, indented one level deeper
+        depth=(len(name)-len(name.lstrip())-1)//2
+        if depth==0 and name.strip()!=module:
+            rows=[]
+            continue
+        rows.append((name.strip(),int(self_us),int(cumulative_us)))
+        if depth==0:
+            return rows
+    raise RuntimeError(f"no import time reported for {module}")
+
+
+def main()->None:
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module",default="src")
+    parser.add_argument("--runs",type=int,default=5)
+    parser.add_argument("--budget-ms",type=float,default=IMPORT_BUDGET_MS)
+    parser.add_argument("--top",type=int,default=15,help="how many of the slowest imports to list")
+    args=parser.parse_args()
+
+    import_times(args.module)
+    runs=[import_times(args.module) for _ in range(args.runs)]
+    totals=[rows[-1][2]/1000 for rows in runs]
+    median=statistics.median(totals)
+    rows=runs[totals.index(sorted(totals)[len(totals)//2])]
+
+    print(f"import {args.module}: median {median:.0f}ms over {args.runs} runs (min {min(totals):.0f}ms, max {max(totals):.0f}ms)")
+    print("slowest packages it imports, by cumulative time, in the median run:")
+    top_level=[row for row in rows[:-1] if "." not in row[0]]
+    for name,self_us,cumulative_us in sorted(top_level,key=lambda row:-row[2])[:args.top]:
+        print(f"  {name:30} {cumulative_us/1000:8.1f}ms  (self {self_us/1000:.1f}ms)")
+
+    failed=False
+    loaded=sorted({name for name,_,_ in rows}.intersection(DEFERRED))
+    if loaded:
+        print(f"FAIL: imported with {args.module}, should load on first use: {', '.join(loaded)}")
+        failed=True
+    if median>args.budget_ms:
+        print(f"FAIL: {median:.0f}ms is over the budget of {args.budget_ms:.0f}ms")
+        failed=True
+    if failed:
+        sys.exit(1)
+    print(f"ok, within the budget of {args.budget_ms:.0f}ms")
+
+
+if __name__=="__main__":
+    main()
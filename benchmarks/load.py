@@ -0,0 +1,356 @@
+'''
+HTTP load test of the Bookly API: seeds a database, then drives the books,
+review, tag and auth routes of src:app with an async client at a fixed
+concurrency and reports p50/p95/p99 latency and throughput per route.
+
+    python -m benchmarks.load
+    python -m benchmarks.load --url postgresql+asyncpg://... --redis-url redis://localhost:6379/15
+    python -m benchmarks.load --baseline benchmarks/baselines/load_sqlite.json
+    python -m benchmarks.load --save-baseline benchmarks/baselines/load_sqlite.json
+
+The data comes from benchmarks.seed, skewed like production (popular
+authors, tags and books). Requests go through httpx's ASGITransport
+straight into the app, so the numbers include routing, middleware,
+dependencies, the database and Redis but not a network or a server.
+Without --url a fresh SQLite file is used
+(with SEARCH_BACKEND=memory), without --redis-url a fakeredis server, so a
+run needs nothing but the test dependencies. The data and the request mix
+come from --seed, two runs with the same options do the same work.
+
+Routes run one after another, each for --requests requests (scaled by its
+share) after a short warm-up, so the throughput of one route is not mixed
+with another's. With --runs every route is measured that many times and
+each number reported is the median of the runs. With --baseline the run
+fails (exit 1) if a route's p95 grew or its throughput dropped by more
+than the thresholds stored in the baseline file; a baseline recorded with
+other options is refused (exit 2).
+
+Every result records how long a fixed CPU bound probe took on its machine
+(machine_ms, the fastest probe of the run). The baseline's latencies are scaled by the ratio of the two
+probes before comparing, so a baseline recorded on a faster or slower
+machine still compares. Record baselines with --runs 5.
+Point --url and --redis-url at scratch servers, the run writes to them.
+'''
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable,Optional
+
+import httpx
+
+WARMUP=20
+# search terms, all of them words benchmarks.seed builds titles and summaries from
+SEARCH_WORDS=["river","shadow","garden","winter","empire","silent","glass","storm","harbor","letter","orbit","paper"]
+# used when a baseline file does not carry its own thresholds
+DEFAULT_THRESHOLDS={
+    # p95 may grow by this fraction before the route counts as regressed
+    "p95_slowdown":0.75,
+    # and throughput may drop by this fraction
+    "rps_drop":0.4,
+    # p95 changes smaller than this many ms are noise, whatever the fraction
+    "min_delta_ms":2.0,
+}
+
+
+@dataclass
+class Dataset:
+    # (uid, email) of some seeded users and a token for each
+    users:list[tuple[uuid.UUID,str]]
+    tokens:list[str]
+    # the most reviewed books, most reviewed first
+    book_ids:list[uuid.UUID]
+    password:str
+
+    def book(self,rng:random.Random)->uuid.UUID:
+        # a few books get most of the traffic
+        return self.book_ids[min(int(rng.paretovariate(1.2))-1,len(self.book_ids)-1)]
+
+
+@dataclass
+class Scenario:
+    name:str
+    method:str
+    path:Callable[[random.Random,Dataset],str]
+    body:Optional[Callable[[random.Random,Dataset],dict]]=None
+    # fraction of --requests this route gets, login is bcrypt bound
+    share:float=1.0
+    auth:bool=True
+
+
+SCENARIOS=[
+    Scenario("books.list","GET",lambda rng,data:"/api/v1/books/?limit=20"),
+    Scenario("books.list_top_rated","GET",lambda rng,data:"/api/v1/books/?limit=20&sort=top_rated"),
+    Scenario("books.list_with_tags","GET",lambda rng,data:"/api/v1/books/?limit=20&fields=title,author&include=tags"),
+    Scenario("books.detail","GET",lambda rng,data:f"/api/v1/books/{data.book(rng)}"),
+    Scenario("books.search","GET",lambda rng,data:f"/api/v1/books/search?q={rng.choice(SEARCH_WORDS)}"),
+    Scenario("books.reviews","GET",lambda rng,data:f"/api/v1/books/{data.book(rng)}/reviews"),
+    Scenario("reviews.list","GET",lambda rng,data:"/api/v1/review/get_all_reviews?limit=20"),
+    Scenario(
+        "reviews.create","POST",
+        lambda rng,data:f"/api/v1/review/add_review/{data.book(rng)}",
+        lambda rng,data:{"rating":rng.randint(1,4),"review_text":"Written by benchmarks.load"},
+        share=0.5,
+    ),
+    Scenario("tags.list","GET",lambda rng,data:"/api.v1/tags/"),
+    Scenario("auth.me","GET",lambda rng,data:"/api/v1/auth/me"),
+    Scenario(
+        "auth.login","POST",
+        lambda rng,data:"/api/v1/auth/login",
+        lambda rng,data:{"email":rng.choice(data.users)[1],"password":data.password},
+        share=0.1,
+        auth=False,
+    ),
+]
+
+
+def machine_speed()->float:
+    '''
+    Milliseconds a fixed workload of JSON, sqlite and plain Python takes on
+    this machine, the fastest of five tries: anything else running on the
+    machine only ever makes a try slower. The load test is bound by the
+    same kind of work, so the ratio of two machines' numbers is roughly the
+    ratio of their latencies.
+    '''
+    def probe()->float:
+        started=time.perf_counter()
+        conn=sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)")
+        conn.executemany("INSERT INTO t (v) VALUES (?)",((json.dumps({"n":n,"s":str(uuid.UUID(int=n))}),) for n in range(20000)))
+        total=sum(json.loads(v)["n"] for v, in conn.execute("SELECT v FROM t ORDER BY v"))
+        conn.close()
+        assert total==sum(range(20000))
+        return (time.perf_counter()-started)*1000
+
+    return round(min(probe() for _ in range(5)),3)
+
+
+def median_stats(runs:list[dict])->dict:
+    '''One route's stats over several runs: the median of each number, the most errors of any run.'''
+    merged={key:round(statistics.median(run[key] for run in runs),3) for key in ("p50_ms","p95_ms","p99_ms","rps")}
+    return {"requests":runs[0]["requests"],"errors":max(run["errors"] for run in runs),**merged}
+
+
+def percentile(ordered:list[float],fraction:float)->float:
+    '''Nearest rank percentile of an already sorted list.'''
+    return ordered[min(int(fraction*len(ordered)),len(ordered)-1)]
+
+
+async def drive(client:httpx.AsyncClient,scenario:Scenario,data:Dataset,rng:random.Random,count:int,concurrency:int)->dict:
+    # every request is decided up front, so the mix does not depend on timing
+    planned=[]
+    for _ in range(count):
+        headers={"Authorization":f"Bearer {rng.choice(data.tokens)}"} if scenario.auth else {}
+        body=scenario.body(rng,data) if scenario.body else None
+        planned.append((scenario.path(rng,data),headers,body))
+    latencies=[]
+    errors=0
+
+    async def worker(queue:list)->None:
+        nonlocal errors
+        while queue:
+            path,headers,body=queue.pop()
+            started=time.perf_counter()
+            response=await client.request(scenario.method,path,headers=headers,json=body)
+            latencies.append(time.perf_counter()-started)
+            if response.status_code>=400:
+                errors+=1
+
+    planned.reverse()
+    started=time.perf_counter()
+    await asyncio.gather(*(worker(planned) for _ in range(concurrency)))
+    elapsed=time.perf_counter()-started
+    latencies.sort()
+    return {
+        "requests":count,
+        "errors":errors,
+        "p50_ms":round(percentile(latencies,0.50)*1000,3),
+        "p95_ms":round(percentile(latencies,0.95)*1000,3),
+        "p99_ms":round(percentile(latencies,0.99)*1000,3),
+        "rps":round(count/elapsed,1),
+    }
+
+
+def compare(results:dict,baseline:dict)->list[str]:
+    '''The regressions of results against a baseline, as readable lines.'''
+    thresholds={**DEFAULT_THRESHOLDS,**baseline.get("thresholds",{})}
+    # above 1 this machine is slower than the one that recorded the baseline
+    scale=results["machine_ms"]/baseline["machine_ms"] if baseline.get("machine_ms") else 1.0
+    failures=[]
+    for name,base in baseline["routes"].items():
+        current=results["routes"].get(name)
+        if current is None:
+            failures.append(f"{name}: missing from this run")
+            continue
+        base_p95=base["p95_ms"]*scale
+        allowed_p95=max(base_p95*(1+thresholds["p95_slowdown"]),base_p95+thresholds["min_delta_ms"])
+        if current["p95_ms"]>allowed_p95:
+            failures.append(f"{name}: p95 {current['p95_ms']:.2f}ms, baseline {base_p95:.2f}ms here, allowed {allowed_p95:.2f}ms")
+        base_rps=base["rps"]/scale
+        allowed_rps=base_rps*(1-thresholds["rps_drop"])
+        if current["rps"]<allowed_rps:
+            failures.append(f"{name}: {current['rps']:.1f} req/s, baseline {base_rps:.1f} here, allowed {allowed_rps:.1f}")
+        if current["errors"]>base.get("errors",0):
+            failures.append(f"{name}: {current['errors']} errors, baseline {base.get('errors',0)}")
+    return failures
+
+
+async def run(args:argparse.Namespace)->dict:
+    # imported here, after main() has adjusted the settings they read at import
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlmodel.ext.asyncio.session import AsyncSession
+    from benchmarks.seed import PASSWORD,migrate,seed
+    from src import app
+    from src.auth.utils import access_token
+    from src.db.main import get_session
+    from src.db.redis_client import redis_manager,revoked_tokens
+
+    await migrate(args.url)
+    options={"connect_args":{"timeout":30}} if args.url.startswith("sqlite") else {}
+    engine=create_async_engine(args.url,**options)
+    bench_session=sessionmaker(bind=engine,class_=AsyncSession,expire_on_commit=False)
+
+    async def get_bench_session():
+        async with bench_session() as session:
+            yield session
+
+    app.dependency_overrides[get_session]=get_bench_session
+    if args.redis_url:
+        import redis.asyncio as aioredis
+        redis_client=aioredis.from_url(args.redis_url)
+        await redis_client.flushdb()
+    else:
+        import fakeredis
+        redis_client=fakeredis.FakeAsyncRedis()
+    await redis_manager.close()
+    redis_manager._client=redis_client
+
+    async with engine.begin() as conn:
+        seeded=await seed(conn,seed=args.seed,users=args.users,books=args.books,tags=args.tags,reviews=args.reviews)
+    data=Dataset(
+        users=seeded.users,
+        tokens=[access_token(user_data={"email":email,"u_id":str(uid),"role":"user"}) for uid,email in seeded.users],
+        book_ids=seeded.hot_books,
+        password=PASSWORD,
+    )
+    rng=random.Random(args.seed)
+    scenarios=[scenario for scenario in SCENARIOS if not args.only or scenario.name in args.only]
+    runs={scenario.name:[] for scenario in scenarios}
+
+    revoked_tokens.start()
+    results={"config":config_of(args),"machine_ms":None,"runs":args.runs,"routes":{}}
+    probes=[]
+    try:
+        transport=httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport,base_url="http://localhost",timeout=60) as client:
+            for run_number in range(1,args.runs+1):
+                # probed next to every run, the fastest one counts
+                probes.append(machine_speed())
+                if args.runs>1:
+                    print(f"run {run_number} of {args.runs}")
+                print(f"{'route':24} {'requests':>8} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+                for scenario in scenarios:
+                    count=max(int(args.requests*scenario.share),1)
+                    await drive(client,scenario,data,rng,min(WARMUP,count),args.concurrency)
+                    stats=await drive(client,scenario,data,rng,count,args.concurrency)
+                    runs[scenario.name].append(stats)
+                    print_stats(scenario.name,stats)
+            results["machine_ms"]=min(probes)
+            if args.runs>1:
+                print(f"median of {args.runs} runs")
+            for name,route_runs in runs.items():
+                results["routes"][name]=median_stats(route_runs)
+                if args.runs>1:
+                    print_stats(name,results["routes"][name])
+    finally:
+        await revoked_tokens.stop()
+        await redis_manager.close()
+        app.dependency_overrides.pop(get_session,None)
+        await engine.dispose()
+    return results
+
+
+def print_stats(name:str,stats:dict)->None:
+    print(
+        f"{name:24} {stats['requests']:8} {stats['errors']:6} {stats['p50_ms']:9.2f}"
+        f" {stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f} {stats['rps']:9.1f}"
+    )
+
+
+def config_of(args:argparse.Namespace)->dict:
+    '''What a baseline has to share with a run to be comparable.'''
+    return {
+        "database":args.url.split(":",1)[0],
+        "redis":"redis" if args.redis_url else "fakeredis",
+        "seed":args.seed,
+        "users":args.users,
+        "books":args.books,
+        "tags":args.tags,
+        "reviews":args.reviews,
+        "requests":args.requests,
+        "concurrency":args.concurrency,
+    }
+
+
+def main()->None:
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url",help="database URL, a fresh SQLite file when omitted")
+    parser.add_argument("--redis-url",help="Redis URL (the database is flushed), fakeredis when omitted")
+    parser.add_argument("--seed",type=int,default=1)
+    parser.add_argument("--users",type=int,default=200)
+    parser.add_argument("--books",type=int,default=5000)
+    parser.add_argument("--tags",type=int,default=100)
+    parser.add_argument("--reviews",type=int,default=20000)
+    parser.add_argument("--requests",type=int,default=500,help="requests per route, before its share")
+    parser.add_argument("--concurrency",type=int,default=16)
+    parser.add_argument("--runs",type=int,default=1,help="measure every route this many times and report the medians")
+    parser.add_argument("--only",nargs="*",help="route names to run, all when omitted")
+    parser.add_argument("--output",help="write the results as JSON here")
+    parser.add_argument("--baseline",help="fail if the run regressed against this results file")
+    parser.add_argument("--save-baseline",help="write the results as a baseline with the default thresholds")
+    args=parser.parse_args()
+
+    if args.url is None:
+        path=os.path.join(tempfile.gettempdir(),"bookly-load.db")
+        if os.path.exists(path):
+            os.remove(path)
+        args.url=f"sqlite+aiosqlite:///{path}"
+    if args.url.startswith("sqlite"):
+        # the postgres full text search does not exist there
+        os.environ["SEARCH_BACKEND"]="memory"
+
+    results=asyncio.run(run(args))
+    if args.output:
+        with open(args.output,"w") as f:
+            json.dump(results,f,indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline,"w") as f:
+            json.dump({**results,"thresholds":DEFAULT_THRESHOLDS},f,indent=2)
+            f.write("\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline=json.load(f)
+        if baseline["config"]!=results["config"]:
+            print(f"baseline was recorded with {baseline['config']}, not comparable with this run")
+            sys.exit(2)
+        if baseline.get("machine_ms"):
+            print(f"machine probe {results['machine_ms']:.1f}ms, {baseline['machine_ms']:.1f}ms where the baseline was recorded")
+        failures=compare(results,baseline)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline}")
+
+
+if __name__=="__main__":
+    main()
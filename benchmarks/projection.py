@@ -0,0 +1,163 @@
+'''
+Compares the old list queries, which load full ORM objects along with their
+selectin relationships, against the column projections now used by
+GET /books and GET /tags.
+
+    python -m benchmarks.projection --books 20000 --tags 200 --url postgresql+asyncpg://...
+
+It walks the whole book listing 100 rows a page and reads the tag list once,
+and reports wall time and peak Python memory (tracemalloc, measured in a
+second run) for each variant.
+The database is migrated to the latest alembic revision first, the rows
+are created in it and removed afterwards, but
+point it at a scratch database anyway.
+'''
+import argparse
+import asyncio
+import time
+import tracemalloc
+import uuid
+from datetime import datetime,timedelta
+
+from sqlalchemy import delete,insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import select,desc
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from benchmarks.seed import migrate
+from src.books.schemas import Book as BookSchema
+from src.books.service import BookService
+from src.db.models import Book,BookTag,Tag,User
+from src.tags.service import TagService
+
+PAGE_SIZE=100
+book_service=BookService()
+tag_service=TagService()
+
+
+async def seed(session:AsyncSession,books:int,tags:int,tags_per_book:int)->uuid.UUID:
+    user=User(username=f"bench-{uuid.uuid4().hex[:8]}",email=f"{uuid.uuid4().hex}@bench.local",password_hash="x")
+    session.add(user)
+    await session.commit()
+    started=datetime.now()
+    book_rows=[
+        {
+            "id":uuid.uuid4(),
+            "title":f"Benchmark title {i}",
+            "author":f"Author {i%97}",
+            "year":1950+i%70,
+            "isbn":f"978{i:010d}",
+            "pages":100+i%600,
+            "price":round(5+(i%4000)/100,2),
+            "available":i%5!=0,
+            "summary":"Generated by benchmarks.projection "*8,
+            "user_uid":user.uid,
+            "created_at":started-timedelta(seconds=i),
+            "updated_at":started,
+        }
+        for i in range(books)
+    ]
+    tag_rows=[{"uid":uuid.uuid4(),"name":f"bench-{user.uid.hex[:8]}-{i}","created_at":started} for i in range(tags)]
+    links=[
+        {"book_id":row["id"],"tag_id":tag_rows[(i+j)%tags]["uid"]}
+        for i,row in enumerate(book_rows)
+        for j in range(tags_per_book)
+    ]
+    for table,rows in ((Book,book_rows),(Tag,tag_rows),(BookTag,links)):
+        for start in range(0,len(rows),1000):
+            await session.exec(insert(table),params=rows[start:start+1000])
+    await session.commit()
+    return user.uid
+
+
+async def entity_pages(session:AsyncSession)->int:
+    # what GET /books did before: full Book objects, tags loaded with selectin
+    count,cursor_key=0,None
+    while True:
+        statement=select(Book).order_by(desc(Book.created_at),desc(Book.id)).limit(PAGE_SIZE)
+        if cursor_key:
+            statement=statement.where(Book.created_at<cursor_key)
+        books=(await session.exec(statement)).all()
+        payload=[BookSchema.model_validate(book,from_attributes=True).model_dump() for book in books]
+        count+=len(payload)
+        session.expunge_all()
+        if len(books)<PAGE_SIZE:
+            return count
+        cursor_key=books[-1].created_at
+
+
+async def projected_pages(session:AsyncSession,**options)->int:
+    count,cursor=0,None
+    while True:
+        books,cursor=await book_service.get_all_books(session,limit=PAGE_SIZE,cursor=cursor,**options)
+        count+=len(books)
+        if cursor is None:
+            return count
+
+
+async def entity_tags(session:AsyncSession)->int:
+    # what GET /tags did before: every Tag with all of its books
+    tags=(await session.exec(select(Tag).order_by(desc(Tag.created_at)))).all()
+    count=len(tags)
+    session.expunge_all()
+    return count
+
+
+async def projected_tags(session:AsyncSession)->int:
+    return len(await tag_service.get_all_tags(session))
+
+
+async def measure(label:str,engine,work)->None:
+    # timed and traced in separate runs, tracemalloc slows Python code down a lot
+    async with AsyncSession(engine,expire_on_commit=False) as session:
+        started=time.perf_counter()
+        rows=await work(session)
+        elapsed=time.perf_counter()-started
+    async with AsyncSession(engine,expire_on_commit=False) as session:
+        tracemalloc.start()
+        await work(session)
+        _,peak=tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f"{label:34} {rows:8} rows {elapsed:8.3f}s  peak {peak/2**20:8.1f} MiB")
+
+
+async def run(url:str,books:int,tags:int,tags_per_book:int)->None:
+    await migrate(url)
+    engine=create_async_engine(url)
+
+    async with AsyncSession(engine,expire_on_commit=False) as session:
+        user_uid=await seed(session,books,tags,tags_per_book)
+    try:
+        print(f"books={books} tags={tags} tags_per_book={tags_per_book}")
+        await measure("books: ORM objects + selectin tags",engine,entity_pages)
+        await measure("books: all columns",engine,projected_pages)
+        await measure("books: fields=title,author",engine,lambda s:projected_pages(s,fields=["title","author"]))
+        await measure("books: all columns, include=tags",engine,lambda s:projected_pages(s,include_tags=True))
+        await measure("tags: ORM objects + selectin books",engine,entity_tags)
+        await measure("tags: all columns",engine,projected_tags)
+    finally:
+        async with AsyncSession(engine) as session:
+            owned=select(Book.id).where(Book.user_uid==user_uid)
+            await session.exec(delete(BookTag).where(BookTag.book_id.in_(owned)))
+            await session.exec(delete(Tag).where(Tag.name.like(f"bench-{user_uid.hex[:8]}-%")))
+            await session.exec(delete(Book).where(Book.user_uid==user_uid))
+            await session.exec(delete(User).where(User.uid==user_uid))
+            await session.commit()
+        await engine.dispose()
+
+
+def main()->None:
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url",help="database URL, defaults to DATABASE_URL from the settings")
+    parser.add_argument("--books",type=int,default=20000)
+    parser.add_argument("--tags",type=int,default=200)
+    parser.add_argument("--tags-per-book",type=int,default=3)
+    args=parser.parse_args()
+    if args.url is None:
+        from src.config import Config
+        args.url=Config.DATABASE_URL
+    asyncio.run(run(args.url,args.books,args.tags,args.tags_per_book))
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,310 @@
+'''
+Fills a database with synthetic users, books, tags and reviews whose shape
+resembles production rather than a uniform spread:
+
+- authors are Zipf distributed, a few authors wrote most of the books
+- reviews per book follow a power law, many books have none or a handful
+  and a few have thousands; reviewers are Zipf distributed too
+- tag popularity is Zipf distributed, a few tags are on most books
+
+    python -m benchmarks.seed --url postgresql+asyncpg://... --books 1000000 --reviews 10000000
+    python -m benchmarks.seed --url sqlite+aiosqlite:///bookly.db --books 50000 --reset
+
+The same --seed gives the same rows. Books are generated and written in
+chunks together with their reviews and tag links, so memory stays flat at
+any size, and the rating_sum / rating_count / rating_avg of every book
+match its reviews exactly, as the review writes keep them. On PostgreSQL
+(asyncpg) rows are loaded with COPY, elsewhere with multi-row INSERTs.
+
+The database is migrated to the latest alembic revision first, so the
+rows land in the tables and indexes production has; --reset drops every
+table beforehand. Seed an empty scratch database: user names, emails and tag names
+are unique and a second run into the same tables fails on them.
+'''
+import argparse
+import asyncio
+import heapq
+import itertools
+import random
+import time
+import uuid
+from dataclasses import dataclass,field
+from datetime import datetime,timedelta
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config as AlembicConfig
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncConnection,create_async_engine
+from sqlmodel import SQLModel
+
+from src.auth.utils import generate_hash_password
+from src.db.models import Book,BookTag,Review,Tag,User
+
+ALEMBIC_INI=Path(__file__).resolve().parents[1]/"alembic.ini"
+# every seeded user has this password
+PASSWORD="bookly-seed-password"
+BOOKS_PER_CHUNK=10000
+# how many of the most reviewed books and of the first users are handed back
+HOT_BOOKS=10000
+SAMPLE_USERS=1000
+STARTED=datetime(2024,1,1)
+WORDS=[
+    "river","shadow","garden","winter","empire","silent","glass","storm","harbor","letter",
+    "orbit","paper","mountain","signal","ember","forest","kingdom","echo","atlas","lantern",
+    "voyage","crown","iron","tide","whisper","delta","hollow","summit","cipher","meadow",
+]
+# ratings are 0-4, skewed towards the top like most review sites
+RATINGS=range(5)
+RATING_CUM_WEIGHTS=list(itertools.accumulate([0.04,0.08,0.18,0.35,0.35]))
+# exponents of the distributions: Zipf for authors, tags and reviewers,
+# Pareto (power law) for reviews per book
+AUTHOR_ZIPF=1.1
+TAG_ZIPF=1.2
+REVIEWER_ZIPF=0.9
+REVIEWS_PARETO=1.5
+
+
+@dataclass
+class SeedResult:
+    '''What a caller needs to drive the seeded data, without holding all of it.'''
+    # (uid, email) of the first SAMPLE_USERS users
+    users:list[tuple[uuid.UUID,str]]=field(default_factory=list)
+    # ids of the HOT_BOOKS most reviewed books, most reviewed first
+    hot_books:list[uuid.UUID]=field(default_factory=list)
+    rows:dict[str,int]=field(default_factory=dict)
+    seconds:float=0.0
+
+
+class ZipfSampler:
+    '''Draws indexes 0..n-1 with P(k) proportional to 1/(k+1)**s.'''
+    def __init__(self,n:int,s:float)->None:
+        self.population=range(n)
+        self.cum_weights=list(itertools.accumulate(1/(k**s) for k in range(1,n+1)))
+
+    def sample(self,rng:random.Random,k:int)->list[int]:
+        return rng.choices(self.population,cum_weights=self.cum_weights,k=k)
+
+
+def random_uuid(rng:random.Random)->uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128))
+
+
+_minutes=[timedelta(minutes=n) for n in range(1024)]
+
+def minutes(n:int)->timedelta:
+    return _minutes[n] if n<len(_minutes) else timedelta(minutes=n)
+
+
+async def migrate(url:str,reset:bool=False)->None:
+    '''
+    Runs alembic upgrade head on url, the way a deploy creates the schema,
+    so a benchmark measures the indexes the revisions create. reset drops
+    every table, the alembic version included, beforehand.
+    '''
+    if reset:
+        engine=create_async_engine(url)
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.drop_all)
+            await conn.exec_driver_sql("DROP TABLE IF EXISTS alembic_version")
+        await engine.dispose()
+    config=AlembicConfig(str(ALEMBIC_INI))
+    config.attributes["configure_logger"]=False
+    # ini values are interpolated, a % in a password has to be doubled
+    config.set_main_option("sqlalchemy.url",url.replace("%","%%"))
+    # env.py runs the migrations with asyncio.run, so not on this loop's thread
+    await asyncio.to_thread(command.upgrade,config,"head")
+
+
+async def write(conn:AsyncConnection,model,columns:list[str],rows:list[tuple])->None:
+    '''Loads rows with COPY on asyncpg and with a multi-row INSERT otherwise.'''
+    if not rows:
+        return
+    if conn.dialect.driver=="asyncpg":
+        raw=await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(model.__tablename__,records=rows,columns=columns)
+    else:
+        await conn.execute(insert(model),[dict(zip(columns,row)) for row in rows])
+
+
+USER_COLUMNS=["uid","username","email","password_hash","role","is_verified","created_at","updated_at"]
+TAG_COLUMNS=["uid","name","created_at","updated_at"]
+BOOK_COLUMNS=[
+    "id","title","author","year","isbn","pages","price","available","summary",
+    "rating_sum","rating_count","rating_avg","user_uid","created_at","updated_at",
+]
+REVIEW_COLUMNS=["uid","rating","review_txt","user_uid","book_uid","created_at","updated_at"]
+BOOK_TAG_COLUMNS=["book_id","tag_id"]
+
+
+async def seed(
+    conn:AsyncConnection,
+    seed:int=1,
+    users:int=1000,
+    books:int=10000,
+    authors:int|None=None,
+    tags:int=200,
+    reviews:int=50000,
+    tags_per_book:int=4,
+    report=None,
+)->SeedResult:
+    '''
+    Writes the rows on conn (commit is up to the caller). report, when given,
+    is called as report(table, rows) after every chunk.
+    '''
+    rng=random.Random(seed)
+    result=SeedResult()
+    counts=dict.fromkeys(("users","tags","books","book_tags","reviews"),0)
+    started=time.perf_counter()
+
+    async def flush(name,model,columns,rows):
+        await write(conn,model,columns,rows)
+        counts[name]+=len(rows)
+        if report is not None:
+            report(name,len(rows))
+
+    # one real bcrypt hash shared by everyone, so logins cost what they cost
+    password_hash=generate_hash_password(PASSWORD)
+    user_ids=[]
+    for start in range(0,users,BOOKS_PER_CHUNK):
+        rows=[]
+        for i in range(start,min(start+BOOKS_PER_CHUNK,users)):
+            uid=random_uuid(rng)
+            user_ids.append(uid)
+            created=STARTED+timedelta(minutes=i)
+            rows.append((uid,f"seed-user-{i}",f"seed-user-{i}@example.com",password_hash,"user",True,created,created))
+        await flush("users",User,USER_COLUMNS,rows)
+    result.users=[(uid,f"seed-user-{i}@example.com") for i,uid in enumerate(user_ids[:SAMPLE_USERS])]
+
+    tag_ids=[random_uuid(rng) for _ in range(tags)]
+    await flush("tags",Tag,TAG_COLUMNS,[(uid,f"tag-{i}",STARTED,STARTED) for i,uid in enumerate(tag_ids)])
+
+    author_sampler=ZipfSampler(authors or max(books//50,1),AUTHOR_ZIPF)
+    tag_sampler=ZipfSampler(max(tags,1),TAG_ZIPF)
+    reviewer_sampler=ZipfSampler(max(users,1),REVIEWER_ZIPF)
+    # the reviews a book gets: a shifted Pareto (Lomax) weight, mostly near
+    # 0 with a long tail, scaled so the total comes out near the requested number
+    mean_weight=1/(REVIEWS_PARETO-1)
+    reviews_per_weight=reviews/max(books,1)/mean_weight
+    hot:list[tuple[int,int,uuid.UUID]]=[]
+
+    for start in range(0,books,BOOKS_PER_CHUNK):
+        size=min(BOOKS_PER_CHUNK,books-start)
+        book_rows,link_rows,review_rows=[],[],[]
+        # drawn for the whole chunk at once, a call per book costs more than the draw
+        book_authors=author_sampler.sample(rng,size)
+        review_counts=[]
+        for _ in range(size):
+            expected=(rng.paretovariate(REVIEWS_PARETO)-1)*reviews_per_weight
+            # randomized rounding keeps small expectations from all becoming 0
+            review_counts.append(int(expected)+(rng.random()<expected%1) if users else 0)
+        total=sum(review_counts)
+        ratings=rng.choices(RATINGS,cum_weights=RATING_CUM_WEIGHTS,k=total)
+        reviewers=reviewer_sampler.sample(rng,total)
+        tag_counts=rng.choices(range(tags_per_book+1),k=size) if tags else [0]*size
+        book_tags=tag_sampler.sample(rng,sum(tag_counts))
+        owners=rng.choices(user_ids,k=size) if users else [None]*size
+        first_review=first_tag=0
+        for offset in range(size):
+            i=start+offset
+            book_id=random_uuid(rng)
+            created=STARTED+timedelta(seconds=30*i)
+            count=review_counts[offset]
+            book_ratings=ratings[first_review:first_review+count]
+            for n in range(count):
+                reviewed=created+minutes(n+1)
+                review_rows.append((
+                    random_uuid(rng),book_ratings[n],"Seeded review",
+                    user_ids[reviewers[first_review+n]],book_id,reviewed,reviewed,
+                ))
+            first_review+=count
+            rating_sum=sum(book_ratings)
+            book_rows.append((
+                book_id,
+                f"The {rng.choice(WORDS).title()} of the {rng.choice(WORDS).title()} {i}",
+                f"Author {book_authors[offset]}",
+                rng.randint(1900,2024),
+                f"978{i:010d}",
+                rng.randint(60,1200),
+                round(rng.uniform(3,80),2),
+                rng.random()<0.85,
+                " ".join(rng.choices(WORDS,k=24)),
+                rating_sum,
+                count,
+                rating_sum/count if count else 0.0,
+                owners[offset],
+                created,
+                created,
+            ))
+            for tag in set(book_tags[first_tag:first_tag+tag_counts[offset]]):
+                link_rows.append((book_id,tag_ids[tag]))
+            first_tag+=tag_counts[offset]
+            entry=(count,-i,book_id)
+            if len(hot)<HOT_BOOKS:
+                heapq.heappush(hot,entry)
+            else:
+                heapq.heappushpop(hot,entry)
+        await flush("books",Book,BOOK_COLUMNS,book_rows)
+        await flush("book_tags",BookTag,BOOK_TAG_COLUMNS,link_rows)
+        await flush("reviews",Review,REVIEW_COLUMNS,review_rows)
+
+    result.hot_books=[book_id for _,_,book_id in sorted(hot,reverse=True)]
+    result.rows=counts
+    result.seconds=time.perf_counter()-started
+    return result
+
+
+async def run(args:argparse.Namespace)->None:
+    await migrate(args.url,reset=args.reset)
+    engine=create_async_engine(args.url)
+
+    progress={"rows":0,"printed":time.perf_counter()}
+
+    def report(table:str,rows:int)->None:
+        progress["rows"]+=rows
+        if time.perf_counter()-progress["printed"]>5:
+            progress["printed"]=time.perf_counter()
+            print(f"  ... {progress['rows']:,} rows")
+
+    try:
+        async with engine.begin() as conn:
+            if conn.dialect.name=="sqlite":
+                # a page cache big enough for the random uuid index inserts
+                await conn.exec_driver_sql("PRAGMA cache_size=-262144")
+            result=await seed(
+                conn,
+                seed=args.seed,
+                users=args.users,
+                books=args.books,
+                authors=args.authors,
+                tags=args.tags,
+                reviews=args.reviews,
+                report=report,
+            )
+    finally:
+        await engine.dispose()
+    total=sum(result.rows.values())
+    for table,rows in result.rows.items():
+        print(f"{table:10} {rows:12,} rows")
+    print(f"{total:,} rows in {result.seconds:.1f}s, {total/result.seconds:,.0f} rows/s")
+
+
+def main()->None:
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url",help="database URL, defaults to DATABASE_URL from the settings")
+    parser.add_argument("--seed",type=int,default=1)
+    parser.add_argument("--users",type=int,default=1000)
+    parser.add_argument("--books",type=int,default=10000)
+    parser.add_argument("--authors",type=int,help="distinct authors, books/50 by default")
+    parser.add_argument("--tags",type=int,default=200)
+    parser.add_argument("--reviews",type=int,default=50000,help="roughly, the power law decides the exact number")
+    parser.add_argument("--reset",action="store_true",help="drop every table before migrating")
+    args=parser.parse_args()
+    if args.url is None:
+        from src.config import Config
+        args.url=Config.DATABASE_URL
+    asyncio.run(run(args))
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,127 @@
+'''
+Compares how the large list responses are turned into bytes:
+
+  fastapi+json    response_model validation, serialization to JSON compatible
+                  Python, then json.dumps (what FastAPI does by default)
+  fastapi+orjson  the same, rendered by ORJSONResponse (the app default now)
+  fast            src.serializers: validated once, JSON written by pydantic-core
+
+    python -m benchmarks.serialization --rows 1000 10000 100000
+
+No database is needed, the rows are built in memory the way the routes get
+them from the list queries, as column dicts.
+Time is the best of --repeat runs, peak memory is measured in a separate run.
+'''
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from fastapi.responses import JSONResponse,ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from src.books.schemas import BookPage
+from src.reviews.schema import ReviewPage
+from src.serializers import book_page_serializer,review_page_serializer,tag_list_serializer
+from src.tags.schemas import TagListItem
+
+
+def make_books(count:int)->dict:
+    now=datetime.now()
+    books=[
+        {
+            "id":uuid.uuid4(),
+            "title":f"Benchmark title {i}",
+            "author":f"Author {i%97}",
+            "year":1950+i%70,
+            "isbn":f"978{i:010d}",
+            "pages":100+i%600,
+            "price":round(5+(i%4000)/100,2),
+            "available":i%5!=0,
+            "summary":"Generated by benchmarks.serialization",
+            "rating_count":i%40,
+            "rating_avg":(i%50)/10,
+            "created_at":now,
+            "updated_at":now,
+        }
+        for i in range(count)
+    ]
+    return {"books":books,"next_cursor":None}
+
+
+def make_reviews(count:int)->dict:
+    now=datetime.now()
+    reviews=[
+        {
+            "uid":uuid.uuid4(),"rating":i%5,"review_txt":f"Review number {i}",
+            "user_uid":uuid.uuid4(),"book_uid":uuid.uuid4(),"created_at":now,"updated_at":now,
+        }
+        for i in range(count)
+    ]
+    return {"reviews":reviews,"next_cursor":None}
+
+
+def make_tags(count:int)->list[dict]:
+    now=datetime.now()
+    return [{"uid":uuid.uuid4(),"name":f"tag-{i}","created_at":now} for i in range(count)]
+
+
+def fastapi_path(schema,response_class,exclude_unset:bool):
+    field=create_model_field(name="Response_benchmark",type_=schema,mode="serialization")
+
+    def render(content)->bytes:
+        data=asyncio.run(serialize_response(field=field,response_content=content,exclude_unset=exclude_unset))
+        return response_class(data).body
+    return render
+
+
+def measure(render,content,repeat:int)->tuple[float,float,int]:
+    best=float("inf")
+    for _ in range(repeat):
+        started=time.perf_counter()
+        body=render(content)
+        best=min(best,time.perf_counter()-started)
+    tracemalloc.start()
+    render(content)
+    _,peak=tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best,peak,len(body)
+
+
+def main()->None:
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows",type=int,nargs="+",default=[1000,10000,100000])
+    parser.add_argument("--repeat",type=int,default=3)
+    args=parser.parse_args()
+
+    cases=[
+        ("books",BookPage,True,make_books,book_page_serializer),
+        ("reviews",ReviewPage,False,make_reviews,review_page_serializer),
+        ("tags",list[TagListItem],True,make_tags,tag_list_serializer),
+    ]
+    for rows in args.rows:
+        for name,schema,exclude_unset,make,serializer in cases:
+            content=make(rows)
+            paths=[
+                ("fastapi+json",fastapi_path(schema,JSONResponse,exclude_unset)),
+                ("fastapi+orjson",fastapi_path(schema,ORJSONResponse,exclude_unset)),
+                ("fast",serializer.dump),
+            ]
+            # both paths must produce the same document
+            assert json.loads(serializer.dump(content))==json.loads(paths[0][1](content))
+            baseline=None
+            for label,render in paths:
+                elapsed,peak,size=measure(render,content,args.repeat)
+                baseline=baseline or elapsed
+                print(
+                    f"{name:8} rows={rows:<7} {label:15} {elapsed*1000:9.1f} ms"
+                    f"  peak {peak/2**20:7.1f} MiB  {size/2**20:6.1f} MiB body  {baseline/elapsed:5.1f}x"
+                )
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,65 @@
+import asyncio
+from logging.config import fileConfig
+
+from sqlalchemy import pool
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+
+from alembic import context
+
+# registers every table on SQLModel.metadata, for autogenerate
+import src.db.models  # noqa: F401
+
+config=context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger",True):
+    fileConfig(config.config_file_name)
+
+target_metadata=SQLModel.metadata
+
+
+def database_url()->str:
+    '''-x url=... first, then sqlalchemy.url from alembic.ini, then DATABASE_URL.'''
+    url=context.get_x_argument(as_dictionary=True).get("url") or config.get_main_option("sqlalchemy.url")
+    if url:
+        return url
+    from src.config import Config
+    return Config.DATABASE_URL
+
+
+def run_migrations_offline()->None:
+    '''Writes the SQL to stdout (alembic upgrade head --sql) instead of running it.'''
+    context.configure(
+        url=database_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle":"named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection:Connection)->None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # sqlite can only change constraints by copying the table
+        render_as_batch=connection.dialect.name=="sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations()->None:
+    # NullPool: one connection for the run, nothing left open afterwards
+    connectable=create_async_engine(database_url(),poolclass=pool.NullPool)
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await connectable.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_async_migrations())
@@ -0,0 +1,26 @@
+'''Operations shared by the revisions in migrations/versions.'''
+from alembic import op
+
+
+def create_index(name:str,table:str,columns:list,**kw)->None:
+    '''
+    op.create_index, on PostgreSQL with CREATE INDEX CONCURRENTLY so the
+    table keeps taking writes while the index builds. CONCURRENTLY can not
+    run in a transaction, the revision's work so far is committed first.
+
+    A concurrent build that failed leaves an INVALID index behind, which
+    IF NOT EXISTS would then skip: drop it by hand before running again.
+    '''
+    if op.get_context().dialect.name!="postgresql":
+        op.create_index(name,table,columns,if_not_exists=True,**kw)
+        return
+    with op.get_context().autocommit_block():
+        op.create_index(name,table,columns,postgresql_concurrently=True,if_not_exists=True,**kw)
+
+
+def drop_index(name:str,table:str)->None:
+    if op.get_context().dialect.name!="postgresql":
+        op.drop_index(name,table_name=table,if_exists=True)
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index(name,table_name=table,postgresql_concurrently=True,if_exists=True)
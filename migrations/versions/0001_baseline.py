@@ -0,0 +1,108 @@
+"""baseline: the tables as create_all made them before migrations
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18 10:00:00
+
+A database that was created by the app's old startup create_all, before
+any of the later columns, is marked as being here with
+`alembic stamp 0001_baseline` and then upgraded.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0001_baseline'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'users',
+        sa.Column('uid', sa.Uuid(), nullable=False),
+        sa.Column('role', postgresql.VARCHAR(), server_default='user', nullable=False),
+        sa.Column('username', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('email', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('password_hash', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('is_verified', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('uid'),
+    )
+    op.create_index('ix_users_uid', 'users', ['uid'])
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    # tags.uid and reviews.uid were postgresql.UUID in the models, which is
+    # the same UUID column on postgres
+    op.create_table(
+        'tags',
+        sa.Column('uid', sa.Uuid(), nullable=False),
+        sa.Column('name', postgresql.VARCHAR(), nullable=False),
+        sa.Column('created_at', postgresql.TIMESTAMP(), nullable=True),
+        sa.PrimaryKeyConstraint('uid'),
+    )
+
+    # foreign keys carry the names postgres gave them under create_all,
+    # so later revisions can find them on both kinds of databases
+    op.create_table(
+        'books',
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('title', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('author', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('isbn', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('pages', sa.Integer(), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('available', sa.Boolean(), nullable=False),
+        sa.Column('summary', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('user_uid', sa.Uuid(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_uid'], ['users.uid'], name='books_user_uid_fkey'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_books_id', 'books', ['id'])
+
+    op.create_table(
+        'booktag',
+        sa.Column('book_id', sa.Uuid(), nullable=False),
+        sa.Column('tag_id', sa.Uuid(), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], name='booktag_book_id_fkey'),
+        sa.ForeignKeyConstraint(['tag_id'], ['tags.uid'], name='booktag_tag_id_fkey'),
+        sa.PrimaryKeyConstraint('book_id', 'tag_id'),
+    )
+
+    op.create_table(
+        'reviews',
+        sa.Column('uid', sa.Uuid(), nullable=False),
+        sa.Column('rating', sa.Integer(), nullable=False),
+        sa.Column('review_txt', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('user_uid', sa.Uuid(), nullable=True),
+        sa.Column('book_uid', sa.Uuid(), nullable=True),
+        sa.Column('created_at', postgresql.TIMESTAMP(), nullable=True),
+        sa.Column('updated_at', postgresql.TIMESTAMP(), nullable=True),
+        sa.ForeignKeyConstraint(['book_uid'], ['books.id'], name='reviews_book_uid_fkey'),
+        sa.ForeignKeyConstraint(['user_uid'], ['users.uid'], name='reviews_user_uid_fkey'),
+        sa.PrimaryKeyConstraint('uid'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('reviews')
+    op.drop_table('booktag')
+    op.drop_index('ix_books_id', table_name='books')
+    op.drop_table('books')
+    op.drop_table('tags')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_index('ix_users_username', table_name='users')
+    op.drop_index('ix_users_uid', table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,81 @@
+"""rating aggregates on books, tags.updated_at, cascading foreign keys
+
+Revision ID: 0002_ratings_tags_cascades
+Revises: 0001_baseline
+Create Date: 2026-10-18 10:05:00
+
+The columns and constraints the models gained while the schema was still
+made by create_all. A database created by create_all from those models
+(it has books.rating_avg) is stamped here instead:
+`alembic stamp 0002_ratings_tags_cascades`. Their indexes are built in
+0003_hot_path_indexes.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0002_ratings_tags_cascades'
+down_revision: Union[str, Sequence[str], None] = '0001_baseline'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, column, referred table, referred column) of every foreign key
+# that deletes its rows together with the row it points at
+CASCADES=[
+    ('reviews', 'user_uid', 'users', 'uid'),
+    ('reviews', 'book_uid', 'books', 'id'),
+    ('booktag', 'book_id', 'books', 'id'),
+    ('booktag', 'tag_id', 'tags', 'uid'),
+]
+
+
+# the oldest tag of every name is kept, the links of the others move to it
+KEPT_TAG="(SELECT k.uid FROM tags k WHERE k.name={}.name ORDER BY k.created_at, k.uid LIMIT 1)"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('books', sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('books', sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('books', sa.Column('rating_avg', sa.Float(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE books SET rating_sum=r.rating_sum, rating_count=r.rating_count,"
+        " rating_avg=CAST(r.rating_sum AS FLOAT)/r.rating_count"
+        " FROM (SELECT book_uid, SUM(rating) AS rating_sum, COUNT(*) AS rating_count"
+        " FROM reviews WHERE book_uid IS NOT NULL GROUP BY book_uid) AS r"
+        " WHERE books.id=r.book_uid"
+    )
+
+    op.add_column('tags', sa.Column('updated_at', postgresql.TIMESTAMP(), nullable=True))
+    op.execute("UPDATE tags SET updated_at=created_at")
+    # tag names become unique in 0003, merge the duplicates made before
+    op.execute(
+        "INSERT INTO booktag (book_id, tag_id)"
+        f" SELECT DISTINCT bt.book_id, {KEPT_TAG.format('t')} FROM booktag bt JOIN tags t ON t.uid=bt.tag_id"
+        f" WHERE t.uid<>{KEPT_TAG.format('t')} AND NOT EXISTS ("
+        f"SELECT 1 FROM booktag x WHERE x.book_id=bt.book_id AND x.tag_id={KEPT_TAG.format('t')})"
+    )
+    op.execute(f"DELETE FROM booktag WHERE tag_id IN (SELECT t.uid FROM tags t WHERE t.uid<>{KEPT_TAG.format('t')})")
+    op.execute(f"DELETE FROM tags WHERE uid<>{KEPT_TAG.format('tags')}")
+
+    for table, column, referred, referred_column in CASCADES:
+        name=f'{table}_{column}_fkey'
+        with op.batch_alter_table(table) as batch:
+            batch.drop_constraint(name, type_='foreignkey')
+            batch.create_foreign_key(name, referred, [column], [referred_column], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    """Downgrade schema. Merged duplicate tags stay merged."""
+    for table, column, referred, referred_column in CASCADES:
+        name=f'{table}_{column}_fkey'
+        with op.batch_alter_table(table) as batch:
+            batch.drop_constraint(name, type_='foreignkey')
+            batch.create_foreign_key(name, referred, [column], [referred_column])
+    op.drop_column('tags', 'updated_at')
+    op.drop_column('books', 'rating_avg')
+    op.drop_column('books', 'rating_count')
+    op.drop_column('books', 'rating_sum')
@@ -0,0 +1,60 @@
+"""indexes for the columns the hot queries filter, sort and join on
+
+Revision ID: 0003_hot_path_indexes
+Revises: 0002_ratings_tags_cascades
+Create Date: 2026-10-18 10:10:00
+
+Built with CREATE INDEX CONCURRENTLY on PostgreSQL (see migrations/helpers.py),
+so this runs against a live database without blocking writes. Every index is
+IF NOT EXISTS: a database stamped at 0002 may already have the ones create_all
+used to build.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_index, drop_index
+
+# revision identifiers, used by Alembic.
+revision: str = '0003_hot_path_indexes'
+down_revision: Union[str, Sequence[str], None] = '0002_ratings_tags_cascades'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# a copy of BOOK_SEARCH_DOCUMENT in src/db/models.py as it was at this
+# revision, the search query has to use the same text to hit the index
+BOOK_SEARCH_DOCUMENT="to_tsvector('english', title || ' ' || author || ' ' || summary)"
+
+# name, table, columns, options
+INDEXES=[
+    # book listing, newest first and top rated, keyset paginated
+    ('ix_books_created_at_id', 'books', ['created_at', 'id'], {}),
+    ('ix_books_rating_avg_id', 'books', ['rating_avg', 'id'], {}),
+    # a user's submissions, and deleting a user's books
+    ('ix_books_user_uid', 'books', ['user_uid'], {}),
+    # the reviews of a book and all reviews, newest first
+    ('ix_reviews_book_uid_created_at_uid', 'reviews', ['book_uid', 'created_at', 'uid'], {}),
+    ('ix_reviews_created_at_uid', 'reviews', ['created_at', 'uid'], {}),
+    # a user's reviews, and the cascade from users
+    ('ix_reviews_user_uid', 'reviews', ['user_uid'], {}),
+    # tag lookup by name and the ON CONFLICT (name) upsert
+    ('ix_tags_name', 'tags', ['name'], {'unique': True}),
+    # the books of a tag, and the cascade from tags
+    ('ix_booktag_tag_id', 'booktag', ['tag_id'], {}),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, columns, options in INDEXES:
+        create_index(name, table, columns, **options)
+    if op.get_context().dialect.name=='postgresql':
+        create_index('ix_books_search', 'books', [sa.text(BOOK_SEARCH_DOCUMENT)], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index('ix_books_search', 'books')
+    for name, table, _, _ in reversed(INDEXES):
+        drop_index(name, table)
@@ -1,4 +1,5 @@
 from fastapi import FastAPI,status
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from src.books.routes import book_router
 from src.auth.auth_router import auth_router
@@ -6,18 +7,25 @@ from src.reviews.review_routes import review_router
 from src.tags.routes import tags_router
 from .errors import register_exception_handler
 from contextlib import asynccontextmanager
-from src.db.main import init_db
+from src.db.redis_client import redis_manager,revoked_tokens
+from src.outbox import mail_outbox
 from src.middleware import register_middleware
+from src.metrics import metrics_endpoint
 
 @asynccontextmanager
 async def lifespan(app:FastAPI):
     # Startup code
     print("Starting up...")
-    print(init_db.__doc__)
-    await init_db()
+    # the schema is not created here, `alembic upgrade head` runs before deploys
+    redis_manager.open()
+    revoked_tokens.start()
+    mail_outbox.start()
     yield
     # Shutdown code
     print("Shutting down...")
+    await mail_outbox.stop()
+    await revoked_tokens.stop()
+    await redis_manager.close()
 
 version="v1"
 app = FastAPI(
@@ -25,10 +33,13 @@ app = FastAPI(
     description="A simple book management API",
     version=version,
     lifespan=lifespan,
+    # orjson renders the JSON of every route that returns plain data
+    default_response_class=ORJSONResponse,
 )
 
 register_exception_handler(app)
 register_middleware(app)
+app.add_api_route("/metrics",metrics_endpoint,include_in_schema=False)
 
 
 app.include_router(book_router,prefix=f"/api/{version}/books",tags=["books"])
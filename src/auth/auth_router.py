@@ -1,29 +1,26 @@
-from fastapi import APIRouter,Depends,status,BackgroundTasks
+from fastapi import APIRouter,Depends,status
 from src.auth.schemas import UserCreateModel,UserModel,UserLoginModel,EmailSchema,PasswordResetSchema,PasswordResetConfirmSchema
 from src.auth.user_service import UserService
 from src.db.main import get_session
 from fastapi.exceptions import HTTPException
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.auth.utils import access_token,decode_token,verify_password,create_email_token,decode_email_token
+from src.auth.utils import access_token,decode_token,check_password,create_email_token,decode_email_token
 from datetime import timedelta,datetime
 from src.config import Config
 from fastapi.responses import JSONResponse
-from .dependencies import RefreshTokenBearer,AccessTokenBearer,get_current_logged_user,RoleChecker
+from .dependencies import RefreshTokenBearer,access_token_bearer,get_current_logged_user,RoleChecker
 from src.db.redis_client import check_black_list, create_jti_blocklist
-from redmail import gmail
+from src.outbox import mail_outbox
 import os
 from pathlib import Path
-from  src.celerly import send_email
 
 BASE_DIR=Path(__file__).resolve().parent
 
-gmail.username=Config.GMAIL
-gmail.password=Config.GMAIL_PASSWORD
-
 from src.errors import (
     UserAlreadyExists,
     UserNotFound,
-    InvalidToken
+    InvalidToken,
+    InvalidCredentials
 )
 
 refresh_token_bearer=RefreshTokenBearer()
@@ -35,7 +32,7 @@ user_service=UserService()
 role_checker=RoleChecker(['admin','user'])
 
 @auth_router.post("/send_mail")
-async def send_mail(emails: EmailSchema, background_tasks: BackgroundTasks):
+async def send_mail(emails: EmailSchema):
     # Extract the list of addresses from your Pydantic model
     recipient_list = emails.addresses
     
@@ -44,36 +41,26 @@ async def send_mail(emails: EmailSchema, background_tasks: BackgroundTasks):
     <h1>Welcome to Bookly</h1>
     <p>This is a test email from the <b>Bookly</b> application. you are ready to go</p>
     """
-    try:
-        send_email.delay(
-            subject="Test Email from Bookly",
-            receivers=recipient_list,
-            html=html_content,
-            text="This is a test email from the Bookly application. you are ready to go"
-        )
-    except Exception as e:
-        import logging
-        logging.exception("Celery task failed, falling back to background task")
-        background_tasks.add_task(
-            gmail.send,
-            subject="Test Email from Bookly",
-            receivers=recipient_list,
-            html=html_content,
-            text="This is a test email from the Bookly application. you are ready to go"
-        )
+    # queued in the mail outbox, sent by its drainer
+    await mail_outbox.enqueue(
+        subject="Test Email from Bookly",
+        receivers=recipient_list,
+        html=html_content,
+        text="This is a test email from the Bookly application. you are ready to go"
+    )
     
     return {"message": "Email is being sent successfully"}
     
     
 @auth_router.post("/signup",response_model=UserModel,status_code=status.HTTP_201_CREATED)
-async def signup(user_data: UserCreateModel,background_tasks:BackgroundTasks,session:AsyncSession=Depends(get_session)):
+async def signup(user_data: UserCreateModel,session:AsyncSession=Depends(get_session)):
     email=user_data.email
     user_exist = user_service.user_exists(email, session)
     if await user_exist:
         raise UserAlreadyExists()
     user = await user_service.create_user(user_data, session)
 
-    # attempt to create verification token and send email via Celery; fallback to background task
+    # create the verification token and queue the email in the mail outbox
     try:
         domain = Config.DOMAIN
         token = create_email_token({"email": email})
@@ -82,26 +69,15 @@ async def signup(user_data: UserCreateModel,background_tasks:BackgroundTasks,ses
            <h1>Verify your email</h1>
            <p>Click this <a href="{verify_link}">link</a> to verify your email address</p>
         """
-        try:
-            send_email.delay(
-                subject="Verify your email",
-                receivers=[email],
-                html=html_message,
-                text=f"Verify: {verify_link}"
-            )
-        except Exception:
-            import logging
-            logging.exception("Celery task failed, falling back to background task")
-            background_tasks.add_task(
-                gmail.send,
-                subject="Verify your email",
-                receivers=[email],
-                html=html_message,
-                text=f"Verify: {verify_link}"
-            )
+        await mail_outbox.enqueue(
+            subject="Verify your email",
+            receivers=[email],
+            html=html_message,
+            text=f"Verify: {verify_link}"
+        )
     except Exception:
         import logging
-        logging.exception("Failed to create verification token or schedule email")
+        logging.exception("Failed to create verification token or queue email")
 
     return {"verified": user.is_verified, "message": "User created successfully. Please verify your email."}
 
@@ -118,24 +94,25 @@ async def login(user_login_data:UserLoginModel,session:AsyncSession=Depends(get_
     user=await user_service.get_user_by_email(email,session)
     if user is not None:
         # check if password is valid from database
-        password_valid=verify_password(password,user.password_hash)
-        if password_valid:
-            token=access_token(
-                user_data={
-                    "email":email,
-                    "u_id":str(user.uid),
-                    "role":user.role
-                }
-            )
-            # creating a refreash token
-            refreash_token=access_token(
-                user_data={
-                    "email":email,
-                    "u_id":str(user.uid)
-                },
-                refresh=True,
-                expiry=timedelta(days=REFRESH_TOKEN_EXPIRE)
-            )
+        password_valid=await check_password(password,user.password_hash)
+        if not password_valid:
+            raise InvalidCredentials()
+        token=access_token(
+            user_data={
+                "email":email,
+                "u_id":str(user.uid),
+                "role":user.role
+            }
+        )
+        # creating a refreash token
+        refreash_token=access_token(
+            user_data={
+                "email":email,
+                "u_id":str(user.uid)
+            },
+            refresh=True,
+            expiry=timedelta(days=REFRESH_TOKEN_EXPIRE)
+        )
         return JSONResponse(
             content={
                 "message":"Login successful",
@@ -238,7 +215,7 @@ async def delete_user(email:str,session:AsyncSession=Depends(get_session)):
     )
     
 @auth_router.get("/logout")
-async def revoked_token(token_details:dict=Depends(AccessTokenBearer())):
+async def revoked_token(token_details:dict=Depends(access_token_bearer)):
     jti=token_details['jti']
     await create_jti_blocklist(jti)
     
@@ -250,7 +227,7 @@ async def revoked_token(token_details:dict=Depends(AccessTokenBearer())):
     )
     
 @auth_router.post("/password_reset")
-async def password_reset(email:PasswordResetSchema,background_tasks:BackgroundTasks,session:AsyncSession=Depends(get_session)):
+async def password_reset(email:PasswordResetSchema,session:AsyncSession=Depends(get_session)):
       email=email.email
       user=await user_service.get_user_by_email(email,session)
       if not user:
@@ -263,8 +240,7 @@ async def password_reset(email:PasswordResetSchema,background_tasks:BackgroundTa
                   <h1>Password Reset Request</h1>
                   <p>Click this <a href="{reset_link}"> link</a> to reset your password</p>
               """
-           background_tasks.add_task(
-                gmail.send,
+           await mail_outbox.enqueue(
                 subject="Password Reset Request",
                 receivers=[email],
                 html=html_message,
@@ -2,6 +2,7 @@ from fastapi.security import HTTPBearer
 from fastapi.security.http import HTTPAuthorizationCredentials
 from fastapi import Request, status,Depends
 from fastapi.exceptions import HTTPException
+import time
 from .utils import decode_token
 from src.db.redis_client import check_black_list
 from src.db.main import get_session
@@ -33,6 +34,13 @@ class TokenBearer(HTTPBearer):
         super().__init__(auto_error=auto_error)
 
     async def __call__(self, request: Request):
+        started=time.perf_counter()
+        try:
+            return await self.resolve_token(request)
+        finally:
+            record_auth_time(request,started)
+
+    async def resolve_token(self, request: Request):
         creds: HTTPAuthorizationCredentials | None = await super().__call__(request)
 
         if creds is None:
@@ -77,19 +85,38 @@ class RefreshTokenBearer(TokenBearer):
             raise RefreshTokenRequired()
 
 
+def record_auth_time(request:Request,started:float)->None:
+    '''
+    Adds the time spent since started to request.state.auth_time so the
+    middleware can report auth overhead as part of the request timing.
+    '''
+    elapsed=time.perf_counter()-started
+    request.state.auth_time=getattr(request.state,"auth_time",0.0)+elapsed
+
+
+# The one access token dependency of the app.
+# FastAPI caches a dependency per request by its callable, so every route,
+# get_current_logged_user and every RoleChecker that goes through this
+# instance shares a single decode and a single Redis blocklist lookup.
+access_token_bearer=AccessTokenBearer()
+
        
-async def get_current_logged_user(user_details:dict=Depends(AccessTokenBearer()),session:AsyncSession=Depends(get_session)):
+async def get_current_logged_user(request:Request,user_details:dict=Depends(access_token_bearer),session:AsyncSession=Depends(get_session)):
         '''
         This function is used in role base access control to get the current logged in user
-        in our app
+        in our app. It is resolved once per request: the route and all the
+        RoleChecker instances it uses get the same User from one query.
         
         ROLE :
         This function will be used by admin
         '''
         # extracting the user email from user dictionary
-        
-        user_email=user_details['user']['email']
-        user=await user_service.get_user_by_email(user_email,session)
+        started=time.perf_counter()
+        try:
+            user_email=user_details['user']['email']
+            user=await user_service.get_user_by_email(user_email,session)
+        finally:
+            record_auth_time(request,started)
         if user is not None:
             return user
         else:
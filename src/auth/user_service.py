@@ -1,8 +1,12 @@
-from src.db.models import User, Book, Review
+from src.db.models import User, Book, BookTag, Review
 from sqlmodel.ext.asyncio.session import AsyncSession
 from src.auth.schemas import UserCreateModel,UserModel
-from src.auth.utils import generate_hash_password
+from src.auth.utils import hash_password
 from sqlmodel import select
+from sqlalchemy import delete,update,func,or_
+from src.books.cache import invalidate_book
+from src.books.search import search_backend
+from src.books.service import rating_values
 from fastapi import Depends
 from src.db.main import get_session
 from sqlalchemy.exc import IntegrityError
@@ -29,7 +33,7 @@ class UserService:
        
             new_user=user_data.model_dump()
             user=User(**new_user)
-            user.password_hash=generate_hash_password(new_user['password'])
+            user.password_hash=await hash_password(new_user['password'])
             user.role="user"
             session.add(user)
             try:
@@ -71,38 +75,62 @@ class UserService:
             "message":"user is verified"
         }
     async def delete_user(self,email:str,session:AsyncSession):
-        user=await self.get_user_by_email(email=email,session=session)
-        if user:
-            # delete reviews authored by the user
-            statement = select(Review).where(Review.user_uid == user.uid)
-            result = await session.exec(statement)
-            for r in result.all():
-                await session.delete(r)
+        '''
+        Deletes the user, their reviews, their books and everything attached
+        to those books with a fixed number of set based statements, however
+        much data the user has. The rating aggregates of the other books the
+        user reviewed are corrected in the same transaction.
+        '''
+        result=await session.exec(select(User.uid).where(User.email==email))
+        user_uid=result.first()
+        if user_uid is None:
+            return False
 
-            # find books owned by the user
-            book_stmt = select(Book).where(Book.user_uid == user.uid)
-            book_res = await session.exec(book_stmt)
-            books = book_res.all()
+        owned_books=select(Book.id).where(Book.user_uid==user_uid)
+        # nothing of this user is loaded in the session, skip the ORM sync
+        no_sync={"synchronize_session":False}
 
-            # delete reviews for those books, then delete the books
-            for b in books:
-                b_rev_stmt = select(Review).where(Review.book_uid == b.id)
-                b_rev_res = await session.exec(b_rev_stmt)
-                for br in b_rev_res.all():
-                    await session.delete(br)
-                await session.delete(b)
+        # take the user's reviews out of the rating aggregates of the books
+        # they reviewed, one grouped UPDATE ... FROM for all of them
+        written=(
+            select(Review.book_uid,func.sum(Review.rating).label("rating_sum"),func.count().label("reviews"))
+            .where(Review.user_uid==user_uid,Review.book_uid.is_not(None))
+            .group_by(Review.book_uid)
+            .subquery()
+        )
+        result=await session.exec(
+            update(Book)
+            .where(Book.id==written.c.book_uid)
+            .values(**rating_values(-written.c.rating_sum,-written.c.reviews))
+            .returning(Book.id),
+            execution_options=no_sync
+        )
+        rated_ids=result.scalars().all()
 
-            # finally delete the user
-            await session.delete(user)
-            await session.commit()
-            return True
-        return False
+        # reviews written by the user and reviews left on the user's books
+        await session.exec(
+            delete(Review).where(or_(Review.user_uid==user_uid,Review.book_uid.in_(owned_books))),
+            execution_options=no_sync
+        )
+        await session.exec(delete(BookTag).where(BookTag.book_id.in_(owned_books)),execution_options=no_sync)
+        result=await session.exec(
+            delete(Book).where(Book.user_uid==user_uid).returning(Book.id),
+            execution_options=no_sync
+        )
+        book_ids=result.scalars().all()
+        await session.exec(delete(User).where(User.uid==user_uid),execution_options=no_sync)
+        await session.commit()
+
+        await invalidate_book(*set(rated_ids).union(book_ids))
+        for book_id in book_ids:
+            search_backend.remove_book(book_id)
+        return True
             
     async def update_user_password(self, email: str, new_password: str, session: AsyncSession):
         user = await self.get_user_by_email(email=email, session=session)
         if user:
             # hash the provided plaintext password and store it on the user
-            user.password_hash = generate_hash_password(new_password)
+            user.password_hash = await hash_password(new_password)
             session.add(user)
             await session.commit()
             await session.refresh(user)
@@ -5,8 +5,13 @@ from datetime import datetime
 import jwt
 import uuid
 from src.config import Config
-from itsdangerous import URLSafeTimedSerializer
 import logging
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from src.errors import HashingOverloaded
+from src.metrics import password_hash_seconds,password_hash_rejections
 
 def generate_hash_password(password:str)->str:
     '''
@@ -32,6 +37,43 @@ def verify_password(password:str,hashed_password:str)->bool:
     return bcrypt.checkpw(pw_bytes, hashed_bytes)
 
 
+class HashingPool:
+    '''
+    Runs bcrypt off the event loop.
+    bcrypt releases the GIL while it hashes, so a few threads hash in parallel
+    while the loop keeps serving other requests. At most workers hashes run at
+    once and at most queue_limit more wait for a thread; beyond that the call
+    fails fast with HashingOverloaded instead of queueing without bound.
+    '''
+    def __init__(self,workers:int,queue_limit:int)->None:
+        self.executor=ThreadPoolExecutor(max_workers=workers,thread_name_prefix="bcrypt")
+        self.capacity=workers+queue_limit
+        self.pending=0
+
+    async def run(self,operation:str,func,*args):
+        if self.pending>=self.capacity:
+            password_hash_rejections.labels(operation).inc()
+            raise HashingOverloaded()
+        self.pending+=1
+        started=time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor,func,*args)
+        finally:
+            self.pending-=1
+            password_hash_seconds.labels(operation).observe(time.perf_counter()-started)
+
+
+hashing_pool=HashingPool(Config.HASH_WORKERS,Config.HASH_QUEUE_LIMIT)
+
+async def hash_password(password:str)->str:
+    '''Async version of generate_hash_password for request handlers.'''
+    return await hashing_pool.run("hash",generate_hash_password,password)
+
+async def check_password(password:str,hashed_password:str)->bool:
+    '''Async version of verify_password for request handlers.'''
+    return await hashing_pool.run("verify",verify_password,password,hashed_password)
+
+
 def access_token(user_data:dict,expiry:td=None,refresh:bool=False):
     '''
      This function generates an JWT access token for the user.
@@ -79,7 +121,11 @@ def decode_token(token:str)->dict:
         raise Exception("Invalid token")
     
 
-serializer=URLSafeTimedSerializer(Config.SECRET_KEY,salt="email-configration")
+@cache
+def email_serializer():
+    '''Built on the first email token, itsdangerous is not imported with the app.'''
+    from itsdangerous import URLSafeTimedSerializer
+    return URLSafeTimedSerializer(Config.SECRET_KEY,salt="email-configration")
 
 def create_email_token(data:dict):
     """This function creates a time-sensitive email token using itsdangerous library.
@@ -88,12 +134,12 @@ def create_email_token(data:dict):
         data (dict): The data to be included in the token.
     """
     
-    token=serializer.dumps(data)
+    token=email_serializer().dumps(data)
     return token
 
 def decode_email_token(token:str)->dict:
     try:
-        email_token_data=serializer.loads(token)
+        email_token_data=email_serializer().loads(token)
         return email_token_data
     except Exception as e:
         logging.error(f"Error decoding email token: {e}")
@@ -0,0 +1,68 @@
+# Read-through cache for the GET /books/{book_uid} response.
+# Entries hold the ETag and the serialized Book JSON, separated by a newline.
+# Every write that changes a book replaces its entry with an empty tombstone
+# for BOOK_CACHE_TOMBSTONE_MS, and fills only SET when the key is absent, so a
+# reader that loaded the row before the write can not put it back afterwards.
+# The TTL only backs up a missed invalidation.
+import logging
+from redis.exceptions import RedisError
+from src.config import Config
+from src.db.redis_client import redis_manager
+from src.metrics import book_cache_requests
+
+logger=logging.getLogger(__name__)
+
+BOOK_CACHE_PREFIX="book:"
+
+
+def _cache_key(book_id)->str:
+    return f"{BOOK_CACHE_PREFIX}{book_id}"
+
+
+async def get_cached_book(book_id)->tuple[str,bytes]|None:
+    '''
+    Returns the (etag, JSON) of the book or None on a miss.
+    A Redis failure is counted as an error and treated as a miss.
+    '''
+    try:
+        payload=await redis_manager.run("get",_cache_key(book_id))
+    except RedisError:
+        logger.warning("book cache read failed for %s",book_id,exc_info=True)
+        book_cache_requests.labels("error").inc()
+        return None
+    # an empty value is the tombstone of a recent write
+    book_cache_requests.labels("hit" if payload else "miss").inc()
+    if not payload:
+        return None
+    if isinstance(payload,str):
+        payload=payload.encode("utf-8")
+    etag,_,body=payload.partition(b"\n")
+    return etag.decode("ascii"),body
+
+
+async def cache_book(book_id,payload:str,etag:str)->None:
+    '''
+    Fills the entry unless the key exists. While a tombstone is there the
+    row the caller loaded may predate the write, and the fill is dropped.
+    '''
+    try:
+        await redis_manager.run("set",_cache_key(book_id),f"{etag}\n{payload}",ex=Config.BOOK_CACHE_TTL,nx=True)
+    except RedisError:
+        logger.warning("book cache write failed for %s",book_id,exc_info=True)
+
+
+async def invalidate_book(*book_ids)->None:
+    '''
+    Called after the write has been committed. Replaces the entries with
+    tombstones, readers that loaded the book before the commit can not
+    refill it until the tombstone expires. Several ids go in one round trip.
+    '''
+    if not book_ids:
+        return
+    try:
+        await redis_manager.batch([
+            ("psetex",_cache_key(book_id),Config.BOOK_CACHE_TOMBSTONE_MS,"")
+            for book_id in book_ids
+        ])
+    except RedisError:
+        logger.warning("book cache invalidation failed for %s",book_ids,exc_info=True)
@@ -0,0 +1,40 @@
+# Encoders for the catalog export.
+# Both take the async iterator of row batches produced by
+# BookService.stream_books and turn every batch into one text chunk,
+# so only a single batch is ever held in memory.
+import csv
+import io
+import json
+import uuid
+from datetime import datetime
+from typing import AsyncIterator,Iterable,Mapping
+from src.books.schemas import Book
+
+EXPORT_FIELDS=list(Book.model_fields)
+
+
+def _json_default(value):
+    if isinstance(value,datetime):
+        return value.isoformat()
+    if isinstance(value,uuid.UUID):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+async def ndjson_chunks(batches:AsyncIterator[Iterable[Mapping]])->AsyncIterator[str]:
+    '''Yields one JSON object per line.'''
+    async for rows in batches:
+        yield "".join(json.dumps(dict(row),default=_json_default)+"\n" for row in rows)
+
+
+async def csv_chunks(batches:AsyncIterator[Iterable[Mapping]])->AsyncIterator[str]:
+    '''Yields the header row right away, then one chunk of rows per batch.'''
+    buffer=io.StringIO()
+    writer=csv.DictWriter(buffer,fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    yield buffer.getvalue()
+    async for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
@@ -1,29 +1,88 @@
-from fastapi import APIRouter,status,Depends
+from fastapi import APIRouter,status,Depends,Query,Body,Request
 from fastapi.exceptions import HTTPException
-from src.books.schemas import Book,BookUpdate,BookCreateModel
-from src.db.main import get_session
+from fastapi.responses import StreamingResponse,Response
+from typing import Optional,Literal,Any
+from src.books.schemas import Book,BookUpdate,BookCreateModel,BookPage,BookBulkResult,BookSearchPage
+from src.config import Config
+from src.db.main import get_session,get_read_session
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.books.service import BookService
+from src.books.service import BookService,BOOK_LIST_FIELDS
+from src.db.projection import parse_fields
+from src.books.export import ndjson_chunks,csv_chunks
+from src.books.cache import get_cached_book,cache_book
+from src.etag import make_etag,etag_matches,not_modified
+from src.serializers import book_page_serializer,review_page_serializer
+from src.reviews.review_service import ReviewService
+from src.reviews.schema import ReviewPage
 import uuid
 from src.errors import (
     BookNotFound,
     BookInsertionError
 )
-from src.auth.dependencies import AccessTokenBearer,RoleChecker
+from src.auth.dependencies import access_token_bearer,RoleChecker
 
 role_checker=RoleChecker(['admin','user'])
 book_router=APIRouter()
 book_service=BookService()
-access_token_bearer=AccessTokenBearer()
+review_service=ReviewService()
 
-@book_router.get("/",response_model=list[Book])
-async def get_all_books(session:AsyncSession=Depends(get_session),user_details=Depends(access_token_bearer),_:bool=Depends(role_checker))->list:
-   print(user_details)
-   books= await book_service.get_all_books(session)
-   return books
+@book_router.get("/",response_model=BookPage)
+async def get_all_books(
+   limit:int=Query(default=20,ge=1,le=100),
+   cursor:Optional[str]=None,
+   sort:Literal["newest","top_rated"]="newest",
+   fields:Optional[str]=Query(default=None,description="comma separated book fields to return, id is always included"),
+   include:Optional[Literal["tags"]]=None,
+   session:AsyncSession=Depends(get_read_session),
+   user_details=Depends(access_token_bearer),
+   _:bool=Depends(role_checker)
+)->dict:
+   books,next_cursor= await book_service.get_all_books(
+      session,
+      limit=limit,
+      cursor=cursor,
+      sort=sort,
+      fields=parse_fields(fields,BOOK_LIST_FIELDS),
+      include_tags=include=="tags"
+   )
+   return book_page_serializer.response({"books":books,"next_cursor":next_cursor})
 
+@book_router.get("/search",response_model=BookSearchPage)
+async def search_books(
+   q:str=Query(min_length=1,max_length=200),
+   limit:int=Query(default=20,ge=1,le=100),
+   offset:int=Query(default=0,ge=0,le=10000),
+   session:AsyncSession=Depends(get_read_session),
+   user_details=Depends(access_token_bearer),
+   _:bool=Depends(role_checker)
+)->dict:
+   books,next_offset=await book_service.search_books(q,session,limit=limit,offset=offset)
+   return {"books":books,"next_offset":next_offset}
+
+@book_router.get("/export")
+async def export_books(
+   export_format:Literal["ndjson","csv"]=Query(default="ndjson",alias="format"),
+   session:AsyncSession=Depends(get_read_session),
+   user_details=Depends(access_token_bearer),
+   _:bool=Depends(role_checker)
+)->StreamingResponse:
+   '''
+   Streams the full catalog as NDJSON (default) or CSV.
+   Rows are written as they come off the database cursor, the session
+   stays open until the last chunk has been sent.
+   '''
+   batches=book_service.stream_books(session)
+   if export_format=="csv":
+      return StreamingResponse(
+         csv_chunks(batches),
+         media_type="text/csv",
+         headers={"Content-Disposition":"attachment; filename=books.csv"}
+      )
+   return StreamingResponse(ndjson_chunks(batches),media_type="application/x-ndjson")
+
+# the primary: a user looks at their submissions right after submitting
 @book_router.get("/user/{u_id}",response_model=list[Book])
-async def get_user_book_submission(u_id:str,session:AsyncSession=Depends(get_session),user_details:dict=Depends(AccessTokenBearer())):
+async def get_user_book_submission(u_id:str,session:AsyncSession=Depends(get_session),user_details:dict=Depends(access_token_bearer)):
     try:
 
         get_book_details=await book_service.get_user_book_submission(u_id=u_id,session=session)
@@ -40,19 +99,83 @@ async def create_book(book_data:BookCreateModel,user_details:dict=Depends(access
     except:
         raise BookInsertionError()
 
+@book_router.post("/bulk",response_model=BookBulkResult)
+async def bulk_create_books(
+   records:list[dict[str,Any]]=Body(...),
+   user_details:dict=Depends(access_token_bearer),
+   session:AsyncSession=Depends(get_session),
+   _:bool=Depends(role_checker)
+)->dict:
+   '''
+   Creates up to BOOK_BULK_MAX_ROWS books in one request.
+   Records are validated one by one, so a bad record is reported in
+   the results instead of rejecting the whole batch.
+   '''
+   if len(records)>Config.BOOK_BULK_MAX_ROWS:
+      raise HTTPException(
+         status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+         detail=f"At most {Config.BOOK_BULK_MAX_ROWS} books can be created per request"
+      )
+   user_id=user_details.get('user')['u_id']
+   results=await book_service.bulk_create_books(records,user_id,session,chunk_size=Config.BOOK_BULK_CHUNK_SIZE)
+   created=sum(1 for result in results if result["status"]=="created")
+   return {"created":created,"failed":len(results)-created,"results":results}
+
 @book_router.get("/{book_uid}",response_model=Book)
-async def get_book_by_id(book_uid:str,session:AsyncSession=Depends(get_session),user_details=Depends(access_token_bearer),_:bool=Depends(role_checker))->dict:
+async def get_book_by_id(request:Request,book_uid:str,session:AsyncSession=Depends(get_session),user_details=Depends(access_token_bearer),_:bool=Depends(role_checker))->dict:
+    '''
+    Honours If-None-Match: a client that already has the current version gets
+    a 304, decided from the cache or from updated_at alone, before the book is
+    loaded or serialized.
+    Reads the primary: a miss refills the shared cache, which must not get a
+    version from a lagging replica back after a write invalidated it.
+    '''
     try:
         book_id=uuid.UUID(book_uid)
     except ValueError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="Invalid book UID format")
 
+    if_none_match=request.headers.get("if-none-match")
+    cached=await get_cached_book(book_id)
+    if cached is not None:
+        etag,payload=cached
+        if etag_matches(if_none_match,etag):
+            return not_modified(etag)
+        return Response(content=payload,media_type="application/json",headers={"ETag":etag})
+
+    if if_none_match:
+        updated_at=await book_service.get_book_version(book_id,session)
+        if updated_at is None:
+            raise BookNotFound()
+        etag=make_etag(book_id,updated_at)
+        if etag_matches(if_none_match,etag):
+            return not_modified(etag)
+
     book=await book_service.get_book_by_id(book_id,session)
     if book:
-        return book
+        etag=make_etag(book.id,book.updated_at)
+        payload=Book.model_validate(book,from_attributes=True).model_dump_json()
+        await cache_book(book_id,payload,etag)
+        return Response(content=payload,media_type="application/json",headers={"ETag":etag})
     else:
         raise BookNotFound()
 
+@book_router.get("/{book_uid}/reviews",response_model=ReviewPage)
+async def get_book_reviews(
+   book_uid:uuid.UUID,
+   limit:int=Query(default=20,ge=1,le=100),
+   cursor:Optional[str]=None,
+   session:AsyncSession=Depends(get_read_session),
+   user_details=Depends(access_token_bearer),
+   _:bool=Depends(role_checker)
+)->dict:
+   '''
+   The reviews of one book, newest first, a page at a time.
+   An unknown book simply has no reviews.
+   '''
+   reviews,next_cursor=await review_service.get_book_reviews(book_uid,session,limit=limit,cursor=cursor)
+   return review_page_serializer.response({"reviews":reviews,"next_cursor":next_cursor})
+
 @book_router.patch("/{book_uid}", response_model=Book)
 async def update_book(book_uid:str,book_update:BookUpdate,session:AsyncSession=Depends(get_session),user_details=Depends(access_token_bearer),_:bool=Depends(role_checker)) -> Book:
        try:
@@ -1,7 +1,8 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import Optional,Literal
 import uuid
+from src.tags.schemas import TagSchema
 class Book(BaseModel):
     '''This class represents a book with various attributes.
        It is used for data validation in FastAPI endpoints.
@@ -15,9 +16,45 @@ class Book(BaseModel):
     price: float
     available: bool
     summary: str
+    rating_count: int=0
+    rating_avg: float=0
     created_at: datetime
     updated_at: datetime
 
+class BookListItem(BaseModel):
+    '''A book in the book listing.
+       Every field is optional because ?fields= may leave some out, the route drops
+       the unset ones from the response. tags is only set with ?include=tags.
+    '''
+    id: Optional[uuid.UUID]=None
+    title: Optional[str]=None
+    author: Optional[str]=None
+    year: Optional[int]=None
+    isbn: Optional[str]=None
+    pages: Optional[int]=None
+    price: Optional[float]=None
+    available: Optional[bool]=None
+    summary: Optional[str]=None
+    rating_count: Optional[int]=None
+    rating_avg: Optional[float]=None
+    created_at: Optional[datetime]=None
+    updated_at: Optional[datetime]=None
+    tags: Optional[list[TagSchema]]=None
+
+class BookPage(BaseModel):
+    '''One page of the book listing.
+       next_cursor is None on the last page, otherwise it is sent back as ?cursor= to get the next page.
+    '''
+    books: list[BookListItem]
+    next_cursor: Optional[str]=None
+
+class BookSearchPage(BaseModel):
+    '''One page of search results, best match first.
+       next_offset is None on the last page, otherwise it is sent back as ?offset= to get the next page.
+    '''
+    books: list[Book]
+    next_offset: Optional[int]=None
+
 class BookUpdate(BaseModel):
     '''This class represents the fields that can be updated for a book.
        All fields are optional to allow partial updates.
@@ -40,5 +77,18 @@ class BookCreateModel(BaseModel):
     available: bool
     summary: str
 
+class BookBulkRowResult(BaseModel):
+    '''Outcome of one record of a bulk create, index is its position in the request body.'''
+    index: int
+    status: Literal["created","failed"]
+    id: Optional[uuid.UUID]=None
+    error: Optional[str]=None
+
+class BookBulkResult(BaseModel):
+    '''Summary of a bulk create with one result per submitted record.'''
+    created: int
+    failed: int
+    results: list[BookBulkRowResult]
+
 class Config:
       orm_mode = True
\ No newline at end of file
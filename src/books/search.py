@@ -0,0 +1,189 @@
+# Pluggable full-text search over book title, author and summary.
+# PostgresSearchBackend ranks matches with ts_rank on the GIN indexed
+# tsvector. InMemorySearchBackend keeps an inverted index inside the process
+# for local development and tests (SQLite has no tsvector); every worker
+# builds its own copy, so it is not meant for multi-worker deployments.
+# Building it is CPU work, roughly a second per 15k books, done on the first
+# search in small batches that give the event loop back in between. Searches
+# wait for it to finish, other requests keep being served.
+import asyncio
+import heapq
+import math
+import operator
+import re
+import uuid
+from collections import defaultdict
+from sqlalchemy import literal_column,func
+from sqlmodel import select,desc
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.config import Config
+from src.db.models import Book,BOOK_SEARCH_DOCUMENT
+
+TOKEN_PATTERN=re.compile(r"[a-z0-9]+")
+# books indexed between two yields to the event loop while the index is built
+INDEX_BATCH_SIZE=200
+
+
+def tokenize(value:str)->list[str]:
+    return TOKEN_PATTERN.findall(value.lower())
+
+
+class SearchBackend:
+    '''
+    Interface of a search backend. search returns the Book rows of one page,
+    best match first, and whether another page exists.
+    BookService calls index_book / remove_book on every write so backends
+    that keep their own index stay current.
+    '''
+    async def search(self,query:str,session:AsyncSession,limit:int,offset:int)->tuple[list[Book],bool]:
+        raise NotImplementedError("Please override this method in child classes")
+
+    def index_book(self,book_id:uuid.UUID,title:str,author:str,summary:str)->None:
+        pass
+
+    def remove_book(self,book_id:uuid.UUID)->None:
+        pass
+
+
+class PostgresSearchBackend(SearchBackend):
+    async def search(self,query:str,session:AsyncSession,limit:int,offset:int)->tuple[list[Book],bool]:
+        document=literal_column(BOOK_SEARCH_DOCUMENT)
+        ts_query=func.websearch_to_tsquery(literal_column("'english'"),query)
+        statement=(
+            select(Book)
+            .where(document.op("@@")(ts_query))
+            .order_by(desc(func.ts_rank(document,ts_query)),desc(Book.id))
+            .offset(offset)
+            .limit(limit+1)
+        )
+        result=await session.exec(statement)
+        books=result.all()
+        return books[:limit],len(books)>limit
+
+
+class InvertedIndex:
+    '''
+    term -> {doc: term frequency}. A query matches the books that contain
+    every term, scored with tf-idf so rare terms weigh more.
+
+    Books are numbered in the order they are indexed and the postings are
+    keyed by that number: small ints hash and compare in C, a uuid.UUID
+    hashes in python, which made up most of the time of a search over a
+    common term. Equal scores rank the later indexed book first.
+    '''
+    def __init__(self)->None:
+        self.postings:dict[str,dict[int,int]]=defaultdict(dict)
+        self.terms:dict[int,set[str]]={}
+        self.docs:dict[uuid.UUID,int]={}
+        self.ids:dict[int,uuid.UUID]={}
+        self.next_doc=0
+
+    def add(self,book_id:uuid.UUID,text:str)->None:
+        self.remove(book_id)
+        doc=self.next_doc
+        self.next_doc+=1
+        self.docs[book_id]=doc
+        self.ids[doc]=book_id
+        counts:dict[str,int]=defaultdict(int)
+        for token in tokenize(text):
+            counts[token]+=1
+        for token,count in counts.items():
+            self.postings[token][doc]=count
+        self.terms[doc]=set(counts)
+
+    def remove(self,book_id:uuid.UUID)->None:
+        doc=self.docs.pop(book_id,None)
+        if doc is None:
+            return
+        del self.ids[doc]
+        for token in self.terms.pop(doc):
+            posting=self.postings[token]
+            posting.pop(doc,None)
+            if not posting:
+                del self.postings[token]
+
+    def search(self,query:str,top:int|None=None)->list[uuid.UUID]:
+        '''
+        Ids of the matching books, best first. With top only the best top
+        are ranked, a page of a common term does not sort every match.
+        '''
+        tokens=set(tokenize(query))
+        if not tokens or any(token not in self.postings for token in tokens):
+            return []
+        postings=sorted((self.postings[token] for token in tokens),key=len)
+        total=len(self.terms)
+        if len(postings)==1:
+            # one term: its weight is the same for every book, rank by frequency
+            posting=postings[0]
+            scored=zip(posting.values(),posting.keys())
+        else:
+            matches=postings[0].keys()&postings[1].keys()
+            for posting in postings[2:]:
+                matches&=posting.keys()
+            docs=list(matches)
+            # one pass over the matches per term, in map() rather than a python loop
+            scores=[0.0]*len(docs)
+            for posting in postings:
+                weight=math.log(1+total/len(posting))
+                scores=list(map(operator.add,scores,map(weight.__mul__,map(posting.__getitem__,docs))))
+            scored=zip(scores,docs)
+        ranked=sorted(scored,reverse=True) if top is None else heapq.nlargest(top,scored)
+        return [self.ids[doc] for _,doc in ranked]
+
+
+class InMemorySearchBackend(SearchBackend):
+    def __init__(self)->None:
+        self.index=InvertedIndex()
+        self.loaded=False
+        self.lock=asyncio.Lock()
+        # books written while the index is being built, their rows in the
+        # running load may be older than what index_book / remove_book did
+        self.changed:set[uuid.UUID]|None=None
+
+    async def load(self,session:AsyncSession)->None:
+        '''Builds the index from the books table on the first search.'''
+        async with self.lock:
+            if self.loaded:
+                return
+            self.changed=set()
+            try:
+                result=await session.stream(
+                    select(Book.id,Book.title,Book.author,Book.summary).execution_options(yield_per=INDEX_BATCH_SIZE)
+                )
+                async for rows in result.partitions():
+                    for book_id,title,author,summary in rows:
+                        if book_id not in self.changed:
+                            self.index.add(book_id,f"{title} {author} {summary}")
+                    await asyncio.sleep(0)
+                self.loaded=True
+            finally:
+                self.changed=None
+
+    async def search(self,query:str,session:AsyncSession,limit:int,offset:int)->tuple[list[Book],bool]:
+        if not self.loaded:
+            await self.load(session)
+        ids=self.index.search(query,top=offset+limit+1)[offset:]
+        page=ids[:limit]
+        if not page:
+            return [],False
+        result=await session.exec(select(Book).where(Book.id.in_(page)))
+        books={book.id:book for book in result.all()}
+        return [books[book_id] for book_id in page if book_id in books],len(ids)>limit
+
+    def index_book(self,book_id:uuid.UUID,title:str,author:str,summary:str)->None:
+        if self.changed is not None:
+            self.changed.add(book_id)
+        self.index.add(book_id,f"{title} {author} {summary}")
+
+    def remove_book(self,book_id:uuid.UUID)->None:
+        if self.changed is not None:
+            self.changed.add(book_id)
+        self.index.remove(book_id)
+
+
+SEARCH_BACKENDS={
+    "postgres":PostgresSearchBackend,
+    "memory":InMemorySearchBackend,
+}
+
+search_backend:SearchBackend=SEARCH_BACKENDS[Config.SEARCH_BACKEND]()
@@ -1,24 +1,113 @@
 # This file contains the logic for crud operations on the Book model.
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.books.schemas import BookCreateModel,BookUpdate
+from src.books.schemas import BookCreateModel,BookUpdate,BookListItem
 from sqlmodel import select,desc
-from src.db.models import Book
+from sqlalchemy import tuple_,insert,update,case,cast,Float
+from sqlalchemy.exc import IntegrityError,SQLAlchemyError
+from pydantic import ValidationError
+from datetime import datetime
+from src.db.models import Book,BookTag,Tag
+from src.db.pagination import decode_cursor,split_page
+from src.books.export import EXPORT_FIELDS
+from src.books.cache import invalidate_book
+from src.books.search import search_backend
 from fastapi.exceptions import HTTPException
 from fastapi import status
 import uuid
+import logging
+
+logger=logging.getLogger(__name__)
+
+# what a bulk create reports for a row the database refused, the database's
+# own message (constraint names, values) is only logged
+BULK_ROW_REJECTED="rejected by a database constraint"
+BULK_ROW_NOT_STORED="could not be stored"
+
+# columns a client can ask for with ?fields= on the book listing
+BOOK_LIST_FIELDS=tuple(name for name in BookListItem.model_fields if name!="tags")
 
 class BookService:
     '''This BookService class contains methods for CRUD operations on the Book model.
        When a method is called, it interacts with the database using the provided session.
     '''
-    async def get_all_books(self,session:AsyncSession):
-        '''This method retrives all books from the database.
-           It returns a list of Book objects.
+    async def get_all_books(
+        self,
+        session:AsyncSession,
+        limit:int=20,
+        cursor:str|None=None,
+        sort:str="newest",
+        fields:list[str]|tuple[str,...]=BOOK_LIST_FIELDS,
+        include_tags:bool=False
+    ):
+        '''This method retrives one page of books, newest first, or best rated first
+           with sort="top_rated".
+           Pages are keyed on (created_at, id) or (rating_avg, id) so every page is a
+           range scan on ix_books_created_at_id / ix_books_rating_avg_id no matter how
+           deep the client goes.
+           Only the id and the given fields are selected, as plain rows, so no Book
+           objects are built and their tags are not loaded unless include_tags is set.
+           It returns the books of the page as dicts and the cursor of the next page.
         '''
-        statement = select(Book).order_by(desc(Book.created_at))
+        if sort=="top_rated":
+            sort_key,key_type=Book.rating_avg,float
+        else:
+            sort_key,key_type=Book.created_at,datetime
+        names=list(dict.fromkeys(["id",*fields]))
+        columns=[getattr(Book,name) for name in names]
+        # the cursor is built from the sort key, read it even when it is not returned
+        if sort_key.key not in names:
+            columns.append(sort_key)
+        statement = select(*columns).order_by(desc(sort_key),desc(Book.id)).limit(limit+1)
+        if cursor:
+            key,book_id=decode_cursor(cursor,key_type=key_type)
+            statement=statement.where(tuple_(sort_key,Book.id)<tuple_(key,book_id))
         result = await session.exec(statement)
-        return result.all()
+        rows,next_cursor=split_page(result.all(),limit,sort_key.key,"id")
+        books=[dict(zip(names,row)) for row in rows]
+        if include_tags:
+            await self._attach_tags(books,session)
+        return books,next_cursor
+
+    async def _attach_tags(self,books:list[dict],session:AsyncSession)->None:
+        '''Loads the tags of a whole page with one join query and sets book["tags"].'''
+        tags={book["id"]:[] for book in books}
+        for book in books:
+            book["tags"]=tags[book["id"]]
+        if not tags:
+            return
+        statement=(
+            select(BookTag.book_id,Tag.uid,Tag.name,Tag.created_at)
+            .join(Tag,Tag.uid==BookTag.tag_id)
+            .where(BookTag.book_id.in_(tags))
+            .order_by(Tag.name)
+        )
+        result=await session.exec(statement)
+        for book_id,uid,name,created_at in result.all():
+            tags[book_id].append({"uid":uid,"name":name,"created_at":created_at})
     
+    async def search_books(self,query:str,session:AsyncSession,limit:int=20,offset:int=0):
+        '''This method runs a ranked full-text search over title, author and summary
+           through the configured search backend (SEARCH_BACKEND).
+           It returns the Book objects of the page and the offset of the next page.
+        '''
+        books,has_more=await search_backend.search(query,session,limit,offset)
+        return books,(offset+limit if has_more else None)
+
+    async def stream_books(self,session:AsyncSession,batch_size:int=1000):
+        '''This method streams the whole catalog through a server side cursor.
+           Rows are read as plain column mappings (no ORM objects, no tags) and
+           handed out batch_size at a time, so memory stays flat whatever the table size.
+        '''
+        columns=[Book.__table__.c[name] for name in EXPORT_FIELDS]
+        statement=(
+            select(*columns)
+            .order_by(desc(Book.created_at),desc(Book.id))
+            .execution_options(yield_per=batch_size)
+        )
+        result=await session.stream(statement)
+        async for rows in result.mappings().partitions():
+            yield rows
+
     async def get_user_book_submission(self,u_id:str,session:AsyncSession):
         statement=select(Book).where(Book.user_uid==u_id)
         result=await session.exec(statement)
@@ -39,6 +128,13 @@ class BookService:
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Book not found"
             )
+    async def get_book_version(self,book_uid:uuid.UUID,session:AsyncSession)->datetime|None:
+        '''This method reads only updated_at of a book, the version its ETag is built from.
+           It returns None when the book does not exist.
+        '''
+        result=await session.exec(select(Book.updated_at).where(Book.id==book_uid))
+        return result.first()
+
     async def create_book(self,book_data:BookCreateModel,user_uid:str,session:AsyncSession):
           book_data_dict=book_data.model_dump()
           new_book=Book(**book_data_dict)
@@ -46,8 +142,58 @@ class BookService:
           session.add(new_book)
           await session.commit()
           await session.refresh(new_book)
+          search_backend.index_book(new_book.id,new_book.title,new_book.author,new_book.summary)
           return new_book
-          
+
+    async def bulk_create_books(self,records:list[dict],user_uid:str,session:AsyncSession,chunk_size:int=500)->list[dict]:
+          '''This method creates many books in one transaction.
+             Every record is validated against BookCreateModel on its own, the valid ones
+             are written chunk_size at a time with a multi-row INSERT ... RETURNING.
+             A chunk runs in a savepoint; if the database rejects it, its rows are
+             retried one by one so only the offending records fail.
+             It returns one result dict per record, in request order.
+          '''
+          owner=uuid.UUID(str(user_uid))
+          now=datetime.now()
+          results=[None]*len(records)
+          valid=[]
+          for index,record in enumerate(records):
+                try:
+                      book=BookCreateModel.model_validate(record)
+                except ValidationError as err:
+                      results[index]=_failed(index,_describe(err))
+                      continue
+                values=book.model_dump()
+                values.update(id=uuid.uuid4(),user_uid=owner,created_at=now,updated_at=now)
+                valid.append((index,values))
+
+          for start in range(0,len(valid),chunk_size):
+                chunk=valid[start:start+chunk_size]
+                try:
+                      ids=await self._insert_books(session,[values for _,values in chunk])
+                      for (index,_),book_id in zip(chunk,ids):
+                            results[index]={"index":index,"status":"created","id":book_id}
+                except SQLAlchemyError:
+                      for index,values in chunk:
+                            try:
+                                  [book_id]=await self._insert_books(session,[values])
+                                  results[index]={"index":index,"status":"created","id":book_id}
+                            except SQLAlchemyError as err:
+                                  logger.warning("bulk create: record %s refused: %s",index,getattr(err,"orig",err))
+                                  reason=BULK_ROW_REJECTED if isinstance(err,IntegrityError) else BULK_ROW_NOT_STORED
+                                  results[index]=_failed(index,reason)
+          await session.commit()
+          for index,values in valid:
+                if results[index]["status"]=="created":
+                      search_backend.index_book(values["id"],values["title"],values["author"],values["summary"])
+          return results
+
+    async def _insert_books(self,session:AsyncSession,rows:list[dict])->list[uuid.UUID]:
+          async with session.begin_nested():
+                statement=insert(Book).returning(Book.id,sort_by_parameter_order=True)
+                result=await session.exec(statement,params=rows)
+                return result.scalars().all()
+
     async def update_book(self,book_uid,update_data:BookUpdate,session:AsyncSession):
             if isinstance(book_uid, uuid.UUID):
                 book_id = book_uid
@@ -62,18 +208,55 @@ class BookService:
              for key,value in update_data_dict.items():
                 setattr(book_to_update,key,value)
              await session.commit()
+             await invalidate_book(book_to_update.id)
+             search_backend.index_book(book_to_update.id,book_to_update.title,book_to_update.author,book_to_update.summary)
              return book_to_update
             else:
                 return None
             
               
                 
+    async def adjust_rating(self,book_uid:uuid.UUID,session:AsyncSession,rating_delta:int,count_delta:int)->None:
+          '''This method moves the rating aggregates of a book with a single atomic UPDATE,
+             so concurrent reviews of the same book can not lose each other's changes.
+             It does not commit, the caller commits it together with the review write.
+          '''
+          statement=update(Book).where(Book.id==book_uid).values(**rating_values(rating_delta,count_delta))
+          await session.exec(statement,execution_options={"synchronize_session":False})
+
     async def delete_book(self,book_uid:str,session:AsyncSession):
           book_to_delete= await self.get_book_by_id(book_uid,session)
           if book_to_delete is not None:
                 await session.delete(book_to_delete)
                 await session.commit()
+                await invalidate_book(book_to_delete.id)
+                search_backend.remove_book(book_to_delete.id)
                 return True
           else:
                 return False
 
+
+def rating_values(rating_delta,count_delta)->dict:
+      '''
+      SET clause that shifts rating_sum and rating_count by the given deltas and
+      recomputes rating_avg from the shifted values. The deltas may be plain
+      numbers or columns of a subquery for UPDATE ... FROM.
+      '''
+      rating_sum=Book.rating_sum+rating_delta
+      rating_count=Book.rating_count+count_delta
+      return {
+            "rating_sum":rating_sum,
+            "rating_count":rating_count,
+            "rating_avg":case((rating_count>0,cast(rating_sum,Float)/rating_count),else_=0.0),
+            "updated_at":datetime.now(),
+      }
+
+
+def _failed(index:int,error:str)->dict:
+      return {"index":index,"status":"failed","error":error}
+
+
+def _describe(err:ValidationError)->str:
+      return "; ".join(
+            f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in err.errors()
+      )
@@ -1,5 +1,7 @@
 from celery import Celery
+from celery.signals import worker_process_shutdown,worker_shutdown
 from src.config import Config
+from src.mail import BatchMailer
 from redmail import gmail
 
 gmail.username=Config.GMAIL
@@ -8,18 +10,27 @@ celery_app=Celery()
 
 celery_app.config_from_object('src.config')
 
+# one SMTP session per worker process, reused by every mail task it runs
+mailer=BatchMailer(gmail)
+
 @celery_app.task
 def send_email(receivers=None, subject=None, text=None, html=None, **kwargs):
-     try:
-          # redmail.gmail.send is synchronous and returns an EmailMessage object.
-          message = gmail.send(
-               subject=subject,
-               receivers=receivers,
-               text=text,
-               html=html,
-               **kwargs,
-          )
-          return {"status": "sent", "result": str(message)}
-     except Exception as e:
-          return {"status": "error", "error": str(e)}
- 
\ No newline at end of file
+     return mailer.send(dict(subject=subject, receivers=receivers, text=text, html=html, **kwargs))
+
+@celery_app.task
+def send_email_batch(messages):
+     '''
+     Sends a list of messages, each the keyword arguments of send_email,
+     over the worker's SMTP session and returns one result per message.
+     '''
+     return mailer.send_many(messages)
+
+def queue_email_batch(messages):
+     '''Queues messages as send_email_batch tasks of at most MAIL_BATCH_SIZE.'''
+     size=Config.MAIL_BATCH_SIZE
+     return [send_email_batch.delay(messages[i:i+size]) for i in range(0,len(messages),size)]
+
+@worker_shutdown.connect
+@worker_process_shutdown.connect
+def close_mailer(**kwargs):
+     mailer.close()
@@ -12,6 +12,57 @@ class Settings(BaseSettings):
     GMAIL:str
     GMAIL_PASSWORD:str
     DOMAIN:str
+    # database connection pool, see src/db/main.py
+    DB_POOL_SIZE:int=5
+    DB_MAX_OVERFLOW:int=10
+    DB_POOL_TIMEOUT:float=30
+    DB_POOL_RECYCLE:int=1800
+    DB_POOL_PRE_PING:bool=True
+    # seconds a cached book detail may live if an invalidation is missed
+    BOOK_CACHE_TTL:int=300
+    # ms a write blocks refills of a book's cache entry, longer than a cache
+    # miss takes to load and serialize the book
+    BOOK_CACHE_TOMBSTONE_MS:int=5000
+    # bcrypt threads per worker and how many hashes may wait for one
+    HASH_WORKERS:int=2
+    HASH_QUEUE_LIMIT:int=64
+    # POST /books/bulk: records accepted per request and rows per INSERT statement
+    BOOK_BULK_MAX_ROWS:int=5000
+    BOOK_BULK_CHUNK_SIZE:int=500
+    # "postgres" (tsvector + GIN index) or "memory" (in-process inverted index for dev/tests)
+    SEARCH_BACKEND:str="postgres"
+    # the Redis pool of each worker, see RedisManager in src/db/redis_client.py
+    REDIS_MAX_CONNECTIONS:int=50
+    REDIS_SOCKET_TIMEOUT:float=0.5
+    REDIS_CONNECT_TIMEOUT:float=1
+    # consecutive failures that open the breaker and seconds before it tries again
+    REDIS_BREAKER_FAILURES:int=5
+    REDIS_BREAKER_RESET_SECONDS:float=10
+    # how often each worker reloads its revoked token mirror from Redis
+    BLOCKLIST_RESYNC_SECONDS:int=60
+    # how often the mirror pings its subscription, silent for two intervals
+    # and it is dropped and token checks go to Redis until it is back
+    BLOCKLIST_PING_SECONDS:float=5
+    # SMTP sessions of the mail tasks, see BatchMailer in src/mail.py
+    MAIL_MAX_PER_CONNECTION:int=100
+    MAIL_RATE_PER_SECOND:float=10
+    MAIL_IDLE_SECONDS:float=30
+    # messages per send_email_batch task and per outbox batch
+    MAIL_BATCH_SIZE:int=100
+    # the mail outbox, see MailOutbox in src/outbox.py: idle poll interval,
+    # how long a drainer holds a message it sends, sends per message and the
+    # delay before the first retry (doubled for each further one)
+    MAIL_OUTBOX_POLL_SECONDS:float=5
+    MAIL_CLAIM_SECONDS:int=300
+    MAIL_MAX_ATTEMPTS:int=5
+    MAIL_RETRY_SECONDS:float=30
+    # optional read replica for the read only routes, see get_read_session in
+    # src/db/main.py; its pool is sized with the DB_POOL_* settings too
+    READ_DATABASE_URL:str|None=None
+    # seconds the replica is skipped after it failed, and how long opening a
+    # connection to it may take before it counts as failed
+    REPLICA_RETRY_SECONDS:float=30
+    REPLICA_CONNECT_TIMEOUT:float=2
     
     model_config=SettingsConfigDict(
         env_file=".env",
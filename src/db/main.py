@@ -1,42 +1,168 @@
 from sqlalchemy.ext.asyncio import create_async_engine
-from sqlmodel import SQLModel
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError,TimeoutError as PoolTimeoutError
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm import sessionmaker
+from fastapi import Depends,Header
+from prometheus_client import REGISTRY
 from src.config import Config
+from src.metrics import db_pool_wait_seconds,db_pool_timeouts,db_read_sessions,db_replica_failures,PoolStatsCollector
+import asyncio
+import logging
+import time
+
+logger=logging.getLogger(__name__)
+
+# what a replica that is down, unreachable or too slow to connect to raises
+REPLICA_UNAVAILABLE=(DBAPIError,PoolTimeoutError,OSError,asyncio.TimeoutError)
+# sessions on the replica run READ ONLY transactions on postgres, a write
+# slipped into a read route fails there instead of half way on a hot standby
+READ_ONLY={"postgresql_readonly":True}
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    '''
+    The default async pool, plus the time every checkout waited for a
+    connection (queueing, pre ping and connecting) in bookly_db_pool_wait_seconds.
+    The engine label is the pool_logging_name the engine was created with.
+    '''
+    def connect(self):
+        name=self.logging_name or "primary"
+        started=time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            db_pool_timeouts.labels(name).inc()
+            raise
+        finally:
+            db_pool_wait_seconds.labels(name).observe(time.perf_counter()-started)
+
+
+def pool_options(name:str)->dict:
+    '''Engine keyword arguments for a pool tuned through the DB_POOL_* settings.'''
+    return dict(
+        poolclass=TimedQueuePool,
+        pool_logging_name=name,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_MAX_OVERFLOW,
+        pool_timeout=Config.DB_POOL_TIMEOUT,
+        pool_recycle=Config.DB_POOL_RECYCLE,
+        pool_pre_ping=Config.DB_POOL_PRE_PING,
+    )
+
 
 engine = create_async_engine(
-    Config.DATABASE_URL
+    Config.DATABASE_URL,
+    **pool_options("primary")
+)
+
+# built once at import, every request only instantiates a session from it
+async_session=sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    expire_on_commit=False
 )
 
 
-async def init_db():
+def replica_engine(url:str):
+    options=pool_options("replica")
+    if make_url(url).get_driver_name()=="asyncpg":
+        # a replica that does not answer has to fail fast, reads fall back
+        # to the primary only once the connect attempt gave up
+        options["connect_args"]={"timeout":Config.REPLICA_CONNECT_TIMEOUT}
+    return create_async_engine(url,**options)
+
+
+class ReplicaHealth:
     '''
-    This function is used to connect to the database and create all tables.
+    Whether read sessions go to the replica. A failed checkout marks it down
+    for retry_seconds, reads use the primary meanwhile and the first ones
+    after that try the replica again.
     '''
-    async with engine.begin() as conn:
-        from src.db.models import Book
-        await conn.run_sync(SQLModel.metadata.create_all)
+    def __init__(self,retry_seconds:float)->None:
+        self.retry_seconds=retry_seconds
+        self.down_since:float|None=None
+
+    @property
+    def up(self)->bool:
+        return self.down_since is None or time.monotonic()-self.down_since>=self.retry_seconds
+
+    def failed(self)->None:
+        if self.down_since is None:
+            logger.warning("read replica unavailable, reading from the primary for %ss",self.retry_seconds,exc_info=True)
+        db_replica_failures.inc()
+        self.down_since=time.monotonic()
+
+    def succeeded(self)->None:
+        if self.down_since is not None:
+            logger.info("read replica is back")
+            self.down_since=None
+
+
+read_engine=replica_engine(Config.READ_DATABASE_URL) if Config.READ_DATABASE_URL else None
+read_session=sessionmaker(
+    bind=read_engine.execution_options(**READ_ONLY),
+    class_=AsyncSession,
+    expire_on_commit=False
+) if read_engine is not None else None
+replica_health=ReplicaHealth(Config.REPLICA_RETRY_SECONDS)
+
+pool_stats=PoolStatsCollector(
+    {"primary":engine,"replica":read_engine} if read_engine is not None else {"primary":engine}
+)
+REGISTRY.register(pool_stats)
+
 
 # Define the dependency injection function for getting the database engine
 async def get_session()->AsyncSession:
-    Session=sessionmaker(
-        bind=engine,
-        class_=AsyncSession,
-        expire_on_commit=False
-    )
-    async with Session() as session:
+    async with async_session() as session:
         yield session
 
+
+async def get_read_session(
+    x_consistency:str|None=Header(default=None),
+    primary:AsyncSession=Depends(get_session),
+)->AsyncSession:
+    '''
+    Session for routes that only read. It is on the replica, in a read only
+    transaction, when READ_DATABASE_URL is set and the replica is healthy,
+    otherwise it is the request's primary session.
+
+    The primary session is the one get_session gives the rest of the request
+    (the logged in user is loaded with it), so a read route holds a single
+    primary connection. It only checks one out once it is used.
+
+    The replica lags the primary a little. A client that must see its own
+    write sends "X-Consistency: strong" and is served from the primary.
+    Routes whose reads must never be stale keep get_session.
+    '''
+    if read_session is not None and x_consistency!="strong" and replica_health.up:
+        async with read_session() as session:
+            try:
+                # check out (and pre ping) now, so a dead replica is noticed
+                # here and not halfway through the route
+                await session.connection()
+            except REPLICA_UNAVAILABLE:
+                replica_health.failed()
+            else:
+                replica_health.succeeded()
+                db_read_sessions.labels("replica").inc()
+                yield session
+                return
+    db_read_sessions.labels("primary").inc()
+    yield primary
+
 '''
 How the Lifecycle Works
 Request Starts: FastAPI calls get_session().
 
-Creation: The Session is instantiated and the async with block opens.
+Creation: A Session is instantiated from the async_session factory and the async with block opens.
 
 Handoff: The yield sends the active session to your database operation (like a GET or POST request).
 
-Operation: Your code uses the session to query or save data.
+Operation: Your code uses the session to query or save data. The first query checks a connection out of the pool.
 
 Cleanup: Once your code is done, control returns here. The async with block exits, automatically closing the session and returning the connection to the pool.
 
-'''
\ No newline at end of file
+'''
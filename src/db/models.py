@@ -5,33 +5,44 @@ from sqlmodel import Relationship, SQLModel,Field,Column
 #this import brings in PostgreSQL-specific 
 # features from SQLAlchemy (which SQLModel is built on top of).
 import sqlalchemy.dialects.postgresql as pg
+from sqlalchemy import Index,Uuid,text
 from datetime import datetime
 from typing import Optional,List
 import uuid
 
+# The tsvector the book search matches against. The GIN index below is built
+# on this exact expression, queries must use the same text to hit the index.
+BOOK_SEARCH_DOCUMENT="to_tsvector('english', title || ' ' || author || ' ' || summary)"
 
 
-from sqlmodel import SQLModel,Field,Column
-import uuid
-from datetime import datetime
-import sqlalchemy.dialects.postgresql as pg
-
-
-
+# The tables are created and changed by the Alembic revisions in
+# migrations/versions, never at startup. A change here needs a new revision:
+#   alembic revision --autogenerate -m "..."
 
 
 class BookTag(SQLModel, table=True):
-    book_id: uuid.UUID = Field(default=None, foreign_key="books.id", primary_key=True)
-    tag_id: uuid.UUID = Field(default=None, foreign_key="tags.uid", primary_key=True)
+    # the primary key (book_id, tag_id) serves lookups by book, this one
+    # the books of a tag and the deletes cascading from tags
+    __table_args__ = (Index("ix_booktag_tag_id", "tag_id"),)
+    book_id: uuid.UUID = Field(default=None, foreign_key="books.id", primary_key=True, ondelete="CASCADE")
+    tag_id: uuid.UUID = Field(default=None, foreign_key="tags.uid", primary_key=True, ondelete="CASCADE")
 
 
 class Tag(SQLModel, table=True):
     __tablename__ = "tags"
+    # tag names are upserted with ON CONFLICT (name), which needs this index
+    __table_args__ = (Index("ix_tags_name", "name", unique=True),)
+    # Uuid like the columns referencing it: UUID on postgres, and on sqlite the
+    # same CHAR(32), whose affinity lets the joins through booktag use its indexes
     uid: uuid.UUID = Field(
-        sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
+        sa_column=Column(Uuid, nullable=False, primary_key=True, default=uuid.uuid4)
     )
     name: str = Field(sa_column=Column(pg.VARCHAR, nullable=False))
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
+    # part of the tag list ETag, bumped by every ORM update of the tag
+    updated_at: datetime = Field(
+        sa_column=Column(pg.TIMESTAMP, default=datetime.now, onupdate=datetime.now)
+    )
     books: List["Book"] = Relationship(
         link_model=BookTag,
         back_populates="tags",
@@ -48,6 +59,16 @@ class Book(SQLModel,table=True):
     In the PostgreSQL database, it will create a table named 'book' with the following columns:
     id, title, author, year, isbn, pages, price, available, summary
     '''
+    # (created_at, id) matches the keyset pagination order of the book listing
+    __table_args__=(
+        Index("ix_books_created_at_id","created_at","id"),
+        # (rating_avg, id) matches the sort=top_rated listing
+        Index("ix_books_rating_avg_id","rating_avg","id"),
+        # a user's submissions, and the deletes of a user's books
+        Index("ix_books_user_uid","user_uid"),
+        # postgres only, other databases fall back to the in-memory search backend
+        Index("ix_books_search",text(BOOK_SEARCH_DOCUMENT),postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
     id: uuid.UUID=Field(default_factory=uuid.uuid4,primary_key=True,index=True,nullable=False)
     title: str
     author: str
@@ -57,10 +78,18 @@ class Book(SQLModel,table=True):
     price: float
     available: bool
     summary: str
+    # kept up to date by every review write in the same transaction,
+    # so listings never aggregate the reviews table
+    rating_sum: int=Field(default=0,sa_column_kwargs={"server_default":"0"})
+    rating_count: int=Field(default=0,sa_column_kwargs={"server_default":"0"})
+    rating_avg: float=Field(default=0,sa_column_kwargs={"server_default":"0"})
     user_uid:Optional[uuid.UUID]=Field(default=None,foreign_key="users.uid")
     created_at: datetime=Field(default_factory=datetime.now)
-    updated_at: datetime=Field(default_factory=datetime.now)
-    reviews:List["Review"]=Relationship(back_populates="book")
+    # the book ETag is built from it, so every UPDATE of the row must move it
+    updated_at: datetime=Field(default_factory=datetime.now,sa_column_kwargs={"onupdate":datetime.now})
+    # let the ON DELETE CASCADE on reviews.book_uid remove the reviews instead
+    # of loading them and nulling their book_uid
+    reviews:List["Review"]=Relationship(back_populates="book",cascade_delete=True,passive_deletes=True)
     tags:List[Tag]=Relationship(
         link_model=BookTag,
         back_populates="books",
@@ -91,12 +120,19 @@ def __repr__(self) -> str:
 
 class Review(SQLModel,table=True):
     __tablename__="reviews"
+    # both listings page on (created_at, uid), the first one within a single book
+    __table_args__=(
+        Index("ix_reviews_book_uid_created_at_uid","book_uid","created_at","uid"),
+        Index("ix_reviews_created_at_uid","created_at","uid"),
+        # a user's reviews, and the deletes cascading from users
+        Index("ix_reviews_user_uid","user_uid"),
+    )
     
-    uid:uuid.UUID=Field(sa_column=Column(pg.UUID,nullable=False,primary_key=True,default=uuid.uuid4))
+    uid:uuid.UUID=Field(sa_column=Column(Uuid,nullable=False,primary_key=True,default=uuid.uuid4))
     rating:int=Field(lt=5)
     review_txt:str
-    user_uid:Optional[uuid.UUID]=Field(default=None,foreign_key="users.uid")
-    book_uid:Optional[uuid.UUID]=Field(default=None,foreign_key="books.id")
+    user_uid:Optional[uuid.UUID]=Field(default=None,foreign_key="users.uid",ondelete="CASCADE")
+    book_uid:Optional[uuid.UUID]=Field(default=None,foreign_key="books.id",ondelete="CASCADE")
     created_at:datetime=Field(sa_column=Column(pg.TIMESTAMP,default=datetime.now))
     updated_at:datetime=Field(sa_column=Column(pg.TIMESTAMP,default=datetime.now))
     user:Optional[User]=Relationship(back_populates="reviews")
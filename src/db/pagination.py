@@ -0,0 +1,52 @@
+# Helpers for keyset (cursor) pagination.
+# Instead of OFFSET the client sends back the sort key and id of the last
+# row it has seen, so every page is a single index range scan.
+import base64
+import json
+import uuid
+from datetime import datetime
+from src.errors import InvalidCursor
+
+
+def encode_cursor(sort_key,uid)->str:
+    '''
+    Packs the sort key and id of the last row of a page into an
+    opaque url safe token.
+    '''
+    if isinstance(sort_key,datetime):
+        sort_key=sort_key.isoformat()
+    raw=json.dumps([sort_key,str(uid)],separators=(",",":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor:str,key_type:type=datetime)->tuple:
+    '''
+    Reverses encode_cursor and returns (sort_key, uid).
+    Raises InvalidCursor when the token was tampered with or is malformed.
+    '''
+    try:
+        padded=cursor+"="*(-len(cursor)%4)
+        payload=json.loads(base64.urlsafe_b64decode(padded))
+        # a well formed token can still carry other json, e.g. a number as uid
+        if not isinstance(payload,list) or len(payload)!=2 or not isinstance(payload[1],str):
+            raise InvalidCursor()
+        sort_key,uid=payload
+        if key_type is datetime:
+            sort_key=datetime.fromisoformat(sort_key)
+        else:
+            sort_key=key_type(sort_key)
+        return sort_key,uuid.UUID(uid)
+    except (ValueError,TypeError):
+        raise InvalidCursor()
+
+
+def split_page(rows:list,limit:int,sort_attr:str,id_attr:str)->tuple[list,str|None]:
+    '''
+    Queries fetch limit+1 rows, the extra row only tells us that another
+    page exists. Returns the rows of this page and the cursor of the next one.
+    '''
+    if len(rows)<=limit:
+        return rows,None
+    rows=rows[:limit]
+    last=rows[-1]
+    return rows,encode_cursor(getattr(last,sort_attr),getattr(last,id_attr))
@@ -0,0 +1,18 @@
+# Helpers for sparse fieldsets on the list endpoints.
+# ?fields=title,author makes the query select just those columns as plain
+# rows, instead of loading full ORM objects and their selectin relationships.
+from src.errors import InvalidFields
+
+
+def parse_fields(fields:str|None,allowed:tuple[str,...])->list[str]:
+    '''
+    Splits the comma separated ?fields= value into column names, in the
+    order of allowed. No value means every allowed field.
+    Raises InvalidFields when a name is not in allowed.
+    '''
+    if not fields:
+        return list(allowed)
+    requested={name.strip() for name in fields.split(",")}-{""}
+    if not requested or not requested<=set(allowed):
+        raise InvalidFields()
+    return [name for name in allowed if name in requested]
@@ -1,25 +1,290 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any,Iterator
 import redis.asyncio as aioredis
+from redis.exceptions import RedisError,ConnectionError as RedisConnectionError,TimeoutError as RedisTimeoutError
 from src.config import Config
+from src.errors import RevocationCheckUnavailable
+from src.metrics import token_blocklist_lookups,redis_breaker_rejections
+
+logger=logging.getLogger(__name__)
 
 JTI_EXPIRY = 3600
-token_block_list = aioredis.from_url(Config.REDIS_URL)
+# every revoked jti scored by the unix time it expires at, the snapshot
+# a worker loads at startup
+REVOKED_JTI_INDEX = "revoked_jtis"
+# "<jti> <expires_at>" is published here on every revocation
+REVOKED_JTI_CHANNEL = "revoked_jtis"
+
+
+# errors that say Redis is unreachable or too slow, as opposed to error replies
+UNAVAILABLE=(RedisConnectionError,RedisTimeoutError,OSError)
+
+
+class CircuitOpen(RedisConnectionError):
+    '''
+    Raised instead of calling Redis while the breaker is open. It is a
+    redis ConnectionError, so every existing "except RedisError" treats it
+    like Redis being down, just without waiting for a timeout.
+    '''
+
+
+class CircuitBreaker:
+    '''
+    Opens after failure_threshold consecutive connection errors or timeouts.
+    While open every call fails at once; after reset_timeout seconds a single
+    trial call is let through (half open) and its outcome closes the breaker
+    or opens it for another reset_timeout. Used as "with breaker.call():"
+    around each call, so every call knows whether it is the trial.
+    '''
+    def __init__(self,failure_threshold:int,reset_timeout:float)->None:
+        self.failure_threshold=failure_threshold
+        self.reset_timeout=reset_timeout
+        self.failures=0
+        self.opened_at:float|None=None
+        self._trial_running=False
+
+    @property
+    def is_open(self)->bool:
+        return self.opened_at is not None
+
+    @contextmanager
+    def call(self)->Iterator[None]:
+        trial=self._admit()
+        try:
+            yield
+        except UNAVAILABLE:
+            self.failures+=1
+            if trial or self.failures>=self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning("Redis failed %s times in a row, opening the circuit breaker",self.failures)
+                self.opened_at=time.monotonic()
+            raise
+        except Exception:
+            # Redis answered, even if it was with an error reply
+            self._closed()
+            raise
+        else:
+            self._closed()
+        finally:
+            # only the trial call may let the next one through, a call that
+            # started before the breaker opened finishing now must not.
+            # A cancelled trial tells nothing about Redis, the next one runs
+            if trial:
+                self._trial_running=False
+
+    def _admit(self)->bool:
+        '''Raises CircuitOpen or lets the call through, True if it is the half open trial.'''
+        if self.opened_at is None:
+            return False
+        if self._trial_running or time.monotonic()-self.opened_at<self.reset_timeout:
+            redis_breaker_rejections.inc()
+            raise CircuitOpen("Redis circuit breaker is open")
+        self._trial_running=True
+        return True
+
+    def _closed(self)->None:
+        self.failures=0
+        self.opened_at=None
+
+
+class RedisManager:
+    '''
+    The single Redis connection pool of the app. The lifespan opens it on
+    startup and closes it on shutdown; code running outside the app (Celery,
+    scripts) gets it opened on first use.
+
+    Commands go through run() and batch() so they share the socket timeouts
+    and the circuit breaker: when Redis is slow or gone, callers fail within
+    REDIS_SOCKET_TIMEOUT and then immediately while the breaker is open,
+    instead of piling up behind a dead connection.
+    '''
+    def __init__(self,client:aioredis.Redis|None=None)->None:
+        self._client=client
+        self.breaker=CircuitBreaker(Config.REDIS_BREAKER_FAILURES,Config.REDIS_BREAKER_RESET_SECONDS)
+
+    def open(self)->None:
+        if self._client is None:
+            self._client=aioredis.from_url(
+                Config.REDIS_URL,
+                max_connections=Config.REDIS_MAX_CONNECTIONS,
+                socket_timeout=Config.REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=Config.REDIS_CONNECT_TIMEOUT,
+                health_check_interval=30,
+            )
+
+    async def close(self)->None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client=None
+
+    @property
+    def client(self)->aioredis.Redis:
+        '''The raw client, for things that bypass the breaker such as pub/sub.'''
+        self.open()
+        return self._client
+
+    async def run(self,command:str,*args,**kwargs)->Any:
+        '''Runs one Redis command, e.g. run("get", key).'''
+        with self.breaker.call():
+            return await getattr(self.client,command)(*args,**kwargs)
+
+    async def batch(self,commands:list[tuple],transaction:bool=False)->list:
+        '''
+        Sends commands, each (name, *args), in one round trip and returns
+        their replies in order. transaction=True wraps them in MULTI/EXEC.
+        '''
+        with self.breaker.call():
+            async with self.client.pipeline(transaction=transaction) as pipe:
+                for name,*args in commands:
+                    getattr(pipe,name)(*args)
+                return await pipe.execute()
+
+
+redis_manager=RedisManager()
+
+
+class RevokedTokenMirror:
+    '''
+    In-process copy of the revoked JTIs, so checking a token on every request
+    is a dict lookup instead of a Redis round trip.
+
+    The mirror subscribes to REVOKED_JTI_CHANNEL first and then loads the
+    REVOKED_JTI_INDEX snapshot, so a revocation made while the snapshot is
+    loading still arrives as a message. The snapshot is reloaded every
+    BLOCKLIST_RESYNC_SECONDS, which also drops expired entries and repairs
+    anything a dropped connection missed.
+
+    While the subscription is down (startup, Redis outage, reconnect) synced
+    is False and check_black_list asks Redis directly, so a revocation is
+    never missed, it only costs the round trip again until the mirror has
+    resubscribed and reloaded.
+
+    A connection can also die without an error and just go quiet. The
+    subscription is pinged every BLOCKLIST_PING_SECONDS; when nothing, not
+    even the PONG, came back for two intervals the mirror stops being
+    trusted and resubscribes.
+    '''
+    def __init__(self)->None:
+        self.expires_at:dict[str,float]={}
+        self.synced=False
+        self._task:asyncio.Task|None=None
+
+    def add(self,jti:str,expires_at:float)->None:
+        self.expires_at[jti]=expires_at
+
+    def contains(self,jti:str)->bool:
+        expires_at=self.expires_at.get(jti)
+        if expires_at is None:
+            return False
+        if expires_at<=time.time():
+            self.expires_at.pop(jti,None)
+            return False
+        return True
+
+    async def load(self)->None:
+        now=time.time()
+        entries=await redis_manager.run("zrangebyscore",REVOKED_JTI_INDEX,now,"+inf",withscores=True)
+        self.expires_at={_text(jti):expires_at for jti,expires_at in entries}
+
+    def start(self)->None:
+        self._task=asyncio.create_task(self._run())
+
+    async def stop(self)->None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task=None
+        self.synced=False
+
+    async def _run(self)->None:
+        retry=1
+        while True:
+            try:
+                await self._follow()
+            except (RedisError,OSError):
+                logger.warning("revoked token subscription lost, checking Redis directly until it is back",exc_info=True)
+            if self.synced:
+                # it was working before it dropped, start the backoff over
+                retry=1
+            self.synced=False
+            await asyncio.sleep(retry)
+            retry=min(retry*2,30)
+
+    async def _follow(self)->None:
+        async with redis_manager.client.pubsub() as pubsub:
+            await pubsub.subscribe(REVOKED_JTI_CHANNEL)
+            await self.load()
+            self.synced=True
+            loaded=heard=pinged=time.monotonic()
+            while True:
+                message=await pubsub.get_message(
+                    ignore_subscribe_messages=True,timeout=min(1.0,Config.BLOCKLIST_PING_SECONDS)
+                )
+                now=time.monotonic()
+                if message is not None:
+                    # a revocation or the PONG of our ping, the connection is alive
+                    heard=now
+                    if message["type"]=="message":
+                        jti,_,expires_at=_text(message["data"]).partition(" ")
+                        self.add(jti,float(expires_at))
+                if now-heard>=2*Config.BLOCKLIST_PING_SECONDS:
+                    self.synced=False
+                    raise RedisTimeoutError(f"no reply on {REVOKED_JTI_CHANNEL} for {now-heard:.0f}s")
+                if now-pinged>=Config.BLOCKLIST_PING_SECONDS:
+                    await pubsub.ping()
+                    pinged=now
+                if now-loaded>=Config.BLOCKLIST_RESYNC_SECONDS:
+                    await self.load()
+                    loaded=now
+
+
+def _text(value)->str:
+    return value.decode("utf-8") if isinstance(value,bytes) else value
+
+
+revoked_tokens=RevokedTokenMirror()
+
 
 async def create_jti_blocklist(jti: str) -> None:
     '''
-     Stores the jti (JWT ID ) not the whole token
+     Stores the jti (JWT ID ) not the whole token, indexes it for the
+     snapshot and tells every worker's mirror about it, in one MULTI.
     '''
-    await token_block_list.set(
-        name=jti,
-        value="",
-        ex=JTI_EXPIRY
+    now=time.time()
+    expires_at=now+JTI_EXPIRY
+    await redis_manager.batch(
+        [
+            ("set",jti,"",JTI_EXPIRY),
+            ("zadd",REVOKED_JTI_INDEX,{jti:expires_at}),
+            ("zremrangebyscore",REVOKED_JTI_INDEX,"-inf",now),
+            ("publish",REVOKED_JTI_CHANNEL,f"{jti} {expires_at}"),
+        ],
+        transaction=True
     )
+    # this worker may see the token again before its own message comes back
+    revoked_tokens.add(jti,expires_at)
 
 async def check_black_list(jti: str) -> bool:
     '''
        Checks the JWT ID if found it will return the 
        blacklist id if not found it will return None
-    
+
+       Answered by the in-process mirror while it is synced,
+       by a Redis GET otherwise. If Redis can not answer either the
+       request is refused with a 503 rather than trusting the token.
     '''
-    jti = await token_block_list.get(jti)
+    if revoked_tokens.synced:
+        token_blocklist_lookups.labels("mirror").inc()
+        return revoked_tokens.contains(jti)
+    token_blocklist_lookups.labels("redis").inc()
+    try:
+        jti = await redis_manager.run("get",jti)
+    except RedisError:
+        raise RevocationCheckUnavailable()
     return jti is not None
-
@@ -63,6 +63,26 @@ class AccountNotVerified(BooklyException):
     """User account is not verified."""
     pass
 
+class InvalidCursor(BooklyException):
+    """User has provided a malformed or tampered pagination cursor"""
+    pass
+
+class InvalidFields(BooklyException):
+    """User has asked for a field the endpoint does not have in ?fields="""
+    pass
+
+class RevocationCheckUnavailable(BooklyException):
+    """Redis can not be reached to check whether the token was revoked"""
+    pass
+
+class MailQueueUnavailable(BooklyException):
+    """Redis can not be reached to queue an email"""
+    pass
+
+class HashingOverloaded(BooklyException):
+    """Too many password hashes are queued, the request should be retried later"""
+    pass
+
 def create_exception_handeler(status_code:int,detail:Any)->Callable[[Request,Exception],JSONResponse]:
     
     async def exception_handeler(request:Request,exc:BooklyException)->JSONResponse:
@@ -168,5 +188,40 @@ def register_exception_handler(app:FastAPI):
             detail={"error":"User account is not verified"}
         )
     )
+    app.add_exception_handler(
+        InvalidCursor,
+        create_exception_handeler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error":"The provided pagination cursor is invalid"}
+        )
+    )
+    app.add_exception_handler(
+        InvalidFields,
+        create_exception_handeler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error":"The fields parameter contains an unknown field"}
+        )
+    )
+    app.add_exception_handler(
+        RevocationCheckUnavailable,
+        create_exception_handeler(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"error":"The token can not be verified right now, please try again shortly"}
+        )
+    )
+    app.add_exception_handler(
+        MailQueueUnavailable,
+        create_exception_handeler(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"error":"The email can not be queued right now, please try again shortly"}
+        )
+    )
+    app.add_exception_handler(
+        HashingOverloaded,
+        create_exception_handeler(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"error":"The server is busy, please try again shortly"}
+        )
+    )
     
     
\ No newline at end of file
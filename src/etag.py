@@ -0,0 +1,33 @@
+# Conditional GET helpers.
+# ETags are derived from the version of the data (updated_at, plus a row count
+# for collections) rather than from the response body, so whether a client's
+# copy is current can be decided with a one column query, before anything
+# is loaded or serialized.
+import hashlib
+from fastapi import Response,status
+
+
+def make_etag(*parts)->str:
+    '''
+    Weak ETag over the given version parts, e.g. (book_id, updated_at).
+    Weak because it identifies a version of the resource, not exact bytes.
+    '''
+    digest=hashlib.blake2b(repr(parts).encode("utf-8"),digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match:str|None,etag:str)->bool:
+    '''
+    Weak comparison of an If-None-Match header against our ETag,
+    the header may hold a list of tags or "*".
+    '''
+    if not if_none_match:
+        return False
+    if if_none_match.strip()=="*":
+        return True
+    opaque=etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/")==opaque for tag in if_none_match.split(","))
+
+
+def not_modified(etag:str)->Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED,headers={"ETag":etag})
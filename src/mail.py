@@ -0,0 +1,139 @@
+import logging
+import smtplib
+import threading
+import time
+from typing import Callable
+from redmail import EmailSender
+from src.config import Config
+
+logger=logging.getLogger(__name__)
+
+# smtplib errors that mean the session is unusable, every other SMTPException
+# (also an OSError) is the server refusing one message
+SESSION_LOST=(smtplib.SMTPServerDisconnected,smtplib.SMTPConnectError)
+
+
+class RateLimiter:
+    '''
+    Spaces calls at least 1/rate seconds apart, rate<=0 means no limit.
+    Calls made after a quiet period are not bunched up to catch up.
+    '''
+    def __init__(self,rate:float)->None:
+        self.interval=1/rate if rate>0 else 0
+        self.next_at=0.0
+
+    def wait(self)->None:
+        if not self.interval:
+            return
+        now=time.monotonic()
+        if self.next_at>now:
+            time.sleep(self.next_at-now)
+            now=self.next_at
+        self.next_at=now+self.interval
+
+
+class BatchMailer:
+    '''
+    Sends messages over one SMTP connection that is kept open between
+    messages and between tasks of the same worker process, instead of a
+    connect, STARTTLS, login and QUIT for every message like sender.send()
+    does.
+
+    The connection is replaced after max_per_connection messages (providers
+    cap messages per session) or when it has been idle for idle_timeout
+    seconds (providers drop idle sessions). A connection the server dropped
+    anyway is reopened once and the message retried. At most rate messages
+    a second are sent by one mailer.
+
+    A message is the keyword arguments of sender.send(), e.g.
+    {"subject": ..., "receivers": [...], "html": ...}.
+    '''
+    def __init__(
+        self,
+        sender:EmailSender,
+        max_per_connection:int=Config.MAIL_MAX_PER_CONNECTION,
+        rate:float=Config.MAIL_RATE_PER_SECOND,
+        idle_timeout:float=Config.MAIL_IDLE_SECONDS,
+    )->None:
+        # a copy, so a connection held here is never shared with other users of sender
+        self.sender=sender.copy()
+        self.sender.connection=None
+        self.max_per_connection=max_per_connection
+        self.idle_timeout=idle_timeout
+        self.limiter=RateLimiter(rate)
+        self.sent_on_connection=0
+        self.last_used=0.0
+        # smtplib connections are not thread safe, tasks on a threaded pool take turns
+        self._lock=threading.Lock()
+
+    def send(self,message:dict)->dict:
+        with self._lock:
+            return self._send(message)
+
+    def send_many(self,messages:list[dict],stop:Callable[[],bool]|None=None)->list[dict]:
+        '''
+        Sends messages in order, one failing does not stop the rest. Once stop()
+        is true the messages not sent yet are left alone and reported unsent.
+        '''
+        results=[]
+        with self._lock:
+            for message in messages:
+                if stop is not None and stop():
+                    results.append({"status":"unsent"})
+                else:
+                    results.append(self._send(message))
+        return results
+
+    def close(self)->None:
+        with self._lock:
+            self._close()
+
+    def _send(self,message:dict)->dict:
+        try:
+            msg=self.sender.get_message(**message)
+        except Exception as e:
+            return {"status":"error","error":str(e)}
+        self.limiter.wait()
+        for attempt in (1,2):
+            try:
+                self._connection().send_message(msg)
+            except OSError as e:
+                if isinstance(e,smtplib.SMTPException) and not isinstance(e,SESSION_LOST):
+                    # refused by the server, the session itself is still usable
+                    return {"status":"error","error":str(e)}
+                # the session is gone, a fresh one gets one more try
+                self._drop()
+                if attempt==2:
+                    logger.warning("sending mail failed after reconnecting",exc_info=True)
+                    return {"status":"error","error":str(e)}
+                continue
+            finally:
+                self.last_used=time.monotonic()
+            self.sent_on_connection+=1
+            return {"status":"sent","result":str(msg)}
+
+    def _connection(self)->smtplib.SMTP:
+        if self.sender.is_alive and (
+            self.sent_on_connection>=self.max_per_connection
+            or time.monotonic()-self.last_used>=self.idle_timeout
+        ):
+            self._close()
+        if not self.sender.is_alive:
+            self.sender.connect()
+            self.sent_on_connection=0
+        return self.sender.connection
+
+    def _close(self)->None:
+        try:
+            self.sender.close()
+        except (smtplib.SMTPException,OSError):
+            self._drop()
+
+    def _drop(self)->None:
+        '''Forgets a broken connection without the QUIT round trip.'''
+        if self.sender.connection is not None:
+            try:
+                self.sender.connection.close()
+            except OSError:
+                pass
+            self.sender.connection=None
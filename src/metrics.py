@@ -0,0 +1,151 @@
+# Prometheus metrics shared by the whole app.
+# Metrics are defined once here and imported where they are recorded.
+from bisect import bisect_left
+from itertools import accumulate
+from prometheus_client import Counter,Histogram,REGISTRY,CONTENT_TYPE_LATEST,generate_latest
+from prometheus_client.core import GaugeMetricFamily,HistogramMetricFamily
+from prometheus_client.registry import Collector
+from starlette.requests import Request
+from starlette.responses import Response
+
+class RequestMetricsCollector(Collector):
+    '''
+    Request latency histogram by route template, method and status, plus
+    in-flight requests by method.
+
+    prometheus_client takes a lock on every observe/inc/dec, which costs a few
+    microseconds per request. MetricsMiddleware only ever records from the event
+    loop thread, so plain lists and ints are enough here; the Prometheus
+    families are built when /metrics is scraped.
+    '''
+    def __init__(self,buckets:tuple[float,...])->None:
+        self.buckets=buckets
+        self.series:dict[tuple,list]={}
+        self.in_progress:dict[str,int]={}
+
+    def observe(self,key:tuple,seconds:float)->None:
+        series=self.series.get(key)
+        if series is None:
+            series=self.series[key]=[[0]*(len(self.buckets)+1),0.0]
+        series[0][bisect_left(self.buckets,seconds)]+=1
+        series[1]+=seconds
+
+    def collect(self):
+        duration=HistogramMetricFamily(
+            "bookly_http_request_duration_seconds",
+            "Request latency by route template, method and status code",
+            labels=["route","method","status"],
+        )
+        for key,(counts,total) in list(self.series.items()):
+            cumulative=list(accumulate(counts))
+            buckets=[(str(bound),count) for bound,count in zip(self.buckets,cumulative)]
+            buckets.append(("+Inf",cumulative[-1]))
+            duration.add_metric([key[0],key[1],str(key[2])],buckets,total)
+        yield duration
+
+        in_progress=GaugeMetricFamily(
+            "bookly_http_requests_in_progress",
+            "Requests currently being served",
+            labels=["method"],
+        )
+        for method,count in list(self.in_progress.items()):
+            in_progress.add_metric([method],count)
+        yield in_progress
+
+
+request_metrics=RequestMetricsCollector(
+    buckets=(0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10),
+)
+REGISTRY.register(request_metrics)
+
+book_cache_requests=Counter(
+    "bookly_book_cache_requests_total",
+    "Lookups in the book detail cache by result (hit, miss, error)",
+    ["result"],
+)
+
+token_blocklist_lookups=Counter(
+    "bookly_token_blocklist_lookups_total",
+    "Revoked token checks by where they were answered (mirror, redis)",
+    ["source"],
+)
+
+redis_breaker_rejections=Counter(
+    "bookly_redis_breaker_rejections_total",
+    "Redis calls failed fast because the circuit breaker was open",
+)
+
+mail_outbox_messages=Counter(
+    "bookly_mail_outbox_messages_total",
+    "Outbox send attempts by outcome (sent, retried, dead)",
+    ["result"],
+)
+
+password_hash_seconds=Histogram(
+    "bookly_password_hash_seconds",
+    "bcrypt hash / verify latency including the wait for a hashing thread",
+    ["operation"],
+    buckets=(0.05,0.1,0.2,0.3,0.5,0.75,1,1.5,2.5,5,10),
+)
+
+password_hash_rejections=Counter(
+    "bookly_password_hash_rejections_total",
+    "Hashing calls rejected because the hashing queue was full",
+    ["operation"],
+)
+
+db_pool_wait_seconds=Histogram(
+    "bookly_db_pool_wait_seconds",
+    "Time spent getting a connection from the database pool",
+    ["engine"],
+    buckets=(0.0005,0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30),
+)
+
+db_pool_timeouts=Counter(
+    "bookly_db_pool_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT seconds",
+    ["engine"],
+)
+
+db_read_sessions=Counter(
+    "bookly_db_read_sessions_total",
+    "Sessions of the read only routes by the engine that served them (replica, primary)",
+    ["engine"],
+)
+
+db_replica_failures=Counter(
+    "bookly_db_replica_failures_total",
+    "Replica checkouts that failed, each one sends reads to the primary for REPLICA_RETRY_SECONDS",
+)
+
+
+class PoolStatsCollector(Collector):
+    '''
+    Reads the live state of the connection pools on every scrape.
+    engines maps the engine label to the AsyncEngine.
+    '''
+    def __init__(self,engines:dict)->None:
+        self.engines=engines
+
+    def collect(self):
+        size=GaugeMetricFamily("bookly_db_pool_size","Connections the pool keeps open",labels=["engine"])
+        checked_out=GaugeMetricFamily("bookly_db_pool_checked_out","Connections currently in use",labels=["engine"])
+        checked_in=GaugeMetricFamily("bookly_db_pool_checked_in","Idle connections in the pool",labels=["engine"])
+        overflow=GaugeMetricFamily("bookly_db_pool_overflow","Connections opened above pool_size (negative while the pool is still filling up)",labels=["engine"])
+        for name,engine in self.engines.items():
+            pool=engine.pool
+            if not hasattr(pool,"checkedout"):
+                continue
+            size.add_metric([name],pool.size())
+            checked_out.add_metric([name],pool.checkedout())
+            checked_in.add_metric([name],pool.checkedin())
+            overflow.add_metric([name],pool.overflow())
+        yield size
+        yield checked_out
+        yield checked_in
+        yield overflow
+
+
+async def metrics_endpoint(request:Request)->Response:
+    '''Serves every registered metric in the Prometheus text format.'''
+    return Response(generate_latest(REGISTRY),media_type=CONTENT_TYPE_LATEST)
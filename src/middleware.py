@@ -1,29 +1,60 @@
-from fastapi import FastAPI,status
-from fastapi.requests import Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-import time,logging
+from starlette.types import ASGIApp,Message,Receive,Scope,Send
+from src.metrics import request_metrics
+import time
 
-logger=logging.getLogger('uvicorn.access')
 
-logger.disabled=True
+class MetricsMiddleware:
+    '''
+    Records every HTTP request in bookly_http_request_duration_seconds by
+    route template, method and status, and counts in-flight requests.
+
+    It is a plain ASGI middleware rather than @app.middleware("http"):
+    no extra task or body stream per request, just two perf_counter calls
+    and a couple of dict updates. The route label is the path template
+    (/api/v1/books/{book_uid}), never the raw path, so label cardinality
+    stays bounded. Auth time and time to first byte are also sent back in
+    a Server-Timing header.
+    '''
+    def __init__(self,app:ASGIApp)->None:
+        self.app=app
+
+    async def __call__(self,scope:Scope,receive:Receive,send:Send)->None:
+        if scope["type"]!="http":
+            await self.app(scope,receive,send)
+            return
+
+        method=scope["method"]
+        in_progress=request_metrics.in_progress
+        in_progress[method]=in_progress.get(method,0)+1
+        started=time.perf_counter()
+        status_code=500
+
+        async def send_with_timing(message:Message)->None:
+            nonlocal status_code
+            if message["type"]=="http.response.start":
+                status_code=message["status"]
+                # time spent decoding the token, checking the blocklist and loading the user
+                auth_time=scope.get("state",{}).get("auth_time",0.0)
+                timing=b"auth;dur=%.2f, total;dur=%.2f"%(auth_time*1000,(time.perf_counter()-started)*1000)
+                message["headers"]=[*message.get("headers",()),(b"server-timing",timing)]
+            await send(message)
+
+        try:
+            await self.app(scope,receive,send_with_timing)
+        finally:
+            in_progress[method]-=1
+            route=scope.get("route")
+            request_metrics.observe(
+                (route.path_format if route is not None else "unmatched",method,status_code),
+                time.perf_counter()-started
+            )
+
 
 def register_middleware(app:FastAPI):
     
-    @app.middleware("http")
-    async def custom_logging_middleware(request:Request,call_next):
-       start_time =time.time()
-     
-       
-       print(f"before:{start_time}")
-       response=await call_next(request)
-       processing_time=time.time()-start_time
-       message=f"{request.method} {request.url.path} completed_in={processing_time:.2f}s status_code={response.status_code}"
-       print(message)
-       print(f"processing_time:{processing_time}")
-       return response
-    
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
@@ -36,5 +67,6 @@ def register_middleware(app:FastAPI):
         TrustedHostMiddleware,
         allowed_hosts=["example.com", "*.example.com", "localhost", "*.localhost"]
     )
-    
-    
\ No newline at end of file
+
+    # added last so it is the outermost layer and also times rejected requests
+    app.add_middleware(MetricsMiddleware)
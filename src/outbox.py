@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import time
+import uuid
+import orjson
+from redis.exceptions import RedisError
+from src.config import Config
+from src.db.redis_client import redis_manager
+from src.errors import MailQueueUnavailable
+from src.metrics import mail_outbox_messages
+
+logger=logging.getLogger(__name__)
+
+# every pending message, scored by the unix time it is due to be sent
+OUTBOX_KEY="mail:outbox"
+# messages that failed MAIL_MAX_ATTEMPTS times, kept for a look by hand
+OUTBOX_DEAD_KEY="mail:outbox:dead"
+# "<prefix><id>:<attempt>" is held by the drainer sending that attempt
+OUTBOX_CLAIM_PREFIX="mail:outbox:claim:"
+# how long stop() waits for the message being sent when it is called, the
+# rest of the batch is put back unsent
+STOP_TIMEOUT=10
+
+
+class MailOutbox:
+    '''
+    Mail queued in Redis and sent by a drainer task running in every app
+    worker, so a request only pays for one ZADD and nothing is lost when a
+    worker restarts with mail still queued.
+
+    The drainer picks up to MAIL_BATCH_SIZE due messages, claims each one
+    with a SET NX that expires after MAIL_CLAIM_SECONDS, and sends the ones
+    it won through a BatchMailer on a thread. Sent messages are removed;
+    failed ones are put back due MAIL_RETRY_SECONDS later, doubling per
+    attempt, and after MAIL_MAX_ATTEMPTS moved to OUTBOX_DEAD_KEY. A claim
+    is never deleted, only expires, so two drainers can not send the same
+    attempt, while a message whose drainer died before settling it is due
+    again once its claim expired (delivery is at least once). The only claims
+    deleted are those of messages a stopping drainer did not get to, which
+    are put back due at once.
+
+    The default mailer is built on the drainer thread with the first batch,
+    so redmail and jinja2 are only imported by a worker that sends mail.
+    '''
+    def __init__(self,mailer=None)->None:
+        self._mailer=mailer
+        self._task:asyncio.Task|None=None
+        self._wake:asyncio.Event|None=None
+        self._stopping=False
+
+    async def enqueue(self,**message)->str:
+        '''Queues a message, the keyword arguments of gmail.send(), and returns its id.'''
+        entry={"id":uuid.uuid4().hex,"attempts":0,"message":message}
+        try:
+            await redis_manager.run("zadd",OUTBOX_KEY,{orjson.dumps(entry):time.time()})
+        except RedisError:
+            raise MailQueueUnavailable()
+        if self._wake is not None:
+            self._wake.set()
+        return entry["id"]
+
+    async def claim(self,limit:int)->list[tuple[bytes,dict]]:
+        '''The due messages this drainer won, as (member, entry).'''
+        now=time.time()
+        due=await redis_manager.run("zrangebyscore",OUTBOX_KEY,"-inf",now,start=0,num=limit)
+        if not due:
+            return []
+        entries=[_decode(member) for member in due]
+        broken=[member for member,entry in zip(due,entries) if entry is None]
+        if broken:
+            await self._bury(broken)
+            due=[member for member,entry in zip(due,entries) if entry is not None]
+            entries=[entry for entry in entries if entry is not None]
+            if not due:
+                return []
+        won=await redis_manager.batch([
+            # SET key "" EX MAIL_CLAIM_SECONDS NX
+            ("set",f"{OUTBOX_CLAIM_PREFIX}{entry['id']}:{entry['attempts']}","",Config.MAIL_CLAIM_SECONDS,None,True)
+            for entry in entries
+        ])
+        claimed=[(member,entry) for member,entry,ok in zip(due,entries,won) if ok]
+        if claimed:
+            # out of the due window until the claim expires, so messages held
+            # by a drainer that died do not keep filling other drainers' batches
+            lease_end=now+Config.MAIL_CLAIM_SECONDS
+            await redis_manager.run("zadd",OUTBOX_KEY,{member:lease_end for member,_ in claimed},xx=True)
+        return claimed
+
+    async def _bury(self,members:list[bytes])->None:
+        '''Moves members that are not a queued message to OUTBOX_DEAD_KEY as they are.'''
+        removed=await redis_manager.batch([("zrem",OUTBOX_KEY,member) for member in members])
+        # only the drainer that removed a member moves it, so it is not listed twice
+        members=[member for member,count in zip(members,removed) if count]
+        if members:
+            logger.error("moving %s undecodable mail outbox entries to %s",len(members),OUTBOX_DEAD_KEY)
+            mail_outbox_messages.labels("dead").inc(len(members))
+            await redis_manager.run("rpush",OUTBOX_DEAD_KEY,*members)
+
+    async def drain_once(self)->int:
+        '''Sends one batch and returns how many messages it handled.'''
+        claimed_at=time.monotonic()
+        claimed=await self.claim(Config.MAIL_BATCH_SIZE)
+        if not claimed:
+            return 0
+        results=await asyncio.to_thread(self._send_many,[entry["message"] for _,entry in claimed])
+        now=time.time()
+        # past MAIL_CLAIM_SECONDS another drainer may hold the claim by now
+        still_ours=time.monotonic()-claimed_at<Config.MAIL_CLAIM_SECONDS
+        commands=[]
+        for (member,entry),result in zip(claimed,results):
+            if result["status"]=="unsent":
+                # the drainer is stopping, another one sends it right away
+                if still_ours:
+                    commands.append(("zadd",OUTBOX_KEY,{member:now}))
+                    commands.append(("delete",f"{OUTBOX_CLAIM_PREFIX}{entry['id']}:{entry['attempts']}"))
+                continue
+            commands.append(("zrem",OUTBOX_KEY,member))
+            if result["status"]=="sent":
+                mail_outbox_messages.labels("sent").inc()
+                continue
+            entry["attempts"]+=1
+            entry["error"]=result["error"]
+            if entry["attempts"]>=Config.MAIL_MAX_ATTEMPTS:
+                logger.error("giving up on mail %s after %s attempts: %s",entry["id"],entry["attempts"],result["error"])
+                mail_outbox_messages.labels("dead").inc()
+                commands.append(("rpush",OUTBOX_DEAD_KEY,orjson.dumps(entry)))
+            else:
+                mail_outbox_messages.labels("retried").inc()
+                retry_at=now+Config.MAIL_RETRY_SECONDS*2**(entry["attempts"]-1)
+                commands.append(("zadd",OUTBOX_KEY,{orjson.dumps(entry):retry_at}))
+        await redis_manager.batch(commands,transaction=True)
+        return len(claimed)
+
+    def start(self)->None:
+        self._stopping=False
+        self._wake=asyncio.Event()
+        self._task=asyncio.create_task(self._run())
+
+    async def stop(self)->None:
+        if self._task is not None:
+            self._stopping=True
+            self._wake.set()
+            try:
+                # the message being sent is let finish and the batch settled,
+                # so nothing sent here is sent again by another drainer
+                await asyncio.wait_for(self._task,STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                # still sending on its thread, which keeps the SMTP session
+                self._task=None
+                return
+            self._task=None
+        if self._mailer is not None:
+            await asyncio.to_thread(self._mailer.close)
+
+    @property
+    def mailer(self):
+        '''The mailer given to the outbox, or a BatchMailer over gmail built on first use.'''
+        if self._mailer is None:
+            from redmail import gmail
+            from src.mail import BatchMailer
+            gmail.username=Config.GMAIL
+            gmail.password=Config.GMAIL_PASSWORD
+            self._mailer=BatchMailer(gmail)
+        return self._mailer
+
+    def _send_many(self,messages:list[dict])->list[dict]:
+        return self.mailer.send_many(messages,stop=lambda:self._stopping)
+
+    async def _run(self)->None:
+        retry=1
+        while not self._stopping:
+            # cleared before looking, so an enqueue during the batch is not missed
+            self._wake.clear()
+            try:
+                handled=await self.drain_once()
+            except (RedisError,OSError):
+                logger.warning("mail outbox unreachable, retrying in %ss",retry,exc_info=True)
+            except Exception:
+                # a bug or a bad batch must not end the drainer for the worker's lifetime
+                logger.exception("mail outbox drain failed, retrying in %ss",retry)
+            else:
+                retry=1
+                if not handled:
+                    # idle: woken by an enqueue in this worker, or polling for
+                    # other workers' mail and retries coming due
+                    try:
+                        await asyncio.wait_for(self._wake.wait(),Config.MAIL_OUTBOX_POLL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                continue
+            await asyncio.sleep(retry)
+            retry=min(retry*2,30)
+
+
+def _decode(member:bytes)->dict|None:
+    '''The entry a member holds, None for one that is not a queued message.'''
+    try:
+        entry=orjson.loads(member)
+    except orjson.JSONDecodeError:
+        return None
+    if not isinstance(entry,dict) or not {"id","attempts","message"}<=entry.keys():
+        return None
+    return entry
+
+
+mail_outbox=MailOutbox()
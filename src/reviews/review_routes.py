@@ -1,23 +1,29 @@
-from fastapi import APIRouter, Body
-from src.db.main import get_session
-from src.reviews.schema import ReviewCreateSchema,ReviewGetSchema
+from fastapi import APIRouter, Body, Query
+from typing import Optional
+from src.db.main import get_session,get_read_session
+from src.reviews.schema import ReviewCreateSchema,ReviewGetSchema,ReviewPage
 from src.reviews.review_service import ReviewService
 from fastapi import Depends
 from src.auth.dependencies import get_current_logged_user
 from fastapi import HTTPException
 from src.reviews.schema import ReviewCreateSchema,ReviewUpdateSchema
 from src.db.models import User
+from src.serializers import review_page_serializer
 
 review_service=ReviewService()
 review_router=APIRouter()
 
-@review_router.get("/get_all_reviews")
-async def get_all_reviews(session=Depends(get_session)):
-    get_reviews=await review_service.retrive_all_reviews(session=session)
-    return get_reviews
+@review_router.get("/get_all_reviews",response_model=ReviewPage)
+async def get_all_reviews(
+    limit:int=Query(default=20,ge=1,le=100),
+    cursor:Optional[str]=None,
+    session=Depends(get_read_session)
+):
+    reviews,next_cursor=await review_service.retrive_all_reviews(session=session,limit=limit,cursor=cursor)
+    return review_page_serializer.response({"reviews":reviews,"next_cursor":next_cursor})
 
 @review_router.get("/get_review_by_id/{review_id}")
-async def get_review_by_id(review_id:str,session=Depends(get_session)):
+async def get_review_by_id(review_id:str,session=Depends(get_read_session)):
     get_review=await review_service.get_review_by_id(review_id=review_id,session=session)
     return get_review
 
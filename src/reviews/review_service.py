@@ -2,23 +2,47 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi import status
 from fastapi.exceptions import HTTPException
 from sqlmodel import select,desc
+from sqlalchemy import tuple_
 from src.db.models import Review
+from src.db.pagination import decode_cursor,split_page
 from src.books.service import BookService
+from src.books.cache import invalidate_book
 from src.auth.user_service import UserService
 from fastapi import Depends
-from src.reviews.schema import ReviewCreateSchema,ReviewUpdateSchema
+from src.reviews.schema import ReviewCreateSchema,ReviewUpdateSchema,ReviewGetSchema
 import uuid
 
 user_service=UserService()
 book_service=BookService()
 
+# the review listings select exactly the columns of ReviewGetSchema
+REVIEW_FIELDS=tuple(ReviewGetSchema.model_fields)
+REVIEW_COLUMNS=[getattr(Review,name) for name in REVIEW_FIELDS]
+
 class ReviewService:
-    async def retrive_all_reviews(self,session:AsyncSession):
-        get_all=select(Review).order_by(desc(Review.created_at))
-        result=await session.exec(get_all)
-        return result.all()
+    async def retrive_all_reviews(self,session:AsyncSession,limit:int=20,cursor:str|None=None):
+        '''Retrives one page of all reviews, newest first, keyed on (created_at, uid).
+           Reviews are read as plain column rows, without the user and book relationships.
+           It returns the reviews of the page as dicts and the cursor of the next page.
+        '''
+        return await self._review_page(select(*REVIEW_COLUMNS),session,limit,cursor)
+
+    async def get_book_reviews(self,book_uid:uuid.UUID,session:AsyncSession,limit:int=20,cursor:str|None=None):
+        '''Retrives one page of the reviews of a single book, newest first.
+           Each page is a range scan on ix_reviews_book_uid_created_at_uid,
+           so a book with many thousand reviews is browsed a page at a time.
+        '''
+        return await self._review_page(select(*REVIEW_COLUMNS).where(Review.book_uid==book_uid),session,limit,cursor)
+
+    async def _review_page(self,statement,session:AsyncSession,limit:int,cursor:str|None):
+        statement=statement.order_by(desc(Review.created_at),desc(Review.uid)).limit(limit+1)
+        if cursor:
+            created_at,review_uid=decode_cursor(cursor)
+            statement=statement.where(tuple_(Review.created_at,Review.uid)<tuple_(created_at,review_uid))
+        result=await session.exec(statement)
+        rows,next_cursor=split_page(result.all(),limit,"created_at","uid")
+        return [dict(zip(REVIEW_FIELDS,row)) for row in rows],next_cursor
         
-    
     async def get_review_by_id(self,review_id:str,session:AsyncSession):
         try:
             # ensure review_id is a UUID when querying
@@ -45,7 +69,8 @@ class ReviewService:
     async def create_review(self,user_email:str,book_uid:str,review_data:ReviewCreateSchema,session:AsyncSession):
         try:
             user=await user_service.get_user_by_email(user_email,session)
-            book=await book_service.get_book_by_id(book_uid,session)
+            # a uuid.UUID binds on every driver, a str only on asyncpg
+            book=await book_service.get_book_by_id(uuid.UUID(str(book_uid)),session)
             
             if not user or not book:
                 return {"message":"The user or book not found"}
@@ -55,8 +80,10 @@ class ReviewService:
                 new_review.user=user
                 new_review.book=book
                 session.add(new_review)
+                await book_service.adjust_rating(book.id,session,new_review.rating,1)
                 await session.commit()
                 await session.refresh(new_review)
+                await invalidate_book(book.id)
                 return new_review
     
         except:
@@ -76,10 +103,19 @@ class ReviewService:
                      return None
              review_update=await self.get_review_by_id(review_id=review_id,session=session)
              if review_update is not None:
+                 old_rating=review_update.rating
                  update_data=review_data.model_dump(exclude_unset=True)
+                 # no rating, or a null one, keeps the old rating
+                 if update_data.get("rating") is None:
+                     update_data.pop("rating",None)
                  for key,value in update_data.items():
                      setattr(review_update,key,value)
+                 rating_changed=review_update.rating!=old_rating and review_update.book_uid is not None
+                 if rating_changed:
+                     await book_service.adjust_rating(review_update.book_uid,session,review_update.rating-old_rating,0)
                  await session.commit()
+                 if rating_changed:
+                     await invalidate_book(review_update.book_uid)
                  return review_update
              
                      
@@ -91,8 +127,13 @@ class ReviewService:
         review_to_delete = await self.get_review_by_id(review_id=review_id,session=session)
 
         if review_to_delete is not None:
+            book_uid=review_to_delete.book_uid
             await session.delete(review_to_delete)
+            if book_uid is not None:
+                await book_service.adjust_rating(book_uid,session,-review_to_delete.rating,-1)
             await session.commit()
+            if book_uid is not None:
+                await invalidate_book(book_uid)
             return True
         else:
             return False
\ No newline at end of file
@@ -15,6 +15,15 @@ class ReviewGetSchema(BaseModel):
     book_uid:Optional[uuid.UUID]
     created_at:datetime
     updated_at:datetime
+
+
+class ReviewPage(BaseModel):
+    '''
+    One page of reviews, newest first. Pass next_cursor back as ?cursor=
+    to get the next page, it is null on the last page.
+    '''
+    reviews:list[ReviewGetSchema]
+    next_cursor:Optional[str]=None
     
 
 class ReviewCreateSchema(BaseModel):
@@ -29,6 +38,6 @@ class ReviewCreateSchema(BaseModel):
     review_txt:str = Field(alias="review_text")
 
 class ReviewUpdateSchema(BaseModel):
-  rating:Optional[int]
+  rating:Optional[int]=None
   review_txt:Optional[str]=Field(alias="review_text")
   
\ No newline at end of file
@@ -0,0 +1,61 @@
+# Fast JSON path for the large list responses.
+# With a response_model FastAPI validates what the route returned into model
+# instances, converts those into JSON compatible Python objects and only then
+# renders the bytes, so every row is walked three times. These serializers
+# check the rows once against a TypedDict mirror of the response model
+# (plain dicts in, plain dicts out, no model instances) and hand the result
+# straight to orjson. Routes keep their response_model for the OpenAPI schema
+# and return the ready Response.
+import types
+from functools import cache
+from typing import Any,Union,get_args,get_origin
+from typing_extensions import TypedDict
+import orjson
+from fastapi import Response
+from pydantic import BaseModel,TypeAdapter
+from src.books.schemas import BookPage
+from src.reviews.schema import ReviewPage
+from src.tags.schemas import TagListItem
+
+
+@cache
+def _row_dict(model:type[BaseModel])->type:
+    '''
+    TypedDict with the fields of model. total=False, so a row only has to
+    carry the keys it was selected with; keys the model does not know
+    are dropped by the validation.
+    '''
+    fields={name:_row_type(field.annotation) for name,field in model.model_fields.items()}
+    return TypedDict(f"{model.__name__}Row",fields,total=False)
+
+
+def _row_type(annotation:Any)->Any:
+    if isinstance(annotation,type) and issubclass(annotation,BaseModel):
+        return _row_dict(annotation)
+    origin=get_origin(annotation)
+    if origin is None:
+        return annotation
+    args=tuple(_row_type(arg) for arg in get_args(annotation))
+    if origin in (Union,types.UnionType):
+        return Union[args]
+    return origin[args]
+
+
+class FastSerializer:
+    '''
+    Serializes content shaped like schema (a model or e.g. list[Model]),
+    built from plain dicts such as the column rows of the list queries.
+    '''
+    def __init__(self,schema:Any)->None:
+        self.adapter=TypeAdapter(_row_type(schema))
+
+    def dump(self,content:Any)->bytes:
+        return orjson.dumps(self.adapter.validate_python(content))
+
+    def response(self,content:Any,headers:dict|None=None)->Response:
+        return Response(content=self.dump(content),media_type="application/json",headers=headers)
+
+
+book_page_serializer=FastSerializer(BookPage)
+review_page_serializer=FastSerializer(ReviewPage)
+tag_list_serializer=FastSerializer(list[TagListItem])
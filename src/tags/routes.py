@@ -1,15 +1,18 @@
-from typing import List
+from typing import List, Optional, Union
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Request, status
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 
 from src.auth.dependencies import RoleChecker
 from src.books.schemas import Book
-from src.db.main import get_session
+from src.db.main import get_session, get_read_session
+from src.db.projection import parse_fields
+from src.etag import make_etag, etag_matches, not_modified
+from src.serializers import tag_list_serializer
 
-from .schemas import TagAddSchema,TagCreateSchema,TagSchema
-from .service import TagService
+from .schemas import TagAddSchema,TagCreateSchema,TagListItem,TagSchema
+from .service import TagService,TAG_LIST_FIELDS
 from src.errors import (
     TagAlreadyExists,
     TagNotFound,
@@ -21,11 +24,24 @@ tag_service = TagService()
 user_role_checker = Depends(RoleChecker(["user", "admin"]))
 
 
-@tags_router.get("/", response_model=List[TagSchema], dependencies=[user_role_checker])
-async def get_all_tags(session: AsyncSession = Depends(get_session)):
+@tags_router.get(
+    "/",
+    response_model=List[TagListItem],
+    dependencies=[user_role_checker],
+)
+async def get_all_tags(
+    request: Request,
+    fields: Optional[str] = Query(default=None, description="comma separated tag fields to return, uid is always included"),
+    session: AsyncSession = Depends(get_read_session),
+):
+    columns = parse_fields(fields, TAG_LIST_FIELDS)
+    # a cheap max/count decides a repeat poll before any tag is loaded
+    etag = make_etag(*await tag_service.get_tags_version(session), columns)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
     try:
-        tags = await tag_service.get_all_tags(session)
-        return tags
+        tags = await tag_service.get_all_tags(session, fields=columns)
+        return tag_list_serializer.response(tags, headers={"ETag": etag})
     except TagNotFound:
         raise TagNotFound()
 
@@ -57,12 +73,15 @@ async def add_tag(
     "/book/{book_uid}/tags", response_model=Book, dependencies=[user_role_checker]
 )
 async def add_tags_to_book(
-    book_uid: str, tag_data: TagCreateSchema, session: AsyncSession = Depends(get_session)
+    book_uid: str,
+    tag_data: Union[TagAddSchema, TagCreateSchema],
+    session: AsyncSession = Depends(get_session),
 ) -> Book:
-
-    tag_add_data = TagAddSchema(tags=[tag_data])
+    # accepts a single tag ({"name": ...}) or a batch ({"tags": [...]})
+    if isinstance(tag_data, TagCreateSchema):
+        tag_data = TagAddSchema(tags=[tag_data])
     book_with_tag = await tag_service.add_tag_to_books(
-        book_uid=book_uid, tag_data=tag_add_data, session=session
+        book_uid=book_uid, tag_data=tag_data, session=session
     )
 
     return book_with_tag
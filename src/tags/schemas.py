@@ -1,5 +1,6 @@
 
 from pydantic import BaseModel
+from typing import Optional
 import uuid
 from datetime import datetime
 
@@ -10,6 +11,16 @@ class TagSchema(BaseModel):
     created_at:datetime
 
 
+class TagListItem(BaseModel):
+    '''
+    A tag in the tag listing. Every field is optional because ?fields=
+    may leave some out, the route drops the unset ones from the response.
+    '''
+    uid:Optional[uuid.UUID]=None
+    name:Optional[str]=None
+    created_at:Optional[datetime]=None
+
+
 class TagCreateSchema(BaseModel):
     name:str
     
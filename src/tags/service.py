@@ -1,35 +1,57 @@
 from fastapi import status
 from fastapi.exceptions import HTTPException
-from sqlmodel import select,desc
+from sqlmodel import select,desc,func
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import literal
+from sqlalchemy.dialects import postgresql,sqlite
 
 from src.books.service import BookService
-from src.db.models import Tag
+from src.books.cache import invalidate_book
+from src.db.models import Tag,BookTag
 
-from .schemas import TagAddSchema,TagCreateSchema
+from .schemas import TagAddSchema,TagCreateSchema,TagListItem
 
 book_service=BookService()
 
+# columns a client can ask for with ?fields= on the tag listing
+TAG_LIST_FIELDS=tuple(TagListItem.model_fields)
+
 server_error=HTTPException(
     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
     detail="Some thing went wrong"
 )
 
 class TagService:
-    async def get_all_tags(self,session:AsyncSession):
+    async def get_all_tags(self,session:AsyncSession,fields:list[str]|tuple[str,...]=TAG_LIST_FIELDS):
         '''
-          Returns all tags
+          Returns all tags as dicts holding the uid and the given fields.
+          Only those columns are selected, the books of each tag are not loaded.
         '''
-        statement=select(Tag).order_by(desc(Tag.created_at))
+        names=list(dict.fromkeys(["uid",*fields]))
+        statement=select(*(getattr(Tag,name) for name in names)).order_by(desc(Tag.created_at))
         result=await session.exec(statement)
-        return result.all()
+        return [dict(zip(names,row)) for row in result.all()]
     
+    async def get_tags_version(self,session:AsyncSession)->tuple:
+        '''
+          Returns (max(updated_at), count) of the tags table, the version the
+          tag list ETag is built from. A rename moves the max, a delete the count.
+        '''
+        result=await session.exec(select(func.max(Tag.updated_at),func.count()).select_from(Tag))
+        return tuple(result.one())
+
     async def add_tag_to_books(
         self,
         book_uid:str,
         tag_data:TagAddSchema,
         session:AsyncSession
     ):
+        '''
+          Attaches all the given tags to the book, creating the missing ones.
+          The tags are upserted with one INSERT ... ON CONFLICT DO NOTHING and
+          linked with one INSERT ... SELECT, so twenty tags cost the same
+          round trips as one. Tags already on the book are left alone.
+        '''
         book=await book_service.get_book_by_id(book_uid=book_uid,session=session)
         
         if not book:
@@ -37,19 +59,34 @@ class TagService:
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="book not found"
             )
-        for tag_item in tag_data.tags:
-            result=await session.exec(
-                select(Tag).where(Tag.name==tag_item.name)
+        # drop duplicates but keep the order the client sent them in
+        names=list(dict.fromkeys(tag_item.name for tag_item in tag_data.tags))
+        if names:
+            await session.exec(
+                _insert_ignore(session,Tag)
+                .values([{"name":name} for name in names])
+                .on_conflict_do_nothing(index_elements=["name"])
+            )
+            # RETURNING would only give back the tags inserted just now,
+            # selecting by name also picks up the ones that already existed
+            await session.exec(
+                _insert_ignore(session,BookTag)
+                .from_select(
+                    ["book_id","tag_id"],
+                    select(literal(book.id,BookTag.book_id.type),Tag.uid).where(Tag.name.in_(names))
+                )
+                .on_conflict_do_nothing()
             )
-            tag=result.one_or_none()
-            if not tag:
-                tag=Tag(name=tag_item.name)
-            book.tags.append(tag)
-            session.add(book)
             await session.commit()
-            await session.refresh(book)
-            return book
+            await invalidate_book(book.id)
+            await session.refresh(book,["tags"])
+        return book
     
+    async def get_tag_by_name(self,tag_name:str,session:AsyncSession):
+        statement=select(Tag).where(Tag.name==tag_name)
+        result=await session.exec(statement)
+        return result.first()
+
     async def get_tag_by_uid(self,tag_uid:str,session:AsyncSession):
         statement=select(Tag).where(Tag.uid==tag_uid)
         result=await session.exec(statement)
@@ -93,5 +130,12 @@ class TagService:
             )
         await session.delete(tag)
         await session.commit()
-        
-    
\ No newline at end of file
+
+
+def _insert_ignore(session:AsyncSession,model):
+    '''
+    INSERT construct of the session's dialect, both postgres and sqlite
+    support ON CONFLICT DO NOTHING.
+    '''
+    dialect=sqlite if session.bind.dialect.name=="sqlite" else postgresql
+    return dialect.insert(model)
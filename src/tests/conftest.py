@@ -9,6 +9,10 @@ from unittest.mock import Mock
 from fastapi.testclient import TestClient
 import pytest
 from src.auth.dependencies import AccessTokenBearer,RoleChecker,RefreshTokenBearer
+# test dependencies, see requirements.txt: the driver of sqlite_url and the
+# stand-in Redis server, imported here so a missing one fails the run
+import aiosqlite  # noqa: F401
+import fakeredis
 
 mock_session = Mock()
 mock_user_service = Mock()
@@ -44,4 +48,33 @@ def test_client():
 
 @pytest.fixture
 def test_book_service():
-    return mock_book_service
\ No newline at end of file
+    return mock_book_service
+
+@pytest.fixture
+def sqlite_url(tmp_path):
+    '''URL of a sqlite file with the tables of the models, for the service tests.'''
+    import asyncio
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlmodel import SQLModel
+
+    url=f"sqlite+aiosqlite:///{tmp_path/'bookly.db'}"
+
+    async def create_tables():
+        engine=create_async_engine(url)
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        await engine.dispose()
+
+    asyncio.run(create_tables())
+    return url
+
+
+@pytest.fixture
+def book_cache(monkeypatch):
+    '''The book cache on a fakeredis server, so service writes can invalidate it.'''
+    from src.books import cache
+    from src.db.redis_client import RedisManager
+
+    fake=fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(cache,"redis_manager",RedisManager(client=fake))
+    return fake
@@ -14,4 +14,37 @@ def test_user_creation(test_session, test_user_service, test_client):
     user_data=UserCreateModel(**signup_data)
     assert test_user_service.user_exists_called_once()
     assert test_user_service.create_user_called_once_with(user_data,test_session)
-    
\ No newline at end of file
+    
+
+def test_principal_is_resolved_once_per_request(monkeypatch):
+    from types import SimpleNamespace
+    from fastapi.testclient import TestClient
+    from src import app
+    from src.auth import dependencies
+    from src.auth.utils import access_token
+    from src.books import routes as book_routes
+
+    calls={"blocklist":0,"user":0}
+
+    async def check_black_list(jti):
+        calls["blocklist"]+=1
+        return False
+
+    async def get_user_by_email(email,session):
+        calls["user"]+=1
+        return SimpleNamespace(email=email,role="user",is_verified=True)
+
+    async def get_all_books(session,limit,cursor,**kwargs):
+        return [],None
+
+    monkeypatch.setattr(dependencies,"check_black_list",check_black_list)
+    monkeypatch.setattr(dependencies.user_service,"get_user_by_email",get_user_by_email)
+    monkeypatch.setattr(book_routes.book_service,"get_all_books",get_all_books)
+
+    token=access_token(user_data={"email":"khan@gmail.com","u_id":"1","role":"user"})
+    client=TestClient(app=app,base_url="http://localhost")
+    response=client.get("/api/v1/books/",headers={"Authorization":f"Bearer {token}"})
+
+    assert response.status_code==200
+    assert calls=={"blocklist":1,"user":1}
+    assert response.headers["Server-Timing"].startswith("auth;dur=")
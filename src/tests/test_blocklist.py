@@ -0,0 +1,190 @@
+import asyncio
+import time
+
+import fakeredis
+import pytest
+
+from src.db import redis_client as blocklist
+
+
+def test_mirror_follows_snapshot_and_revocations(monkeypatch):
+    fake=fakeredis.FakeAsyncRedis()
+    mirror=blocklist.RevokedTokenMirror()
+    monkeypatch.setattr(blocklist,"redis_manager",blocklist.RedisManager(client=fake))
+    monkeypatch.setattr(blocklist,"revoked_tokens",mirror)
+
+    async def wait_for(condition):
+        for _ in range(200):
+            if condition():
+                return
+            await asyncio.sleep(0.01)
+        raise AssertionError("condition not reached")
+
+    async def scenario():
+        # not synced yet: answered by Redis
+        await blocklist.create_jti_blocklist("before-start")
+        mirror.expires_at.clear()
+        assert await blocklist.check_black_list("before-start")
+
+        mirror.start()
+        await wait_for(lambda:mirror.synced)
+        assert mirror.contains("before-start")
+
+        # a revocation made by another worker arrives through pub/sub
+        await fake.publish(blocklist.REVOKED_JTI_CHANNEL,f"other-worker {time.time()+60}")
+        await wait_for(lambda:mirror.contains("other-worker"))
+
+        async def unreachable(jti):
+            raise AssertionError("synced lookups must not hit Redis")
+        monkeypatch.setattr(fake,"get",unreachable)
+        assert await blocklist.check_black_list("other-worker")
+        assert not await blocklist.check_black_list("never-revoked")
+
+        await mirror.stop()
+        assert not mirror.synced
+        await fake.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_expired_entries_are_not_revoked():
+    mirror=blocklist.RevokedTokenMirror()
+    mirror.add("old",time.time()-1)
+    assert not mirror.contains("old")
+    assert "old" not in mirror.expires_at
+
+
+def test_breaker_fails_fast_and_refuses_unverifiable_tokens(monkeypatch):
+    from redis.exceptions import ConnectionError as RedisConnectionError
+    from src.errors import RevocationCheckUnavailable
+
+    calls=[]
+
+    class DownRedis:
+        async def get(self,key):
+            calls.append(key)
+            raise RedisConnectionError("connection refused")
+
+    manager=blocklist.RedisManager(client=DownRedis())
+    manager.breaker=blocklist.CircuitBreaker(failure_threshold=2,reset_timeout=0.05)
+    monkeypatch.setattr(blocklist,"redis_manager",manager)
+    monkeypatch.setattr(blocklist,"revoked_tokens",blocklist.RevokedTokenMirror())
+
+    async def scenario():
+        for _ in range(4):
+            with pytest.raises(RevocationCheckUnavailable):
+                await blocklist.check_black_list("jti")
+        # two real attempts opened the breaker, the other two never reached Redis
+        assert len(calls)==2
+        assert manager.breaker.is_open
+
+        await asyncio.sleep(0.06)
+        with pytest.raises(RevocationCheckUnavailable):
+            await blocklist.check_black_list("jti")
+        # one half open trial, which failed and opened the breaker again
+        assert len(calls)==3
+        with pytest.raises(blocklist.CircuitOpen):
+            await manager.run("get","jti")
+
+    asyncio.run(scenario())
+
+
+def test_only_the_half_open_trial_lets_the_next_trial_through():
+    from redis.exceptions import ConnectionError as RedisConnectionError
+
+    released={}
+    reached=[]
+
+    class SlowRedis:
+        async def get(self,key):
+            reached.append(key)
+            if key=="fast":
+                raise RedisConnectionError("connection refused")
+            if key in ("straggler","trial"):
+                await released.setdefault(key,asyncio.Event()).wait()
+            return b"ok"
+
+    manager=blocklist.RedisManager(client=SlowRedis())
+    manager.breaker=blocklist.CircuitBreaker(failure_threshold=1,reset_timeout=0.05)
+
+    async def scenario():
+        # started while the breaker was closed, its caller gives up later
+        straggler=asyncio.create_task(manager.run("get","straggler"))
+        await asyncio.sleep(0)
+        with pytest.raises(RedisConnectionError):
+            await manager.run("get","fast")
+        assert manager.breaker.is_open
+
+        await asyncio.sleep(0.06)
+        trial=asyncio.create_task(manager.run("get","trial"))
+        await asyncio.sleep(0)
+        straggler.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await straggler
+        # the straggler ending does not end the trial still in flight
+        with pytest.raises(blocklist.CircuitOpen):
+            await manager.run("get","second trial")
+
+        released["trial"].set()
+        assert await trial==b"ok"
+        assert not manager.breaker.is_open
+        assert await manager.run("get","after")==b"ok"
+        assert reached==["straggler","fast","trial","after"]
+
+    asyncio.run(scenario())
+
+
+def test_a_silently_dead_subscription_stops_being_trusted(monkeypatch):
+    fake=fakeredis.FakeAsyncRedis()
+    mirror=blocklist.RevokedTokenMirror()
+    monkeypatch.setattr(blocklist,"redis_manager",blocklist.RedisManager(client=fake))
+    monkeypatch.setattr(blocklist,"revoked_tokens",mirror)
+    monkeypatch.setattr(blocklist.Config,"BLOCKLIST_PING_SECONDS",0.05)
+    state={"silent":False}
+    subscribe=fake.pubsub
+
+    def pubsub():
+        connection=subscribe()
+        get_message,ping=connection.get_message,connection.ping
+
+        async def quiet_get_message(**kwargs):
+            if state["silent"]:
+                # what a half open TCP connection looks like: no error, no data
+                await asyncio.sleep(kwargs.get("timeout") or 0)
+                return None
+            return await get_message(**kwargs)
+
+        async def quiet_ping(*args):
+            if not state["silent"]:
+                await ping(*args)
+
+        connection.get_message,connection.ping=quiet_get_message,quiet_ping
+        return connection
+
+    monkeypatch.setattr(fake,"pubsub",pubsub)
+
+    async def wait_for(condition):
+        for _ in range(300):
+            if condition():
+                return
+            await asyncio.sleep(0.01)
+        raise AssertionError("condition not reached")
+
+    async def scenario():
+        mirror.start()
+        await wait_for(lambda:mirror.synced)
+        await asyncio.sleep(0.2)
+        # the pings are answered, the mirror stays trusted
+        assert mirror.synced
+
+        state["silent"]=True
+        await wait_for(lambda:not mirror.synced)
+        # revoked while the subscription was dead, found by asking Redis
+        await fake.set("revoked-meanwhile","")
+        assert await blocklist.check_black_list("revoked-meanwhile")
+
+        state["silent"]=False
+        await wait_for(lambda:mirror.synced)
+        await mirror.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,70 @@
+import asyncio
+import uuid
+
+import fakeredis
+
+from src.books import cache
+from src.db.redis_client import RedisManager
+from src.metrics import book_cache_requests
+
+
+def _count(result):
+    return book_cache_requests.labels(result)._value.get()
+
+
+def test_read_through_and_invalidation(monkeypatch):
+    fake=fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(cache,"redis_manager",RedisManager(client=fake))
+    book_id=uuid.uuid4()
+    hits,misses=_count("hit"),_count("miss")
+
+    async def scenario():
+        assert await cache.get_cached_book(book_id) is None
+        await cache.cache_book(book_id,'{"title":"x"}','W/"v1"')
+        assert await cache.get_cached_book(book_id)==('W/"v1"',b'{"title":"x"}')
+        ttl=await fake.ttl(f"book:{book_id}")
+        await cache.invalidate_book(book_id)
+        assert await cache.get_cached_book(book_id) is None
+        return ttl
+
+    assert asyncio.run(scenario())==cache.Config.BOOK_CACHE_TTL
+    assert _count("hit")-hits==1
+    assert _count("miss")-misses==2
+
+
+def test_a_slow_reader_can_not_refill_the_old_version_after_an_update(monkeypatch):
+    fake=fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(cache,"redis_manager",RedisManager(client=fake))
+    book_id=uuid.uuid4()
+    row={"version":"v1"}
+    loaded=asyncio.Event()
+    updated=asyncio.Event()
+
+    async def slow_reader():
+        assert await cache.get_cached_book(book_id) is None
+        version=row["version"]
+        loaded.set()
+        # still serializing the old row while the update commits
+        await updated.wait()
+        await cache.cache_book(book_id,f'{{"version":"{version}"}}',f'W/"{version}"')
+
+    async def update():
+        await loaded.wait()
+        row["version"]="v2"
+        await cache.invalidate_book(book_id)
+        updated.set()
+
+    async def scenario():
+        await asyncio.gather(slow_reader(),update())
+        # the old version was not put back, the next read goes to the database
+        assert await cache.get_cached_book(book_id) is None
+        await cache.cache_book(book_id,'{"version":"v2"}','W/"v2"')
+        assert await cache.get_cached_book(book_id) is None
+
+        # once the tombstone is gone the new version is cached again
+        await fake.pexpire(f"book:{book_id}",1)
+        await asyncio.sleep(0.01)
+        await cache.cache_book(book_id,'{"version":"v2"}','W/"v2"')
+        assert await cache.get_cached_book(book_id)==('W/"v2"',b'{"version":"v2"}')
+
+    asyncio.run(scenario())
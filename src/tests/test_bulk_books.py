@@ -0,0 +1,67 @@
+import asyncio
+import uuid
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.books.service import BULK_ROW_REJECTED,BookService
+from src.db.models import Book
+
+
+def _record(title,**changes):
+    record={
+        "title":title,"author":"a","year":2000,"isbn":"i","pages":100,
+        "price":9.5,"available":True,"summary":"s",
+    }
+    record.update(changes)
+    return record
+
+
+def test_bulk_create_reports_every_row_in_request_order(sqlite_url,caplog):
+    engine=create_async_engine(sqlite_url)
+    owner=uuid.uuid4()
+    records=[
+        _record("first"),
+        {"author":"no title"},
+        _record("second"),
+        # passes validation, the database refuses it
+        _record("refused",isbn="rejected"),
+        _record("bad pages",pages="many"),
+        _record("third"),
+    ]
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql(
+                "CREATE TRIGGER reject_isbn BEFORE INSERT ON books WHEN NEW.isbn='rejected' "
+                "BEGIN SELECT RAISE(ABORT,'isbn rejected'); END"
+            )
+        async with AsyncSession(engine,expire_on_commit=False) as session:
+            # the second chunk (refused, third) fails and is retried row by row
+            results=await BookService().bulk_create_books(records,owner,session,chunk_size=2)
+        async with AsyncSession(engine) as session:
+            rows=await session.exec(select(Book.id,Book.title,Book.user_uid))
+            stored={book_id:(title,user_uid) for book_id,title,user_uid in rows.all()}
+        return results,stored
+
+    async def run():
+        try:
+            return await scenario()
+        finally:
+            await engine.dispose()
+
+    results,stored=asyncio.run(run())
+
+    assert [(result["index"],result["status"]) for result in results]==[
+        (0,"created"),(1,"failed"),(2,"created"),(3,"failed"),(4,"failed"),(5,"created"),
+    ]
+    assert results[1]["error"].startswith("title: Field required")
+    # the database's message is logged, the client gets a fixed one
+    assert results[3]["error"]==BULK_ROW_REJECTED
+    assert "isbn rejected" in caplog.text
+    assert results[4]["error"].startswith("pages:")
+    assert stored=={
+        results[index]["id"]:(title,owner)
+        for index,title in ((0,"first"),(2,"second"),(5,"third"))
+    }
@@ -0,0 +1,85 @@
+import asyncio
+
+from sqlalchemy import event,func
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.auth.user_service import UserService
+from src.db.models import Book,BookTag,Review,Tag,User
+
+
+def _user(name):
+    return User(username=name,email=f"{name}@example.com",password_hash="x",role="user")
+
+
+def _book(title,owner):
+    return Book(title=title,author="a",year=2000,isbn="i",pages=1,price=1.0,available=True,summary="s",user_uid=owner.uid)
+
+
+def test_delete_user_removes_everything_attached_in_a_fixed_number_of_statements(sqlite_url,book_cache):
+    engine=create_async_engine(sqlite_url)
+    statements=[]
+
+    def record(conn,cursor,statement,parameters,context,executemany):
+        statements.append(statement)
+
+    async def scenario():
+        async with AsyncSession(engine,expire_on_commit=False) as session:
+            reader=_user("reader")
+            doomed={size:_user(f"doomed{size}") for size in (1,6)}
+            session.add_all([reader,*doomed.values()])
+            await session.flush()
+            shelf=[_book(f"shelf {n}",reader) for n in range(6)]
+            tags=[Tag(name=f"tag{n}") for n in range(6)]
+            session.add_all([*shelf,*tags])
+            reviews=[Review(rating=4,review_txt="r",user_uid=reader.uid,book_uid=book.id) for book in shelf]
+            for size,user in doomed.items():
+                # size books of their own, each tagged and reviewed size times,
+                # and a review on size of the reader's books
+                books=[_book(f"{user.username} {n}",user) for n in range(size)]
+                session.add_all(books)
+                await session.flush()
+                session.add_all(BookTag(book_id=book.id,tag_id=tag.uid) for book in books for tag in tags[:size])
+                reviews+=[Review(rating=3,review_txt="r",user_uid=reader.uid,book_uid=book.id) for book in books for _ in range(size)]
+                reviews+=[Review(rating=size%5,review_txt="r",user_uid=user.uid,book_uid=book.id) for book in shelf[:size]]
+            session.add_all(reviews)
+            for book in shelf:
+                ratings=[review.rating for review in reviews if review.book_uid==book.id]
+                book.rating_sum,book.rating_count,book.rating_avg=sum(ratings),len(ratings),sum(ratings)/len(ratings)
+            await session.commit()
+
+        counts={}
+        event.listen(engine.sync_engine,"before_cursor_execute",record)
+        for size,user in doomed.items():
+            statements.clear()
+            async with AsyncSession(engine) as session:
+                assert await UserService().delete_user(user.email,session)
+            counts[size]=len(statements)
+        event.remove(engine.sync_engine,"before_cursor_execute",record)
+        # six books with six tags and reviews each cost what one book does
+        assert counts[6]==counts[1]
+
+        async with AsyncSession(engine) as session:
+            users=await session.exec(select(User.username))
+            assert users.all()==["reader"]
+            books=await session.exec(select(Book.id,Book.rating_sum,Book.rating_count,Book.rating_avg))
+            books=books.all()
+            assert sorted(book_id for book_id,*_ in books)==sorted(book.id for book in shelf)
+            links=await session.exec(select(func.count()).select_from(BookTag))
+            assert links.one()==0
+            tag_count=await session.exec(select(func.count()).select_from(Tag))
+            assert tag_count.one()==6
+            left=await session.exec(select(Review.book_uid,Review.rating,Review.user_uid))
+            left=left.all()
+        # only the reader's own review is left on each shelf book
+        assert sorted(left)==sorted((book.id,4,reader.uid) for book in shelf)
+        assert {book_id:(rating_sum,count,avg) for book_id,rating_sum,count,avg in books}=={book.id:(4,1,4.0) for book in shelf}
+
+    async def run():
+        try:
+            await scenario()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
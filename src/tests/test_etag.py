@@ -0,0 +1,62 @@
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from src import app
+from src.auth import dependencies
+from src.auth.utils import access_token
+from src.books import routes as book_routes
+from src.etag import make_etag,etag_matches
+
+
+def test_etag_matching_is_weak_and_accepts_lists():
+    etag=make_etag(uuid.UUID(int=1),datetime(2024,1,1))
+    assert etag.startswith('W/"')
+    assert etag==make_etag(uuid.UUID(int=1),datetime(2024,1,1))
+    assert etag!=make_etag(uuid.UUID(int=1),datetime(2024,1,2))
+    assert etag_matches(f'"other", {etag.removeprefix("W/")}',etag)
+    assert etag_matches("*",etag)
+    assert not etag_matches(None,etag)
+    assert not etag_matches('"other"',etag)
+
+
+def test_book_poll_gets_304_without_loading_the_book(monkeypatch):
+    book_id=uuid.uuid4()
+    updated_at=datetime(2024,5,17,10,30)
+    etag=make_etag(book_id,updated_at)
+    loaded=[]
+
+    async def check_black_list(jti):
+        return False
+
+    async def get_user_by_email(email,session):
+        return SimpleNamespace(email=email,role="user",is_verified=True)
+
+    async def get_cached_book(book_id):
+        return None
+
+    async def get_book_version(book_uid,session):
+        return updated_at
+
+    async def get_book_by_id(book_uid,session):
+        loaded.append(book_uid)
+
+    monkeypatch.setattr(dependencies,"check_black_list",check_black_list)
+    monkeypatch.setattr(dependencies.user_service,"get_user_by_email",get_user_by_email)
+    monkeypatch.setattr(book_routes,"get_cached_book",get_cached_book)
+    monkeypatch.setattr(book_routes.book_service,"get_book_version",get_book_version)
+    monkeypatch.setattr(book_routes.book_service,"get_book_by_id",get_book_by_id)
+
+    token=access_token(user_data={"email":"khan@gmail.com","u_id":"1","role":"user"})
+    client=TestClient(app=app,base_url="http://localhost")
+    response=client.get(
+        f"/api/v1/books/{book_id}",
+        headers={"Authorization":f"Bearer {token}","If-None-Match":etag}
+    )
+
+    assert response.status_code==304
+    assert response.headers["ETag"]==etag
+    assert response.content==b""
+    assert loaded==[]
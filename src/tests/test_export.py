@@ -0,0 +1,87 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime,timedelta
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src import app
+from src.auth import dependencies
+from src.auth.utils import access_token
+from src.books import routes as book_routes
+from src.books.export import EXPORT_FIELDS
+from src.db.main import get_session
+from src.db.models import Book
+
+
+def test_export_streams_every_row_in_both_formats(sqlite_url,monkeypatch):
+    # connections are not pooled, the test client serves the app on its own event loop
+    engine=create_async_engine(sqlite_url,poolclass=NullPool)
+    start=datetime(2024,1,1)
+    titles=[f"book {n}" for n in range(7)]
+
+    async def add_books():
+        async with AsyncSession(engine) as session:
+            session.add_all(
+                Book(
+                    title=title,author="a, b",year=2000,isbn="i",pages=1,price=1.5,available=True,
+                    summary='says "hi"\non two lines',created_at=start+timedelta(minutes=n),updated_at=start,
+                )
+                for n,title in enumerate(titles)
+            )
+            await session.commit()
+
+    asyncio.run(add_books())
+
+    async def sqlite_session():
+        async with AsyncSession(engine) as session:
+            yield session
+
+    async def check_black_list(jti):
+        return False
+
+    async def get_user_by_email(email,session):
+        return SimpleNamespace(email=email,role="user",is_verified=True)
+
+    batches=[]
+    stream_books=book_routes.book_service.stream_books
+
+    async def small_batches(session):
+        async for rows in stream_books(session,batch_size=3):
+            batches.append(len(rows))
+            yield rows
+
+    monkeypatch.setitem(app.dependency_overrides,get_session,sqlite_session)
+    monkeypatch.setattr(dependencies,"check_black_list",check_black_list)
+    monkeypatch.setattr(dependencies.user_service,"get_user_by_email",get_user_by_email)
+    monkeypatch.setattr(book_routes.book_service,"stream_books",small_batches)
+
+    token=access_token(user_data={"email":"khan@gmail.com","u_id":"1","role":"user"})
+    client=TestClient(app=app,base_url="http://localhost")
+    headers={"Authorization":f"Bearer {token}"}
+    newest_first=titles[::-1]
+
+    response=client.get("/api/v1/books/export",headers=headers)
+    assert response.status_code==200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines=[json.loads(line) for line in response.text.splitlines()]
+    assert [list(line) for line in lines]==[EXPORT_FIELDS]*len(titles)
+    assert [line["title"] for line in lines]==newest_first
+    assert lines[0]["summary"]=='says "hi"\non two lines'
+    assert batches==[3,3,1]
+
+    response=client.get("/api/v1/books/export",params={"format":"csv"},headers=headers)
+    assert response.status_code==200
+    assert response.headers["content-disposition"]=="attachment; filename=books.csv"
+    rows=list(csv.reader(io.StringIO(response.text)))
+    assert rows[0]==EXPORT_FIELDS
+    records=[dict(zip(rows[0],row)) for row in rows[1:]]
+    assert [record["title"] for record in records]==newest_first
+    assert records[0]["author"]=="a, b"
+    assert records[0]["summary"]=='says "hi"\non two lines'
+    assert batches==[3,3,1]*2
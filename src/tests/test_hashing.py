@@ -0,0 +1,31 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.auth.utils import HashingPool,hash_password,check_password
+from src.errors import HashingOverloaded
+
+
+def test_hash_and_check_run_off_the_event_loop():
+    async def scenario():
+        hashed=await hash_password("orankh")
+        return await check_password("orankh",hashed),await check_password("wrong",hashed)
+
+    assert asyncio.run(scenario())==(True,False)
+
+
+def test_hashing_pool_rejects_when_queue_is_full():
+    pool=HashingPool(workers=1,queue_limit=1)
+    release=threading.Event()
+
+    async def scenario():
+        running=[asyncio.ensure_future(pool.run("hash",release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(HashingOverloaded):
+            await pool.run("hash",release.wait)
+        release.set()
+        await asyncio.gather(*running)
+        assert pool.pending==0
+
+    asyncio.run(scenario())
@@ -0,0 +1,18 @@
+from benchmarks.import_time import DEFERRED,import_times
+from src.auth.utils import create_email_token,decode_email_token
+from src.outbox import MailOutbox
+
+
+def test_import_src_leaves_the_heavy_integrations_unloaded():
+    # in a fresh interpreter, this one has imported half the repo by now
+    imported={name for name,_,_ in import_times("src")}
+    assert sorted(imported.intersection(DEFERRED))==[]
+
+
+def test_deferred_pieces_are_built_on_first_use():
+    outbox=MailOutbox()
+    assert outbox._mailer is None
+    assert outbox.mailer is outbox.mailer
+
+    token=create_email_token({"email":"reader@example.com"})
+    assert decode_email_token(token)=={"email":"reader@example.com"}
@@ -0,0 +1,90 @@
+import socket
+
+import pytest
+from aiosmtpd import controller
+from redmail import EmailSender
+
+from src.mail import BatchMailer
+
+
+class RecordingHandler:
+    '''Keeps every delivered message with the id of the SMTP session it came on.'''
+    def __init__(self):
+        self.delivered=[]
+
+    async def handle_RCPT(self,server,session,envelope,address,rcpt_options):
+        if address.startswith("bounce@"):
+            return "550 no such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self,server,session,envelope):
+        self.delivered.append((id(session),envelope.rcpt_tos[0]))
+        return "250 Message accepted"
+
+
+@pytest.fixture
+def smtp_server():
+    handler=RecordingHandler()
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1",0))
+        port=probe.getsockname()[1]
+    server=controller.Controller(handler,hostname="127.0.0.1",port=port)
+    server.start()
+    yield handler,EmailSender(host="127.0.0.1",port=port,use_starttls=False)
+    server.stop()
+
+
+def message(receiver):
+    return {"subject":"hi","sender":"bookly@example.com","receivers":[receiver],"text":"hello"}
+
+
+def test_messages_share_a_session_up_to_the_limit(smtp_server):
+    handler,sender=smtp_server
+    mailer=BatchMailer(sender,max_per_connection=2,rate=0,idle_timeout=60)
+
+    results=mailer.send_many([message(f"user{i}@example.com") for i in range(5)])
+    mailer.close()
+
+    assert [r["status"] for r in results]==["sent"]*5
+    assert [to for _,to in handler.delivered]==[f"user{i}@example.com" for i in range(5)]
+    sessions=[session for session,_ in handler.delivered]
+    assert len(set(sessions))==3
+    assert sessions[0]==sessions[1] and sessions[2]==sessions[3]
+    # the sender handed in is never connected by the mailer
+    assert not sender.is_alive
+
+
+def test_refused_message_keeps_the_session_and_dropped_session_reconnects(smtp_server):
+    handler,sender=smtp_server
+    mailer=BatchMailer(sender,max_per_connection=100,rate=0,idle_timeout=60)
+
+    results=mailer.send_many([message("a@example.com"),message("bounce@example.com"),message("b@example.com")])
+    assert [r["status"] for r in results]==["sent","error","sent"]
+    assert handler.delivered[0][0]==handler.delivered[1][0]
+
+    # the server going away between tasks costs a reconnect, not the message
+    mailer.sender.connection.sock.close()
+    assert mailer.send(message("c@example.com"))["status"]=="sent"
+    mailer.close()
+    assert [to for _,to in handler.delivered]==["a@example.com","b@example.com","c@example.com"]
+
+
+def test_batch_task_sends_queued_batches_over_the_worker_session(smtp_server,monkeypatch):
+    from src import celerly
+
+    handler,sender=smtp_server
+    mailer=BatchMailer(sender,max_per_connection=100,rate=0,idle_timeout=60)
+    monkeypatch.setattr(celerly,"mailer",mailer)
+    monkeypatch.setattr(celerly.Config,"MAIL_BATCH_SIZE",2)
+    # tasks run in this process instead of going through a broker
+    monkeypatch.setattr(celerly.celery_app.conf,"task_always_eager",True)
+
+    tasks=celerly.queue_email_batch([message(f"user{i}@example.com") for i in range(4)]+[message("bounce@example.com")])
+    results=[task.get() for task in tasks]
+    celerly.close_mailer()
+
+    assert [[r["status"] for r in batch] for batch in results]==[["sent","sent"],["sent","sent"],["error"]]
+    assert [to for _,to in handler.delivered]==[f"user{i}@example.com" for i in range(4)]
+    # every batch went over the one session the worker keeps
+    assert len({session for session,_ in handler.delivered})==1
@@ -0,0 +1,16 @@
+from fastapi.testclient import TestClient
+
+from src import app
+
+
+def test_metrics_endpoint_reports_route_templates():
+    client=TestClient(app=app,base_url="http://localhost")
+    client.get("/api/v1/books/not-a-uuid")
+
+    response=client.get("/metrics")
+
+    assert response.status_code==200
+    assert response.headers["Server-Timing"].startswith("auth;dur=")
+    body=response.text
+    assert 'bookly_http_request_duration_seconds_count{method="GET",route="/api/v1/books/{book_uid}",status="401"}' in body
+    assert "bookly_http_requests_in_progress" in body
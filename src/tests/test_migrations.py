@@ -0,0 +1,104 @@
+import asyncio
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config as AlembicConfig
+from alembic.migration import MigrationContext
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.auth.user_service import UserService
+from src.books.service import BookService
+from src.db.models import Book,BookTag,Review,Tag,User
+from src.reviews.review_service import ReviewService
+from src.tags.service import TagService
+
+ALEMBIC_INI=Path(__file__).resolve().parents[2]/"alembic.ini"
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    '''A sqlite database migrated to head by the real alembic revisions.'''
+    url=f"sqlite+aiosqlite:///{tmp_path/'bookly.db'}"
+    config=AlembicConfig(str(ALEMBIC_INI))
+    config.attributes["configure_logger"]=False
+    config.set_main_option("sqlalchemy.url",url)
+    command.upgrade(config,"head")
+    return url
+
+
+def test_migrated_schema_matches_the_models(database_url):
+    async def scenario():
+        engine=create_async_engine(database_url)
+        async with engine.connect() as conn:
+            diff=await conn.run_sync(lambda sync_conn:compare_metadata(MigrationContext.configure(sync_conn),SQLModel.metadata))
+        await engine.dispose()
+        return diff
+
+    # the search index is postgres only and sqlite can not reflect it
+    with pytest.warns(UserWarning,match="ix_books_search"):
+        assert asyncio.run(scenario())==[]
+
+
+def test_hot_queries_use_the_indexes(database_url):
+    '''Runs the service queries and checks EXPLAIN QUERY PLAN of every statement they sent.'''
+    user_uid,book_uid,tag_uid=uuid.uuid4(),uuid.uuid4(),uuid.uuid4()
+    now=datetime.now()
+
+    async def scenario():
+        engine=create_async_engine(database_url)
+        statements=[]
+
+        def record(conn,cursor,statement,parameters,context,executemany):
+            statements.append((statement,parameters))
+
+        async with AsyncSession(engine,expire_on_commit=False) as session:
+            session.add(User(uid=user_uid,username="reader",email="reader@example.com",password_hash="x",role="user"))
+            # owns and reviewed nothing, so deleting them has no cache to invalidate in redis
+            session.add(User(username="leaver",email="leaver@example.com",password_hash="x",role="user"))
+            session.add(Book(
+                id=book_uid,title="t",author="a",year=2000,isbn="i",pages=1,price=1.0,
+                available=True,summary="s",user_uid=user_uid,created_at=now,updated_at=now,
+            ))
+            session.add(Tag(uid=tag_uid,name="fiction",created_at=now,updated_at=now))
+            await session.flush()
+            session.add(BookTag(book_id=book_uid,tag_id=tag_uid))
+            session.add(Review(rating=3,review_txt="r",user_uid=user_uid,book_uid=book_uid,created_at=now,updated_at=now))
+            await session.commit()
+
+        hot_queries={
+            "ix_books_created_at_id":lambda session:BookService().get_all_books(session),
+            "ix_books_rating_avg_id":lambda session:BookService().get_all_books(session,sort="top_rated"),
+            "ix_books_user_uid":lambda session:BookService().get_user_book_submission(user_uid,session),
+            "ix_reviews_book_uid_created_at_uid":lambda session:ReviewService().get_book_reviews(book_uid,session),
+            "ix_reviews_created_at_uid":lambda session:ReviewService().retrive_all_reviews(session),
+            "ix_tags_name":lambda session:TagService().get_tag_by_name("fiction",session),
+            # loading the tag loads its books through booktag.tag_id
+            "ix_booktag_tag_id":lambda session:TagService().get_tag_by_uid(tag_uid,session),
+            "ix_reviews_user_uid":lambda session:UserService().delete_user("leaver@example.com",session),
+        }
+        plans={}
+        event.listen(engine.sync_engine,"before_cursor_execute",record)
+        for index,query in hot_queries.items():
+            statements.clear()
+            async with AsyncSession(engine,expire_on_commit=False) as session:
+                await query(session)
+            sent=[(statement,parameters) for statement,parameters in statements if not statement.startswith("INSERT")]
+            assert sent,index
+            async with engine.connect() as conn:
+                plans[index]=[
+                    row[-1]
+                    for statement,parameters in sent
+                    for row in await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}",parameters)
+                ]
+        await engine.dispose()
+        return plans
+
+    for index,plan in asyncio.run(scenario()).items():
+        assert any(f"USING INDEX {index}" in step or f"USING COVERING INDEX {index}" in step for step in plan),(index,plan)
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+
+import fakeredis
+import orjson
+import pytest
+
+from src import outbox as outbox_module
+from src.config import Config
+from src.db.redis_client import RedisManager
+from src.outbox import MailOutbox, OUTBOX_DEAD_KEY, OUTBOX_KEY
+
+
+class FakeMailer:
+    '''Records what it was asked to send and refuses receivers in fail.'''
+    def __init__(self,fail=()):
+        self.fail=set(fail)
+        self.sent=[]
+
+    def send_many(self,messages,stop=None):
+        results=[]
+        for message in messages:
+            if stop is not None and stop():
+                results.append({"status":"unsent"})
+            elif message["receivers"][0] in self.fail:
+                results.append({"status":"error","error":"refused"})
+            else:
+                self.sent.append(message["receivers"][0])
+                results.append({"status":"sent","result":""})
+        return results
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake=fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(outbox_module,"redis_manager",RedisManager(client=fake))
+    return fake
+
+
+def test_failed_mail_is_retried_with_backoff_then_dead_lettered(fake_redis,monkeypatch):
+    monkeypatch.setattr(Config,"MAIL_MAX_ATTEMPTS",2)
+    mailer=FakeMailer(fail={"bad@example.com"})
+    outbox=MailOutbox(mailer)
+
+    async def scenario():
+        await outbox.enqueue(subject="hi",receivers=["good@example.com"],text="x")
+        await outbox.enqueue(subject="hi",receivers=["bad@example.com"],text="x")
+        assert await outbox.drain_once()==2
+        assert mailer.sent==["good@example.com"]
+
+        # only the failed one is left, due MAIL_RETRY_SECONDS from now
+        [(member,due)]=await fake_redis.zrange(OUTBOX_KEY,0,-1,withscores=True)
+        assert orjson.loads(member)["attempts"]==1
+        assert await outbox.drain_once()==0
+
+        await fake_redis.zadd(OUTBOX_KEY,{member:0})
+        assert await outbox.drain_once()==1
+        assert await fake_redis.zcard(OUTBOX_KEY)==0
+        [dead]=await fake_redis.lrange(OUTBOX_DEAD_KEY,0,-1)
+        assert orjson.loads(dead)["message"]["receivers"]==["bad@example.com"]
+
+    asyncio.run(scenario())
+
+
+def test_drainers_never_send_the_same_message_twice(fake_redis):
+    mailers=[FakeMailer(),FakeMailer()]
+    drainers=[MailOutbox(mailer) for mailer in mailers]
+
+    async def scenario():
+        for i in range(30):
+            await drainers[0].enqueue(subject="hi",receivers=[f"user{i}@example.com"],text="x")
+        while sum(await asyncio.gather(*(drainer.drain_once() for drainer in drainers))):
+            pass
+        sent=mailers[0].sent+mailers[1].sent
+        assert sorted(sent)==sorted(f"user{i}@example.com" for i in range(30))
+
+        # a drainer that died holding its claims: the messages stay queued but
+        # out of the due window, so the other one is not stuck on them
+        for i in range(30):
+            await drainers[0].enqueue(subject="hi",receivers=[f"late{i}@example.com"],text="x")
+        assert len(await drainers[0].claim(20))==20
+        assert await drainers[1].drain_once()==10
+        assert await fake_redis.zcard(OUTBOX_KEY)==20
+        assert await drainers[1].drain_once()==0
+
+    asyncio.run(scenario())
+
+
+def test_drainer_task_sends_right_after_enqueue(fake_redis,monkeypatch):
+    monkeypatch.setattr(Config,"MAIL_OUTBOX_POLL_SECONDS",30)
+    mailer=FakeMailer()
+    outbox=MailOutbox(mailer)
+
+    async def scenario():
+        outbox.start()
+        await asyncio.sleep(0.05)
+        await outbox.enqueue(subject="hi",receivers=["a@example.com"],text="x")
+        for _ in range(100):
+            if mailer.sent:
+                break
+            await asyncio.sleep(0.01)
+        await outbox.stop()
+        assert mailer.sent==["a@example.com"]
+        assert await fake_redis.zcard(OUTBOX_KEY)==0
+
+    asyncio.run(scenario())
+
+
+class SlowMailer(FakeMailer):
+    '''Takes a while per message, like a rate limited SMTP session.'''
+    def __init__(self):
+        super().__init__()
+        self.started=threading.Event()
+
+    def send_many(self,messages,stop=None):
+        def slow_stop():
+            self.started.set()
+            time.sleep(0.02)
+            return stop()
+        return super().send_many(messages,slow_stop)
+
+
+def test_stopping_mid_batch_puts_the_unsent_rest_back_for_another_drainer(fake_redis):
+    mailer=SlowMailer()
+    stopping=MailOutbox(mailer)
+    other_mailer=FakeMailer()
+    other=MailOutbox(other_mailer)
+
+    async def scenario():
+        for i in range(20):
+            await stopping.enqueue(subject="hi",receivers=[f"user{i}@example.com"],text="x")
+        stopping.start()
+        await asyncio.to_thread(mailer.started.wait)
+        await asyncio.sleep(0.05)
+        await stopping.stop()
+        assert 0<len(mailer.sent)<20
+
+        # the rest is due now and its claims are gone
+        assert await fake_redis.zcard(OUTBOX_KEY)==20-len(mailer.sent)
+        assert await other.drain_once()==20-len(mailer.sent)
+        assert sorted(mailer.sent+other_mailer.sent)==sorted(f"user{i}@example.com" for i in range(20))
+        assert await fake_redis.zcard(OUTBOX_KEY)==0
+
+    asyncio.run(scenario())
+
+
+def test_bad_entries_are_dead_lettered_and_a_crash_does_not_end_the_drainer(fake_redis,monkeypatch):
+    monkeypatch.setattr(Config,"MAIL_OUTBOX_POLL_SECONDS",30)
+    # the crashed batch is sent again once its claim expired
+    monkeypatch.setattr(Config,"MAIL_CLAIM_SECONDS",1)
+    mailer=CrashingMailer()
+    outbox=MailOutbox(mailer)
+
+    async def scenario():
+        await fake_redis.zadd(OUTBOX_KEY,{b"not json":0,b'{"id":"x"}':0})
+        await outbox.enqueue(subject="hi",receivers=["a@example.com"],text="x")
+        outbox.start()
+        for _ in range(500):
+            if mailer.sent:
+                break
+            await asyncio.sleep(0.01)
+        await outbox.stop()
+        assert mailer.crashed==1
+        assert mailer.sent==["a@example.com"]
+        assert await fake_redis.zcard(OUTBOX_KEY)==0
+        assert sorted(await fake_redis.lrange(OUTBOX_DEAD_KEY,0,-1))==[b"not json",b'{"id":"x"}']
+
+    asyncio.run(scenario())
+
+
+class CrashingMailer(FakeMailer):
+    '''Raises on its first batch, like a bug in the mail path would.'''
+    def __init__(self):
+        super().__init__()
+        self.crashed=0
+
+    def send_many(self,messages,stop=None):
+        if not self.crashed:
+            self.crashed+=1
+            raise RuntimeError("boom")
+        return super().send_many(messages,stop)
+
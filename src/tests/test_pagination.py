@@ -0,0 +1,45 @@
+import base64
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from src.db.pagination import encode_cursor,decode_cursor,split_page
+from src.errors import InvalidCursor
+
+
+def test_cursor_round_trip():
+    created_at=datetime(2024,5,17,10,30,12,345)
+    book_id=uuid.uuid4()
+    cursor=encode_cursor(created_at,book_id)
+    assert decode_cursor(cursor)==(created_at,book_id)
+
+
+@pytest.mark.parametrize("payload",[
+    '["2024-01-01T00:00:00",5]',
+    '{"a":"2024-01-01T00:00:00","b":"x"}',
+    '["2024-01-01T00:00:00"]',
+    '[5,"6f1c7c8e-2d6f-4a57-9a8e-3a8d3b6f9c11"]',
+])
+def test_crafted_cursor_is_rejected(payload):
+    cursor=base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_tampered_cursor_is_rejected():
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
+
+
+def test_split_page_returns_cursor_only_when_more_rows_exist():
+    rows=[SimpleNamespace(created_at=datetime(2024,1,day),id=uuid.uuid4()) for day in range(5,0,-1)]
+
+    page,next_cursor=split_page(rows,limit=3,sort_attr="created_at",id_attr="id")
+    assert page==rows[:3]
+    assert decode_cursor(next_cursor)==(rows[2].created_at,rows[2].id)
+
+    page,next_cursor=split_page(rows[3:],limit=3,sort_attr="created_at",id_attr="id")
+    assert page==rows[3:]
+    assert next_cursor is None
@@ -0,0 +1,78 @@
+import asyncio
+
+import httpx
+import pytest
+from prometheus_client.parser import text_string_to_metric_families
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src import app
+from src.db import main as db_main
+
+
+def _samples(body:str,engine:str)->dict:
+    return {
+        (sample.name,sample.labels.get("le")):sample.value
+        for family in text_string_to_metric_families(body)
+        for sample in family.samples
+        if sample.labels.get("engine")==engine
+    }
+
+
+def test_checkouts_past_pool_size_show_up_on_metrics(sqlite_url,monkeypatch):
+    monkeypatch.setattr(db_main.Config,"DB_POOL_SIZE",2)
+    monkeypatch.setattr(db_main.Config,"DB_MAX_OVERFLOW",1)
+    monkeypatch.setattr(db_main.Config,"DB_POOL_TIMEOUT",0.2)
+    engine=create_async_engine(sqlite_url,**db_main.pool_options("pool-test"))
+    # reported next to the app's own engines by the collector /metrics uses
+    monkeypatch.setitem(db_main.pool_stats.engines,"pool-test",engine)
+
+    async def scrape(client):
+        response=await client.get("/metrics")
+        assert response.status_code==200
+        return _samples(response.text,"pool-test")
+
+    async def scenario():
+        transport=httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport,base_url="http://localhost") as client:
+            # pool_size connections plus the one overflow connection
+            held=[await engine.connect() for _ in range(3)]
+            busy=await scrape(client)
+
+            async def give_one_back():
+                await asyncio.sleep(0.1)
+                await held.pop().close()
+
+            releasing=asyncio.create_task(give_one_back())
+            # waits for the connection give_one_back returns
+            held.append(await engine.connect())
+            await releasing
+            # nothing comes back this time
+            with pytest.raises(PoolTimeoutError):
+                await engine.connect()
+            waited=await scrape(client)
+
+            for connection in held:
+                await connection.close()
+            idle=await scrape(client)
+        return busy,waited,idle
+
+    async def run():
+        try:
+            return await scenario()
+        finally:
+            await engine.dispose()
+
+    busy,waited,idle=asyncio.run(run())
+
+    assert busy[("bookly_db_pool_size",None)]==2
+    assert busy[("bookly_db_pool_checked_out",None)]==3
+    assert busy[("bookly_db_pool_overflow",None)]==1
+    # three quick checkouts, one that waited for a release, one that timed out
+    assert waited[("bookly_db_pool_wait_seconds_count",None)]==5
+    assert waited[("bookly_db_pool_wait_seconds_sum",None)]>=0.3
+    assert waited[("bookly_db_pool_timeouts_total",None)]==1
+    assert idle[("bookly_db_pool_checked_out",None)]==0
+    # the overflow connection is closed on its return, the pool keeps pool_size
+    assert idle[("bookly_db_pool_checked_in",None)]==2
+    assert idle[("bookly_db_pool_overflow",None)]==0
@@ -0,0 +1,65 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import app
+from src.auth import dependencies
+from src.auth.utils import access_token
+from src.books import routes as book_routes
+from src.db.projection import parse_fields
+from src.errors import InvalidFields
+
+
+def test_parse_fields_keeps_allowed_order():
+    assert parse_fields("author, title,",("id","title","author","year"))==["title","author"]
+    assert parse_fields(None,("id","title"))==["id","title"]
+    with pytest.raises(InvalidFields):
+        parse_fields("title,password_hash",("id","title"))
+
+
+def test_book_listing_returns_only_requested_fields(monkeypatch):
+    seen={}
+
+    async def check_black_list(jti):
+        return False
+
+    async def get_user_by_email(email,session):
+        return SimpleNamespace(email=email,role="user",is_verified=True)
+
+    async def get_all_books(session,limit,cursor,sort,fields,include_tags):
+        seen.update(fields=fields,include_tags=include_tags)
+        return [{"id":uuid.uuid4(),"title":"Dune"}],None
+
+    monkeypatch.setattr(dependencies,"check_black_list",check_black_list)
+    monkeypatch.setattr(dependencies.user_service,"get_user_by_email",get_user_by_email)
+    monkeypatch.setattr(book_routes.book_service,"get_all_books",get_all_books)
+
+    token=access_token(user_data={"email":"khan@gmail.com","u_id":"1","role":"user"})
+    client=TestClient(app=app,base_url="http://localhost")
+    response=client.get("/api/v1/books/?fields=title",headers={"Authorization":f"Bearer {token}"})
+
+    assert response.status_code==200
+    assert seen=={"fields":["title"],"include_tags":False}
+    [book]=response.json()["books"]
+    assert set(book)=={"id","title"}
+
+    response=client.get("/api/v1/books/?fields=secret",headers={"Authorization":f"Bearer {token}"})
+    assert response.status_code==400
+
+
+def test_fast_serializer_matches_response_model():
+    import json
+    from datetime import datetime
+    from src.books.schemas import BookPage
+    from src.serializers import book_page_serializer
+
+    tag={"uid":uuid.uuid4(),"name":"sci-fi","created_at":datetime(2024,1,1)}
+    content={
+        "books":[{"id":uuid.uuid4(),"title":"Dune","password_hash":"x","tags":[tag]}],
+        "next_cursor":None,
+    }
+    body=json.loads(book_page_serializer.dump(content))
+    assert body==json.loads(BookPage.model_validate(content).model_dump_json(exclude_unset=True))
+    assert "password_hash" not in body["books"][0]
@@ -0,0 +1,91 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.auth.user_service import UserService
+from src.books.service import BookService
+from src.db.models import Book,User
+from src.reviews.review_service import ReviewService
+from src.reviews.schema import ReviewCreateSchema,ReviewUpdateSchema
+
+
+def test_review_writes_and_deleting_a_reviewer_keep_the_rating_aggregates(sqlite_url,book_cache):
+    engine=create_async_engine(sqlite_url)
+
+    async def scenario():
+        def session():
+            return AsyncSession(engine,expire_on_commit=False)
+
+        async with session() as s:
+            owner,bob,carol=(
+                User(username=name,email=f"{name}@example.com",password_hash="x",role="user")
+                for name in ("owner","bob","carol")
+            )
+            s.add_all([owner,bob,carol])
+            await s.flush()
+            atlas,orchard,algebra=(
+                Book(
+                    title=title,author="a",year=2000,isbn="i",pages=1,price=1.0,
+                    available=True,summary="s",user_uid=owner.uid,
+                )
+                for title in ("atlas","orchard","algebra")
+            )
+            s.add_all([atlas,orchard,algebra])
+            await s.commit()
+
+        reviews=ReviewService()
+
+        async def review(email,book,rating):
+            async with session() as s:
+                created=await reviews.create_review(email,book.id,ReviewCreateSchema(rating=rating,review_text="r"),s)
+                return created.uid
+
+        async def aggregates():
+            async with session() as s:
+                result=await s.exec(select(Book.title,Book.rating_sum,Book.rating_count,Book.rating_avg))
+                return {title:(rating_sum,count,avg) for title,rating_sum,count,avg in result.all()}
+
+        async def top_rated_titles():
+            titles,cursor=[],None
+            async with session() as s:
+                while True:
+                    page,cursor=await BookService().get_all_books(s,limit=1,cursor=cursor,sort="top_rated",fields=["title"])
+                    titles+=[book["title"] for book in page]
+                    if cursor is None:
+                        return titles
+
+        await review("bob@example.com",atlas,4)
+        carol_on_atlas=await review("carol@example.com",atlas,2)
+        bob_on_orchard=await review("bob@example.com",orchard,3)
+        await review("carol@example.com",algebra,1)
+        assert await aggregates()=={"atlas":(6,2,3.0),"orchard":(3,1,3.0),"algebra":(1,1,1.0)}
+
+        async with session() as s:
+            await reviews.update_review(carol_on_atlas,ReviewUpdateSchema(rating=3,review_text="r"),s)
+        # only the text changes, without a rating or with a null one
+        for update in (ReviewUpdateSchema(review_text="text only"),ReviewUpdateSchema(rating=None,review_text="null rating")):
+            async with session() as s:
+                updated=await reviews.update_review(carol_on_atlas,update,s)
+            assert (updated.rating,updated.review_txt)==(3,update.review_txt)
+        async with session() as s:
+            assert await reviews.delete_review(bob_on_orchard,s)
+        assert await aggregates()=={"atlas":(7,2,3.5),"orchard":(0,0,0.0),"algebra":(1,1,1.0)}
+
+        await review("bob@example.com",orchard,2)
+        assert await top_rated_titles()==["atlas","orchard","algebra"]
+
+        # bob's 4 on atlas and 2 on orchard come out in one grouped UPDATE
+        async with session() as s:
+            assert await UserService().delete_user("bob@example.com",s)
+        assert await aggregates()=={"atlas":(3,1,3.0),"orchard":(0,0,0.0),"algebra":(1,1,1.0)}
+        assert await top_rated_titles()==["atlas","algebra","orchard"]
+
+    async def run():
+        try:
+            await scenario()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,60 @@
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.db import main as db_main
+from src.db.main import ReplicaHealth,get_read_session
+
+
+async def marked_sessions(path,name):
+    '''A session factory over a sqlite file that answers "which database" with name.'''
+    engine=create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("CREATE TABLE IF NOT EXISTS marker (name TEXT)")
+        await conn.execute(text("INSERT INTO marker VALUES (:name)"),{"name":name})
+    return engine,sessionmaker(bind=engine,class_=AsyncSession,expire_on_commit=False)
+
+
+async def served_by(primary_sessions,x_consistency=None):
+    async with primary_sessions() as primary:
+        sessions=get_read_session(x_consistency,primary)
+        session=await sessions.__anext__()
+        result=await session.exec(text("SELECT name FROM marker"))
+        name=result.scalar_one()
+        await sessions.aclose()
+    return name
+
+
+def test_reads_use_the_replica_and_fall_back_to_the_primary(tmp_path,monkeypatch):
+    health=ReplicaHealth(retry_seconds=30)
+    monkeypatch.setattr(db_main,"replica_health",health)
+
+    async def scenario():
+        primary,primary_sessions=await marked_sessions(tmp_path/"primary.db","primary")
+        replica,replica_sessions=await marked_sessions(tmp_path/"replica.db","replica")
+        monkeypatch.setattr(db_main,"read_session",replica_sessions)
+
+        assert await served_by(primary_sessions)=="replica"
+        # a client that needs its own write
+        assert await served_by(primary_sessions,"strong")=="primary"
+
+        # the replica goes away: reads move to the primary and stay there
+        # without trying the replica again until the retry time has passed
+        broken=create_async_engine(f"sqlite+aiosqlite:///{tmp_path/'missing'/'replica.db'}")
+        monkeypatch.setattr(db_main,"read_session",sessionmaker(bind=broken,class_=AsyncSession))
+        assert await served_by(primary_sessions)=="primary"
+        assert not health.up
+        monkeypatch.setattr(db_main,"read_session",replica_sessions)
+        assert await served_by(primary_sessions)=="primary"
+
+        health.down_since-=30
+        assert await served_by(primary_sessions)=="replica"
+        assert health.up
+
+        for engine in (primary,replica,broken):
+            await engine.dispose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,134 @@
+import asyncio
+import uuid
+from datetime import datetime,timedelta
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src import app
+from src.auth import dependencies
+from src.auth.utils import access_token
+from src.db.main import get_read_session
+from src.db.models import Book,Review
+from src.reviews.review_service import ReviewService
+
+
+def _add_reviews(engine):
+    '''
+    Two books whose reviews interleave in time. Four reviews of the first book
+    share one created_at, so any page size below five cuts through them.
+    Returns both books' ids and every review uid, newest first.
+    '''
+    start=datetime(2024,1,1)
+    tie=start+timedelta(hours=5)
+    first=[tie]*4+[start+timedelta(hours=h) for h in (9,3,1)]
+    second=[start+timedelta(hours=h) for h in (8,5,2)]
+
+    async def add():
+        async with AsyncSession(engine,expire_on_commit=False) as session:
+            books=[
+                Book(title=title,author="a",year=2000,isbn="i",pages=1,price=1.0,available=True,summary="s")
+                for title in ("first","second")
+            ]
+            session.add_all(books)
+            await session.flush()
+            reviews=[
+                Review(uid=uuid.uuid4(),rating=3,review_txt="r",book_uid=book.id,created_at=created_at,updated_at=created_at)
+                for book,times in zip(books,(first,second))
+                for created_at in times
+            ]
+            session.add_all(reviews)
+            await session.commit()
+        newest_first=sorted(reviews,key=lambda review:(review.created_at,review.uid),reverse=True)
+        return books[0].id,books[1].id,[(review.book_uid,review.uid) for review in newest_first]
+
+    return asyncio.run(add())
+
+
+def test_review_pages_follow_the_cursor_without_repeating_or_dropping_ties(sqlite_url):
+    engine=create_async_engine(sqlite_url)
+    first_id,second_id,newest_first=_add_reviews(engine)
+    service=ReviewService()
+
+    async def walk(list_page,limit):
+        pages,cursor=[],None
+        async with AsyncSession(engine) as session:
+            while True:
+                reviews,cursor=await list_page(session,limit,cursor)
+                pages.append([(review["book_uid"],review["uid"]) for review in reviews])
+                if cursor is None:
+                    return pages
+
+    async def scenario():
+        for limit in (1,2,3,4):
+            pages=await walk(lambda session,limit,cursor:service.get_book_reviews(first_id,session,limit,cursor),limit)
+            # only the first book's reviews, each once and in order
+            assert sum(pages,[])==[review for review in newest_first if review[0]==first_id]
+            assert all(len(page)==limit for page in pages[:-1])
+        pages=await walk(lambda session,limit,cursor:service.get_book_reviews(second_id,session,limit,cursor),2)
+        assert sum(pages,[])==[review for review in newest_first if review[0]==second_id]
+
+        pages=await walk(lambda session,limit,cursor:service.retrive_all_reviews(session,limit,cursor),3)
+        assert [len(page) for page in pages]==[3,3,3,1]
+        assert sum(pages,[])==newest_first
+
+        async with AsyncSession(engine) as session:
+            reviews,cursor=await service.get_book_reviews(uuid.uuid4(),session)
+        assert (reviews,cursor)==([],None)
+
+    async def run():
+        try:
+            await scenario()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_review_listing_routes_page_with_limit_and_cursor(sqlite_url,monkeypatch):
+    # connections are not pooled, the test client serves the app on its own event loop
+    engine=create_async_engine(sqlite_url,poolclass=NullPool)
+    first_id,_,newest_first=_add_reviews(engine)
+
+    async def sqlite_session():
+        async with AsyncSession(engine) as session:
+            yield session
+
+    async def check_black_list(jti):
+        return False
+
+    async def get_user_by_email(email,session):
+        return SimpleNamespace(email=email,role="user",is_verified=True)
+
+    monkeypatch.setitem(app.dependency_overrides,get_read_session,sqlite_session)
+    monkeypatch.setattr(dependencies,"check_black_list",check_black_list)
+    monkeypatch.setattr(dependencies.user_service,"get_user_by_email",get_user_by_email)
+
+    token=access_token(user_data={"email":"khan@gmail.com","u_id":"1","role":"user"})
+    client=TestClient(app=app,base_url="http://localhost")
+    headers={"Authorization":f"Bearer {token}"}
+
+    def walk(url,limit):
+        pages,params=[],{"limit":limit}
+        while True:
+            response=client.get(url,params=params,headers=headers)
+            assert response.status_code==200
+            body=response.json()
+            pages.append([(uuid.UUID(review["book_uid"]),uuid.UUID(review["uid"])) for review in body["reviews"]])
+            if body["next_cursor"] is None:
+                return pages
+            params={"limit":limit,"cursor":body["next_cursor"]}
+
+    pages=walk(f"/api/v1/books/{first_id}/reviews",3)
+    assert [len(page) for page in pages]==[3,3,1]
+    assert sum(pages,[])==[review for review in newest_first if review[0]==first_id]
+
+    pages=walk("/api/v1/review/get_all_reviews",4)
+    assert [len(page) for page in pages]==[4,4,2]
+    assert sum(pages,[])==newest_first
+
+    response=client.get("/api/v1/review/get_all_reviews",params={"cursor":"not-a-cursor"})
+    assert response.status_code==400
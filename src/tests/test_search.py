@@ -0,0 +1,102 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.books import search
+from src.books.search import InMemorySearchBackend,InvertedIndex
+from src.db.models import Book
+
+
+def test_inverted_index_ranks_and_requires_every_term():
+    index=InvertedIndex()
+    orchard,atlas,algebra=uuid.uuid4(),uuid.uuid4(),uuid.uuid4()
+    index.add(orchard,"The Silent Orchard Lena Hart A quiet mystery about family secrets")
+    index.add(atlas,"Starlit Atlas Nora Bell Essays about travel and celestial navigation, travel notes")
+    index.add(algebra,"Practical Algebra S. Thompson A textbook with applied examples")
+
+    assert index.search("travel")==[atlas]
+    assert set(index.search("about"))=={atlas,orchard}
+    assert index.search("family mystery")==[orchard]
+    assert index.search("family navigation")==[]
+    assert index.search("unknownword")==[]
+
+
+def test_inverted_index_reindex_and_remove():
+    index=InvertedIndex()
+    book_id=uuid.uuid4()
+    index.add(book_id,"Neon Afterglow")
+    index.add(book_id,"Gardens of Glass")
+    assert index.search("neon")==[]
+    assert index.search("glass")==[book_id]
+
+    index.remove(book_id)
+    assert index.search("glass")==[]
+    assert index.postings=={}
+
+
+def test_a_page_of_a_common_term_ranks_only_the_page(monkeypatch):
+    index=InvertedIndex()
+    books=[uuid.uuid4() for _ in range(3000)]
+    for position,book_id in enumerate(books):
+        index.add(book_id,"river "*(1+position%7)+"storm"*(position%2))
+    full=index.search("river")
+    assert len(full)==len(books)
+    both=index.search("storm river")
+
+    sorted_sizes=[]
+
+    def counting_sorted(iterable,**kwargs):
+        values=list(iterable)
+        sorted_sizes.append(len(values))
+        return sorted(values,**kwargs)
+
+    monkeypatch.setattr(search,"sorted",counting_sorted,raising=False)
+    assert index.search("river",top=21)==full[:21]
+    assert index.search("river storm",top=5)==both[:5]
+    # only the postings of the query terms were sorted, never the matches
+    assert max(sorted_sizes)<=2
+
+
+def test_writes_during_the_initial_load_win_over_the_loaded_rows(tmp_path):
+    stale,deleted=uuid.uuid4(),uuid.uuid4()
+
+    async def scenario():
+        engine=create_async_engine(f"sqlite+aiosqlite:///{tmp_path/'books.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        now=datetime.now()
+        async with AsyncSession(engine) as session:
+            for book_id,title in ((stale,"Old Title"),(deleted,"Gone Book")):
+                session.add(Book(
+                    id=book_id,title=title,author="a",year=2000,isbn="i",pages=1,price=1.0,
+                    available=True,summary="s",created_at=now,updated_at=now,
+                ))
+            await session.commit()
+
+        backend=InMemorySearchBackend()
+        loading=asyncio.Event()
+        original_add=backend.index.add
+
+        def add(book_id,text):
+            original_add(book_id,text)
+            if not loading.is_set():
+                # the book service writes while the load is still running
+                loading.set()
+                backend.index_book(stale,"New Title","a","s")
+                backend.remove_book(deleted)
+
+        backend.index.add=add
+        async with AsyncSession(engine) as session:
+            await backend.load(session)
+        await engine.dispose()
+        return backend
+
+    backend=asyncio.run(scenario())
+    assert backend.loaded and backend.changed is None
+    assert backend.index.search("new")==[stale]
+    assert backend.index.search("old")==[]
+    assert backend.index.search("gone")==[]
@@ -0,0 +1,67 @@
+import asyncio
+
+from sqlalchemy import event,func
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.db.models import Book,BookTag,Tag
+from src.tags.schemas import TagAddSchema
+from src.tags.service import TagService
+
+
+def _tags(*names):
+    return TagAddSchema(tags=[{"name":name} for name in names])
+
+
+def test_add_tags_upserts_and_links_in_a_fixed_number_of_statements(sqlite_url,book_cache):
+    engine=create_async_engine(sqlite_url)
+    statements=[]
+
+    def record(conn,cursor,statement,parameters,context,executemany):
+        statements.append(statement)
+
+    async def add(book,tags):
+        statements.clear()
+        async with AsyncSession(engine,expire_on_commit=False) as session:
+            tagged=await TagService().add_tag_to_books(book.id,tags,session)
+            return sorted(tag.name for tag in tagged.tags),len(statements)
+
+    async def scenario():
+        async with AsyncSession(engine,expire_on_commit=False) as session:
+            first,second=(
+                Book(title=title,author="a",year=2000,isbn="i",pages=1,price=1.0,available=True,summary="s")
+                for title in ("first","second")
+            )
+            fiction=Tag(name="fiction")
+            session.add_all([first,second,fiction])
+            await session.commit()
+
+        event.listen(engine.sync_engine,"before_cursor_execute",record)
+        names,single=await add(first,_tags("mystery"))
+        assert names==["mystery"]
+        # a tag that exists, one already on the book, a name sent twice and new ones
+        names,many=await add(first,_tags("fiction","mystery","travel","travel",*(f"tag{n}" for n in range(16))))
+        assert names==sorted(["fiction","mystery","travel",*(f"tag{n}" for n in range(16))])
+        # twenty tags cost the statements of one
+        assert many==single
+        names,_=await add(second,_tags("travel"))
+        assert names==["travel"]
+        event.remove(engine.sync_engine,"before_cursor_execute",record)
+
+        async with AsyncSession(engine) as session:
+            result=await session.exec(select(Tag.name,Tag.uid))
+            tags=dict(result.all())
+            links=await session.exec(select(func.count()).select_from(BookTag))
+            link_count=links.one()
+        assert tags["fiction"]==fiction.uid
+        assert len(tags)==19
+        assert link_count==20
+
+    async def run():
+        try:
+            await scenario()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())